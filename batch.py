@@ -0,0 +1,302 @@
+"""Headless batch extraction over files, directories and glob patterns.
+
+Documents are extracted in parallel by supervised worker processes (see
+supervisor.py). Each worker writes its document to FileStorage, and the parent
+streams results into SQLStorage as they complete (SQLite has a single writer).
+A document that hangs, runs out of memory or crashes its worker is recorded as
+a failure with the phase it was in, and the other workers keep going.
+
+ZIP and TAR archives are read member by member: every supported member is
+extracted from memory as ``<archive>!<member>`` without unpacking to disk.
+
+Usage:
+    python batch.py files/ "reports/**/*.pdf" extra.docx bundle.zip --workers 4
+"""
+import argparse
+import glob
+import json
+import os
+import time
+
+import instrumentation
+from data_extractor.plan import ARTIFACTS, ExtractionPlan
+from data_extractor.registry import create_extractor, is_supported
+from file_loaders.source import archive_members, as_source, is_archive
+from main import PageCounter, save_to_files, save_to_sql
+from storage.manifest import MANIFEST_FILENAME, ExtractionManifest, file_content_hash, manifest_path_for
+from storage.sql_storage import SQLStorage
+from supervisor import Supervisor
+
+
+def collect_files(patterns):
+    """Expand files, directories (recursively) and glob patterns into a sorted list of supported files.
+
+    Supported members of ZIP and TAR archives are listed as ``<archive>!<member>``.
+    """
+    file_paths = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            candidates = glob.glob(os.path.join(pattern, "**", "*"), recursive=True)
+        elif os.path.isfile(pattern):
+            candidates = [pattern]
+        else:
+            candidates = glob.glob(pattern, recursive=True)
+        for candidate in candidates:
+            if not os.path.isfile(candidate):
+                continue
+            if is_supported(candidate):
+                file_paths.add(os.path.normpath(candidate))
+            elif is_archive(candidate):
+                file_paths.update(f"{os.path.normpath(candidate)}!{member}" for member in archive_members(candidate)
+                                  if is_supported(member))
+    return sorted(file_paths)
+
+
+def extract_document(file_path, output_root="extracted_data", pdf_engine="compat", pdf_options=None,
+                     storage_options=None, plan=None, office_engine="compat", keep_pages=True):
+    """Extract one document and save it to FileStorage. Runs inside a worker process.
+
+    Pages are written to FileStorage as iter_pages() yields them. The page
+    records are returned for SQLStorage only with ``keep_pages``; otherwise
+    ``pages`` is None and no record outlives its page.
+    """
+    # Archive members are read into memory once and shared by the sniff and every parser
+    source = as_source(file_path)
+    extractor = create_extractor(source, pdf_engine=pdf_engine, pdf_options=pdf_options, plan=plan,
+                                 office_engine=office_engine)
+    extractor.load(source)
+    pages = [] if keep_pages else None
+    try:
+        counted = PageCounter(extractor.iter_pages(), pages)
+        output_dir = save_to_files(file_path, counted, output_root, storage_options)
+    finally:
+        extractor.close()
+    return {"file_path": file_path, "output_dir": output_dir, "page_count": counted.count, "pages": pages}
+
+
+def enable_metrics(metrics_dir, run_id):
+    """Record stage metrics of this process to <metrics_dir>/trace-<run_id>-<pid>.jsonl."""
+    instrumentation.enable(os.path.join(metrics_dir, f"trace-{run_id}-{os.getpid()}.jsonl"))
+
+
+def run_batch(file_paths, workers=None, output_root="extracted_data", db_path="assignment4.db", pdf_engine="compat",
+              sql_options=None, use_cache=True, metrics_dir=None, pdf_options=None, storage_options=None,
+              supervisor_options=None, plan=None, office_engine="compat"):
+    """Extract every file with supervised worker processes and return a throughput summary.
+
+    ``sql_options`` are passed to SQLStorage (commit_batch_size, journal_mode, synchronous)
+    ``pdf_options`` to PDFExtractor (table_workers, table_prefilter,
+    page_workers, split_threshold) and ``storage_options`` to FileStorage
+    (columnar_tables, table_format). ``supervisor_options`` are passed to
+    Supervisor (timeout, memory_limit, rss_limit, retries, max_tasks_per_worker);
+    failures it reports carry their ``status`` and ``phase``. ``plan`` is an
+    ExtractionPlan limiting the artifacts, pages and image sizes extracted.
+    ``office_engine`` is the DOCX/PPTX engine ("compat" or "xml").
+    With ``use_cache``, documents whose content, extractor version and options match an
+    entry in the extraction manifest (``<db name>.manifest.db`` next to the database,
+    or in ``output_root`` without SQL) are skipped and their stored outputs reused.
+    An entry is only reused for the same source path, when its folder is under
+    ``output_root`` and, for a SQL run, its document is in this database.
+
+    With ``metrics_dir``, the parent and every worker write JSON-lines stage
+    traces there, and the totals of the run are exported to
+    ``<metrics_dir>/metrics.prom`` in Prometheus text format.
+    """
+    sql_storage = SQLStorage(db_path, **(sql_options or {})) if db_path else None
+    manifest = None
+    if use_cache:
+        # Without SQL the manifest lives with the file output it describes
+        if db_path:
+            manifest_path = manifest_path_for(db_path)
+        else:
+            os.makedirs(output_root, exist_ok=True)
+            manifest_path = os.path.join(output_root, MANIFEST_FILENAME)
+        manifest = ExtractionManifest(manifest_path)
+    summary = {"documents": 0, "pages": 0, "cached": 0, "failures": []}
+    pool_options = {}
+    if metrics_dir:
+        run_id = time.strftime("%Y%m%d-%H%M%S")
+        os.makedirs(metrics_dir, exist_ok=True)
+        enable_metrics(metrics_dir, run_id)
+        pool_options = {"initializer": enable_metrics, "initargs": (metrics_dir, run_id)}
+    supervisor = Supervisor(workers=workers, **pool_options, **(supervisor_options or {}))
+    jobs = {}
+
+    def tasks():
+        for file_path in file_paths:
+            # Sniffing the header rejects empty, corrupt and mislabeled files before a worker is used
+            try:
+                source = as_source(file_path)
+                extractor = create_extractor(source, pdf_engine=pdf_engine, plan=plan, office_engine=office_engine)
+            except ValueError as error:
+                _record_failure(summary, file_path, f"{type(error).__name__}: {error}")
+                continue
+            cache_entry = None
+            if manifest is not None:
+                content_hash = file_content_hash(source)
+                cache_key = _cache_key(extractor, storage_options)
+                cache_entry = manifest.lookup(content_hash, cache_key, file_path)
+                jobs[file_path] = (content_hash, cache_key)
+            if _is_cache_hit(cache_entry, output_root, sql_storage):
+                summary["cached"] += 1
+                print(f"CACHED {file_path} -> {cache_entry['output_dir']}")
+                continue
+            yield file_path, extract_document, (file_path, output_root, pdf_engine, pdf_options, storage_options,
+                                                plan, office_engine, sql_storage is not None)
+
+    start = time.perf_counter()
+    try:
+        for outcome in supervisor.run(tasks()):
+            file_path = outcome["key"]
+            if outcome["status"] != "ok":
+                _record_failure(summary, file_path, outcome["error"], outcome)
+                continue
+            result = outcome["result"]
+            document_id = None
+            if sql_storage is not None:
+                document_id = save_to_sql(sql_storage, file_path, result["pages"])
+            if manifest is not None:
+                content_hash, cache_key = jobs.pop(file_path)
+                manifest.record(content_hash, cache_key, file_path, result["output_dir"], document_id,
+                                result["page_count"])
+            summary["documents"] += 1
+            summary["pages"] += result["page_count"]
+            print(f"OK     {file_path} -> {result['output_dir']}")
+    finally:
+        if sql_storage is not None:
+            sql_storage.close()
+        if manifest is not None:
+            manifest.close()
+        if metrics_dir:
+            instrumentation.disable()
+            trace_paths = glob.glob(os.path.join(metrics_dir, f"trace-{run_id}-*.jsonl"))
+            instrumentation.write_prometheus(instrumentation.totals_from_traces(trace_paths),
+                                             os.path.join(metrics_dir, "metrics.prom"))
+    summary["elapsed"] = time.perf_counter() - start
+    return summary
+
+
+def _record_failure(summary, file_path, error, outcome=None):
+    failure = {"file_path": file_path, "error": error}
+    if outcome is not None:
+        failure.update(status=outcome["status"], phase=outcome["phase"], attempts=outcome["attempts"])
+    summary["failures"].append(failure)
+    detail = ""
+    if outcome is not None and outcome["phase"]:
+        detail += f" (in {outcome['phase']})"
+    if outcome is not None and outcome["attempts"] > 1:
+        detail += f" after {outcome['attempts']} attempts"
+    print(f"FAILED {file_path}: {error}{detail}")
+
+
+def _is_cache_hit(cache_entry, output_root, sql_storage):
+    """Return whether a manifest entry has every output this run would write."""
+    if cache_entry is None or not cache_entry["output_dir"] or not os.path.isdir(cache_entry["output_dir"]):
+        return False
+    output_dir, output_root = os.path.abspath(cache_entry["output_dir"]), os.path.abspath(output_root)
+    if os.path.commonpath([output_dir, output_root]) != output_root:
+        return False
+    if sql_storage is None:
+        return True
+    # An entry from a run without SQL has files but no stored document
+    return cache_entry["document_id"] is not None and sql_storage.has_document(cache_entry["document_id"])
+
+
+def _cache_key(extractor, storage_options):
+    """Extend the extractor's cache key with FileStorage options that change the stored output."""
+    name, engine_version, options = extractor.cache_key()
+    if storage_options:
+        options = json.dumps({**json.loads(options), "storage": storage_options}, sort_keys=True)
+    return name, engine_version, options
+
+
+def print_summary(summary):
+    elapsed = summary["elapsed"] or 1e-9
+    print(f"\nDocuments: {summary['documents']}  Pages: {summary['pages']}  Cached: {summary['cached']}  "
+          f"Failures: {len(summary['failures'])}  Elapsed: {summary['elapsed']:.2f}s")
+    print(f"Throughput: {summary['documents'] / elapsed:.2f} documents/sec, {summary['pages'] / elapsed:.2f} pages/sec")
+    for failure in summary["failures"]:
+        phase = f" (in {failure['phase']})" if failure.get("phase") else ""
+        print(f"  {failure['file_path']}: {failure['error']}{phase}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract text, images, URLs and tables from many documents.")
+    parser.add_argument("paths", nargs="+", help="Files, directories or glob patterns to extract")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--output-dir", default="extracted_data", help="Root folder for FileStorage output")
+    parser.add_argument("--db", default="assignment4.db", help="SQLite database for SQLStorage")
+    parser.add_argument("--no-sql", action="store_true", help="Skip writing to the SQL database")
+    parser.add_argument("--commit-batch-size", type=int, default=1,
+                        help="Number of documents written to SQL per commit")
+    parser.add_argument("--wal", action="store_true", help="Use SQLite WAL journal mode")
+    parser.add_argument("--synchronous", choices=["OFF", "NORMAL", "FULL", "EXTRA"], help="SQLite synchronous setting")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Re-extract every document even if the manifest says it is unchanged")
+    parser.add_argument("--pdf-engine", default="compat", choices=["compat", "pymupdf"], help="PDF extraction engine")
+    parser.add_argument("--office-engine", default="compat", choices=["compat", "xml"],
+                        help="DOCX/PPTX extraction engine: python-docx/python-pptx, or streaming lxml")
+    parser.add_argument("--table-workers", type=int, default=1,
+                        help="Processes scanning each PDF's candidate table pages (compat engine)")
+    parser.add_argument("--page-workers", type=int, default=1,
+                        help="Processes extracting page ranges of each large PDF")
+    parser.add_argument("--split-threshold", type=int, default=200,
+                        help="Page count from which a PDF is split across --page-workers")
+    parser.add_argument("--columnar-tables", action="store_true",
+                        help="Also write each table as a typed Parquet/Feather/.npz file next to its CSV")
+    parser.add_argument("--table-format", choices=["parquet", "feather", "npz"],
+                        help="Format of --columnar-tables output (default: parquet if pyarrow is installed, else npz)")
+    parser.add_argument("--timeout", type=float, help="Seconds a document may take before its worker is killed")
+    parser.add_argument("--memory-limit", type=int, help="Address-space cap per worker, in MB")
+    parser.add_argument("--rss-limit", type=int, help="Resident-memory cap per worker, in MB (Linux)")
+    parser.add_argument("--retries", type=int, default=0,
+                        help="Extra attempts for documents that time out, run out of memory or crash")
+    parser.add_argument("--max-tasks-per-worker", type=int, help="Replace each worker after this many documents")
+    parser.add_argument("--artifacts", default=",".join(ARTIFACTS),
+                        help="Comma-separated artifacts to extract (default: all of text,images,urls,tables)")
+    parser.add_argument("--pages", help="Page/slide range to extract: N, N-M, N- or -M (default: all)")
+    parser.add_argument("--max-image-size", type=int, help="Skip images larger than this, in KB")
+    parser.add_argument("--metrics-dir", help="Write per-stage JSON-lines traces and a Prometheus metrics.prom here")
+    args = parser.parse_args(argv)
+    try:
+        plan = ExtractionPlan.parse(args.artifacts, args.pages, args.max_image_size and args.max_image_size * 2**10)
+    except ValueError as error:
+        parser.error(str(error))
+
+    file_paths = collect_files(args.paths)
+    if not file_paths:
+        print("No supported files found.")
+        return 1
+
+    summary = run_batch(
+        file_paths,
+        workers=args.workers,
+        output_root=args.output_dir,
+        db_path=None if args.no_sql else args.db,
+        pdf_engine=args.pdf_engine,
+        sql_options={
+            "commit_batch_size": args.commit_batch_size,
+            "journal_mode": "WAL" if args.wal else None,
+            "synchronous": args.synchronous,
+        },
+        use_cache=not args.no_cache,
+        metrics_dir=args.metrics_dir,
+        pdf_options={"table_workers": args.table_workers, "page_workers": args.page_workers,
+                     "split_threshold": args.split_threshold},
+        storage_options={"columnar_tables": True, "table_format": args.table_format} if args.columnar_tables else None,
+        supervisor_options={
+            "timeout": args.timeout,
+            "memory_limit": args.memory_limit and args.memory_limit * 2**20,
+            "rss_limit": args.rss_limit and args.rss_limit * 2**20,
+            "retries": args.retries,
+            "max_tasks_per_worker": args.max_tasks_per_worker,
+        },
+        plan=plan,
+        office_engine=args.office_engine,
+    )
+    print_summary(summary)
+    return 1 if summary["failures"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
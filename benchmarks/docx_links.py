@@ -0,0 +1,91 @@
+"""Benchmark DOCXExtractor.extract_urls on a synthetic document with many hyperlinks.
+
+The one-pass resolver is compared with the previous algorithm, which scanned
+every run's XML for every hyperlink relationship.
+
+Usage:
+    python -m benchmarks.docx_links [--links N] [--skip-legacy]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import docx
+from docx.opc.constants import RELATIONSHIP_TYPE
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+
+from data_extractor.docx_extractor import DOCXExtractor
+from file_loaders.docx_loader import DOCXLoader
+
+
+def build_document(file_path, link_count):
+    """Write a DOCX with one paragraph per hyperlink, each followed by a plain run."""
+    document = docx.Document()
+    for index in range(link_count):
+        paragraph = document.add_paragraph(f"Paragraph {index}: ")
+        r_id = document.part.relate_to(f"https://example.com/page/{index}", RELATIONSHIP_TYPE.HYPERLINK,
+                                       is_external=True)
+        hyperlink = OxmlElement("w:hyperlink")
+        hyperlink.set(qn("r:id"), r_id)
+        run = OxmlElement("w:r")
+        text = OxmlElement("w:t")
+        text.text = f"link {index}"
+        run.append(text)
+        hyperlink.append(run)
+        paragraph._p.append(hyperlink)
+        paragraph.add_run(" trailing text")
+    document.save(file_path)
+
+
+def legacy_extract_urls(document):
+    """The previous O(links x runs x XML size) algorithm, kept for comparison."""
+    extracted_links = []
+    for rel in document.part.rels.values():
+        if "hyperlink" in rel.reltype:
+            hyperlink = rel.target_ref
+            linked_text = None
+            page_number = None
+            for para_index, para in enumerate(document.paragraphs, start=1):
+                for run in para.runs:
+                    if hyperlink in run._element.xml:
+                        linked_text = run.text
+                        page_number = para_index
+                        break
+                if linked_text:
+                    break
+            extracted_links.append({"linked_text": linked_text or "", "url": hyperlink, "page_number": page_number})
+    return extracted_links
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--links", type=int, default=1000, help="Number of hyperlinks in the synthetic document")
+    parser.add_argument("--skip-legacy", action="store_true", help="Only time the one-pass resolver")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, "links.docx")
+        build_document(file_path, args.links)
+        extractor = DOCXExtractor(DOCXLoader())
+        extractor.load(file_path)
+
+        start = time.perf_counter()
+        links = extractor.extract_urls()
+        elapsed = time.perf_counter() - start
+        resolved = sum(1 for link in links if link["linked_text"])
+        print(f"one-pass: {elapsed:.3f}s for {len(links)} links ({resolved} with text)")
+
+        if not args.skip_legacy:
+            start = time.perf_counter()
+            legacy_links = legacy_extract_urls(extractor.file)
+            legacy_elapsed = time.perf_counter() - start
+            legacy_resolved = sum(1 for link in legacy_links if link["linked_text"])
+            print(f"legacy:   {legacy_elapsed:.3f}s for {len(legacy_links)} links ({legacy_resolved} with text)")
+            print(f"speedup:  {legacy_elapsed / elapsed:.0f}x")
+        extractor.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Compare the compat and xml DOCX/PPTX engines on bundled and synthetic documents.
+
+Every document is extracted page by page with both engines, which must yield
+the same records. The synthetic documents (see build_docx and build_pptx) add
+page breaks, merged table cells, hyperlinks and pictures at a size where the
+xml engine streams the main part instead of parsing it whole.
+
+Usage:
+    python -m benchmarks.office_engines [--pages N] [--slides N] [--repeat N] [document ...]
+"""
+import argparse
+import glob
+import io
+import os
+import tempfile
+import time
+import tracemalloc
+
+from data_extractor.docx_extractor import DOCXExtractor
+from data_extractor.pptx_extractor import PPTXExtractor
+from file_loaders.docx_loader import DOCXLoader
+from file_loaders.ppt_loader import PPTLoader
+
+
+def _png(color):
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16), color).save(buffer, "PNG")
+    buffer.seek(0)
+    return buffer
+
+
+def _add_docx_hyperlink(document, paragraph, url, text):
+    from docx.opc.constants import RELATIONSHIP_TYPE
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+
+    r_id = document.part.relate_to(url, RELATIONSHIP_TYPE.HYPERLINK, is_external=True)
+    hyperlink = OxmlElement("w:hyperlink")
+    hyperlink.set(qn("r:id"), r_id)
+    run = OxmlElement("w:r")
+    run_text = OxmlElement("w:t")
+    run_text.text = text
+    run.append(run_text)
+    hyperlink.append(run)
+    paragraph._p.append(hyperlink)
+
+
+def build_docx(file_path, pages):
+    """Write a DOCX with ``pages`` explicit pages of paragraphs, a merged-cell table, a link and a picture each."""
+    import docx
+
+    document = docx.Document()
+    for page in range(1, pages + 1):
+        for line in range(20):
+            paragraph = document.add_paragraph(f"Page {page}, line {line}:\tsome body text")
+            paragraph.add_run().add_break()
+            paragraph.add_run("after a line break")
+        paragraph = document.add_paragraph("See ")
+        _add_docx_hyperlink(document, paragraph, f"https://example.com/docx/{page}", f"link {page}")
+
+        table = document.add_table(rows=3, cols=3)
+        for row_index, row in enumerate(table.rows):
+            for column_index, cell in enumerate(row.cells):
+                cell.text = f"r{row_index}c{column_index}"
+        table.cell(0, 0).merge(table.cell(0, 1))
+        table.cell(1, 2).merge(table.cell(2, 2))
+        if page % 10 == 1:
+            document.add_picture(_png((page % 256, 0, 0)))
+        if page < pages:
+            document.add_page_break()
+    document.save(file_path)
+
+
+def build_pptx(file_path, slides):
+    """Write a PPTX with ``slides`` slides of a title, linked text, a table and a picture each."""
+    import pptx
+    from pptx.util import Inches
+
+    presentation = pptx.Presentation()
+    layout = presentation.slide_layouts[5]  # Title only
+    for index in range(1, slides + 1):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = f"Slide {index}"
+        text_frame = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(4), Inches(1)).text_frame
+        text_frame.text = f"Body of slide {index}\vsecond line"
+        run = text_frame.add_paragraph().add_run()
+        run.text = f"link {index}"
+        run.hyperlink.address = f"https://example.com/pptx/{index}"
+        table = slide.shapes.add_table(2, 2, Inches(0.5), Inches(3), Inches(4), Inches(1)).table
+        for row_index, row in enumerate(table.rows):
+            for column_index, cell in enumerate(row.cells):
+                cell.text = f"r{row_index}c{column_index}"
+        slide.shapes.add_picture(_png((0, index % 256, 0)), Inches(5), Inches(1.5))
+    presentation.save(file_path)
+
+
+def run_engine(extractor_class, loader_class, file_path, engine):
+    """Extract every page with one engine, returning (seconds, page records)."""
+    start = time.perf_counter()
+    extractor = extractor_class(loader_class(), engine=engine)
+    extractor.load(file_path)
+    pages = list(extractor.iter_pages())
+    extractor.close()
+    return time.perf_counter() - start, pages
+
+
+def trace_engine(extractor_class, loader_class, file_path, engine):
+    """Run one extraction under tracemalloc and return the peak traced bytes."""
+    tracemalloc.start()
+    try:
+        run_engine(extractor_class, loader_class, file_path, engine)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def compare(file_path, repeat):
+    if file_path.lower().endswith(".docx"):
+        extractor_class, loader_class = DOCXExtractor, DOCXLoader
+    else:
+        extractor_class, loader_class = PPTXExtractor, PPTLoader
+    results = {}
+    for engine in extractor_class.ENGINES:
+        runs = [run_engine(extractor_class, loader_class, file_path, engine) for _ in range(repeat)]
+        # Peak memory is measured in a separate run so tracing does not skew the timings
+        peak = trace_engine(extractor_class, loader_class, file_path, engine)
+        results[engine] = (min(run[0] for run in runs), peak, runs[0][1])
+    same = "identical" if results["compat"][2] == results["xml"][2] else "DIFFERENT"
+    speedup = results["compat"][0] / results["xml"][0]
+    for engine, (seconds, peak, pages) in results.items():
+        print(f"{os.path.basename(file_path):<24}{engine:<8}{seconds:>9.3f}{peak / 2**20:>10.1f}{len(pages):>7}")
+    print(f"{'':<24}{same}, xml {speedup:.1f}x faster")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="DOCX/PPTX files (default: files/*.docx, files/*.pptx)")
+    parser.add_argument("--pages", type=int, default=300, help="Pages in the synthetic DOCX")
+    parser.add_argument("--slides", type=int, default=200, help="Slides in the synthetic PPTX")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per file and engine; the best time is kept")
+    args = parser.parse_args()
+
+    file_paths = args.files or sorted(glob.glob(os.path.join("files", "*.docx")) +
+                                      glob.glob(os.path.join("files", "*.pptx")))
+    print(f"{'file':<24}{'engine':<8}{'best s':>9}{'peak MB':>10}{'pages':>7}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if not args.files:
+            synthetic_docx = os.path.join(temp_dir, "synthetic.docx")
+            synthetic_pptx = os.path.join(temp_dir, "synthetic.pptx")
+            build_docx(synthetic_docx, args.pages)
+            build_pptx(synthetic_pptx, args.slides)
+            file_paths += [synthetic_docx, synthetic_pptx]
+        for file_path in file_paths:
+            compare(file_path, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
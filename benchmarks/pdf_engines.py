@@ -0,0 +1,59 @@
+"""Compare the compat and pymupdf PDF engines on the PDFs bundled in files/.
+
+Usage:
+    python -m benchmarks.pdf_engines [--repeat N] [pdf ...]
+"""
+import argparse
+import glob
+import os
+import time
+import tracemalloc
+
+from data_extractor.pdf_extractor import PDFExtractor
+from file_loaders.pdf_loader import PDFLoader
+
+
+def run_engine(file_path, engine):
+    """Load and fully extract one PDF, returning (seconds, item counts)."""
+    start = time.perf_counter()
+    extractor = PDFExtractor(PDFLoader(), engine=engine)
+    extractor.load(file_path)
+    extracted = extractor.extract_all()
+    extractor.close()
+    elapsed = time.perf_counter() - start
+    return elapsed, {key: len(value) for key, value in extracted.items()}
+
+
+def trace_engine(file_path, engine):
+    """Run one extraction under tracemalloc and return the peak traced bytes."""
+    tracemalloc.start()
+    try:
+        run_engine(file_path, engine)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="PDF files to benchmark (default: files/*.pdf)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per file and engine; the best time is kept")
+    args = parser.parse_args()
+
+    file_paths = args.files or sorted(glob.glob(os.path.join("files", "*.pdf")))
+    print(f"{'file':<28}{'engine':<10}{'best s':>9}{'peak MB':>10}  counts")
+    for file_path in file_paths:
+        for engine in PDFExtractor.ENGINES:
+            try:
+                runs = [run_engine(file_path, engine) for _ in range(args.repeat)]
+                # Peak memory is measured in a separate run so tracing does not skew the timings
+                peak = trace_engine(file_path, engine)
+            except Exception as error:
+                print(f"{os.path.basename(file_path):<28}{engine:<10}  failed: {type(error).__name__}: {error}")
+                continue
+            elapsed = min(run[0] for run in runs)
+            print(f"{os.path.basename(file_path):<28}{engine:<10}{elapsed:>9.3f}{peak / 2**20:>10.1f}  {runs[0][1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Benchmark splitting a large PDF into page ranges across page worker processes.
+
+A synthetic PDF is generated (see benchmarks.pdf_tables) and iter_pages() is
+timed with 1, 2, 4, ... page workers up to the number of CPUs. Every worker
+count must produce the same page records.
+
+Usage:
+    python -m benchmarks.pdf_pages [--pages N] [--engine compat|pymupdf] [--max-workers W]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.pdf_tables import build_document
+from data_extractor.pdf_extractor import PDFExtractor
+from file_loaders.pdf_loader import PDFLoader
+
+
+def run(file_path, engine, page_workers):
+    """Return (seconds, page records) for one iter_pages() run; the split threshold is 1 page."""
+    start = time.perf_counter()
+    extractor = PDFExtractor(PDFLoader(), engine=engine, page_workers=page_workers, split_threshold=1)
+    extractor.load(file_path)
+    pages = list(extractor.iter_pages())
+    extractor.close()
+    return time.perf_counter() - start, pages
+
+
+def worker_counts(max_workers):
+    counts = [1]
+    while counts[-1] * 2 <= max_workers:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != max_workers:
+        counts.append(max_workers)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=400, help="Pages in the synthetic PDF")
+    parser.add_argument("--engine", default="pymupdf", choices=PDFExtractor.ENGINES, help="PDF extraction engine")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="Largest page worker count")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, "pages.pdf")
+        build_document(file_path, args.pages)
+        print(f"{args.pages} pages, {args.engine} engine, {os.cpu_count()} CPUs")
+        baseline_seconds, baseline_pages = None, None
+        for workers in worker_counts(args.max_workers):
+            seconds, pages = run(file_path, args.engine, workers)
+            if baseline_pages is None:
+                baseline_seconds, baseline_pages = seconds, pages
+            status = "identical" if pages == baseline_pages else "DIFFERENT"
+            print(f"{workers:>3} worker(s){seconds:>10.2f}s  {status}, {baseline_seconds / seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
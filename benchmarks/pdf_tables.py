@@ -0,0 +1,76 @@
+"""Benchmark the compat engine's table scan with and without the page pre-filter and table workers.
+
+A synthetic PDF is generated in which every ``--table-every``-th page holds a
+ruled table and the others hold plain text. Every configuration must produce
+the same tables.
+
+Usage:
+    python -m benchmarks.pdf_tables [--pages N] [--table-every K] [--workers W]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from data_extractor.pdf_extractor import PDFExtractor
+from file_loaders.pdf_loader import PDFLoader
+
+
+def build_document(file_path, page_count, table_every=4, rows=12, columns=5):
+    """Write a PDF whose every ``table_every``-th page holds a ruled ``rows`` x ``columns`` table."""
+    import fitz
+
+    document = fitz.open()
+    for page_index in range(page_count):
+        page = document.new_page()
+        if page_index % table_every:
+            text = "\n".join(f"Paragraph line {line} of page {page_index + 1}." for line in range(40))
+            page.insert_text((72, 72), text, fontsize=9)
+            continue
+        left, top, cell_width, cell_height = 72, 72, 90, 20
+        for row in range(rows + 1):
+            y = top + row * cell_height
+            page.draw_line((left, y), (left + columns * cell_width, y))
+        for column in range(columns + 1):
+            x = left + column * cell_width
+            page.draw_line((x, top), (x, top + rows * cell_height))
+        for row in range(rows):
+            for column in range(columns):
+                page.insert_text((left + column * cell_width + 4, top + row * cell_height + 14),
+                                 f"r{row}c{column}p{page_index + 1}", fontsize=8)
+    document.save(file_path)
+    document.close()
+
+
+def run(file_path, table_workers, table_prefilter):
+    """Return (seconds, tables) for one compat-engine extract_tables() run."""
+    start = time.perf_counter()
+    extractor = PDFExtractor(PDFLoader(), table_workers=table_workers, table_prefilter=table_prefilter)
+    extractor.load(file_path)
+    tables = extractor.extract_tables()
+    extractor.close()
+    return time.perf_counter() - start, tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=80, help="Pages in the synthetic PDF")
+    parser.add_argument("--table-every", type=int, default=4, help="Put a table on every K-th page")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Table worker processes")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        file_path = os.path.join(temp_dir, "tables.pdf")
+        build_document(file_path, args.pages, args.table_every)
+        baseline_seconds, baseline_tables = run(file_path, 1, False)
+        print(f"{'every page, 1 process':<34}{baseline_seconds:>8.2f}s  {len(baseline_tables)} tables")
+        for label, workers, prefilter in (("pre-filter, 1 process", 1, True),
+                                          (f"pre-filter, {args.workers} workers", args.workers, True)):
+            seconds, tables = run(file_path, workers, prefilter)
+            status = "identical" if tables == baseline_tables else "DIFFERENT"
+            print(f"{label:<34}{seconds:>8.2f}s  {len(tables)} tables, {status}, "
+                  f"{baseline_seconds / seconds:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
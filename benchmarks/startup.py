@@ -0,0 +1,89 @@
+"""Measure start-up import cost of common entry paths with ``python -X importtime``.
+
+Each scenario runs in a fresh interpreter. The report shows the cumulative
+import time, the number of modules imported and which heavy parser stacks
+were loaded.
+
+Usage:
+    python -m benchmarks.startup [--repeat N] [--json results.json]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Top-level packages whose import dominates start-up
+HEAVY_MODULES = ("fitz", "pdfplumber", "PyPDF2", "docx", "pptx", "pandas", "PIL", "numpy")
+
+_EXTRACT = """
+from data_extractor.registry import create_extractor
+extractor = create_extractor({path!r}, pdf_engine={engine!r})
+extractor.load({path!r})
+pages = list(extractor.iter_pages())
+extractor.close()
+"""
+
+SCENARIOS = {
+    "import main": "import main",
+    "import batch": "import batch",
+    "docx extraction": _EXTRACT.format(path="files/test.docx", engine="compat"),
+    "pptx extraction": _EXTRACT.format(path="files/Presentation.pptx", engine="compat"),
+    "pdf extraction (compat)": _EXTRACT.format(path="files/sample.pdf", engine="compat"),
+    "pdf extraction (pymupdf)": _EXTRACT.format(path="files/sample.pdf", engine="pymupdf"),
+    "text-only FileStorage": (
+        "import tempfile\n"
+        "from storage.file_storage import FileStorage\n"
+        "FileStorage(tempfile.mkdtemp()).store('hello', 'doc', 'text')\n"
+    ),
+}
+
+
+def parse_importtime(stderr):
+    """Return {top-level module: cumulative microseconds} from ``-X importtime`` output."""
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Nested imports are indented by two spaces per level; only top-level entries add up to the total
+        if not name[1:].startswith(" "):
+            cumulative[name.strip()] = int(cumulative_us)
+    return cumulative
+
+
+def run_scenario(code):
+    """Run ``code`` in a fresh interpreter and return its import statistics."""
+    checker = f"\nimport sys\nprint(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code + checker], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    top_level = parse_importtime(result.stderr)
+    module_count = sum(1 for line in result.stderr.splitlines()
+                       if line.startswith("import time:") and "cumulative" not in line)
+    heavy = [name for name in result.stdout.strip().rsplit("\n", 1)[-1].split(",") if name]
+    return {"import_seconds": sum(top_level.values()) / 1e6, "modules": module_count, "heavy": heavy}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per scenario; the fastest is kept")
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = {}
+    for name, code in SCENARIOS.items():
+        runs = [run_scenario(code) for _ in range(args.repeat)]
+        results[name] = min(runs, key=lambda run: run["import_seconds"])
+        best = results[name]
+        print(f"{name:26} {best['import_seconds'] * 1000:8.1f} ms  {best['modules']:5} modules  "
+              f"heavy: {', '.join(best['heavy']) or '-'}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Per-phase benchmark suite over the documents in files/.
+
+Every extractor phase (load, text, images, urls, tables) and every storage
+backend (FileStorage, SQLStorage) is measured for each document, and for PDFs
+with each engine. A measurement runs in a fresh process and records:
+
+- best wall and CPU time over ``--repeat`` runs, after one untimed warm-up run
+- peak traced Python memory (from a separate run under tracemalloc)
+- peak RSS of the measuring process
+- output size in bytes
+
+Results can be saved as a JSON baseline. Later runs compared against it flag
+every measurement whose wall time, CPU time or traced memory grew by more
+than ``--threshold``.
+
+Usage:
+    python -m benchmarks.suite --save benchmarks/baseline.json
+    python -m benchmarks.suite --baseline benchmarks/baseline.json --threshold 0.2
+"""
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+# Extraction phases after load(): each returns the size in bytes of what it produced
+EXTRACTION_PHASES = {
+    "text": lambda extractor: len(extractor.extract_text().encode()),
+    "images": lambda extractor: sum(image.get("size") or 0 for image in extractor.extract_images()),
+    "urls": lambda extractor: len(json.dumps(extractor.extract_urls()).encode()),
+    "tables": lambda extractor: len(json.dumps(extractor.extract_tables()).encode()),
+}
+PHASES = ("load",) + tuple(EXTRACTION_PHASES)
+BACKENDS = ("file_storage", "sql_storage")
+# Metrics compared against a baseline, with the smallest absolute increase that
+# counts as a regression (sub-millisecond phases are otherwise all noise).
+# Output size and RSS are reported but not flagged.
+NOISE_FLOOR = {"wall_seconds": 0.005, "cpu_seconds": 0.005, "peak_traced_bytes": 256 * 1024}
+
+
+class _Span:
+    """Wall time, CPU time and (when tracing) peak traced memory of one measured block."""
+
+    def __enter__(self):
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        self.wall, self.cpu = time.perf_counter(), time.process_time()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.wall = time.perf_counter() - self.wall
+        self.cpu = time.process_time() - self.cpu
+        self.peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else None
+
+
+def _store_files(file_path, pages, work_dir):
+    from main import save_to_files
+    output_root = os.path.join(work_dir, "files")
+    save_to_files(file_path, pages, output_root)
+    return _tree_size(output_root)
+
+
+def _store_sql(file_path, pages, work_dir):
+    from main import save_to_sql
+    from storage.sql_storage import SQLStorage
+    db_path = os.path.join(work_dir, "benchmark.db")
+    sql_storage = SQLStorage(db_path)
+    try:
+        save_to_sql(sql_storage, file_path, pages)
+    finally:
+        sql_storage.close()
+    return os.path.getsize(db_path)
+
+
+STORAGE_BACKENDS = {"file_storage": _store_files, "sql_storage": _store_sql}
+
+
+def _run_phase(file_path, phase, engine, work_dir):
+    """Run one phase once and return (span, output bytes).
+
+    Only the phase itself is measured: extraction phases start after load(),
+    and storage backends start once iter_pages() has produced the records.
+    """
+    from data_extractor.registry import create_extractor
+
+    if phase == "load":
+        with _Span() as span:
+            extractor = create_extractor(file_path, pdf_engine=engine)
+            extractor.load(file_path)
+        extractor.close()
+        return span, os.path.getsize(file_path)
+
+    extractor = create_extractor(file_path, pdf_engine=engine)
+    extractor.load(file_path)
+    try:
+        if phase in EXTRACTION_PHASES:
+            with _Span() as span:
+                output_bytes = EXTRACTION_PHASES[phase](extractor)
+            return span, output_bytes
+        pages = list(extractor.iter_pages())
+    finally:
+        extractor.close()
+    with _Span() as span:
+        output_bytes = STORAGE_BACKENDS[phase](file_path, pages, work_dir)
+    return span, output_bytes
+
+
+def measure(file_path, phase, engine="compat", repeat=3):
+    """Measure one phase on one document. Runs in a fresh worker process."""
+    work_dir = tempfile.mkdtemp(prefix="extract-bench-")
+    try:
+        # An untimed first run keeps module imports and first-use caches out of the timings
+        _run_phase(file_path, phase, engine, _fresh_dir(work_dir))
+        spans = []
+        for _ in range(repeat):
+            span, output_bytes = _run_phase(file_path, phase, engine, _fresh_dir(work_dir))
+            spans.append(span)
+
+        # Peak memory is measured in a separate run so tracing does not skew the timings
+        tracemalloc.start()
+        try:
+            traced, _ = _run_phase(file_path, phase, engine, _fresh_dir(work_dir))
+        finally:
+            tracemalloc.stop()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return {
+        "wall_seconds": min(span.wall for span in spans),
+        "cpu_seconds": min(span.cpu for span in spans),
+        "peak_traced_bytes": traced.peak,
+        # ru_maxrss is in KiB on Linux and in bytes on macOS
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024),
+        "output_bytes": output_bytes,
+    }
+
+
+def benchmark_cases(file_paths):
+    """Yield (file_path, phase, engine) for every phase, backend and PDF engine of each document."""
+    for file_path in file_paths:
+        engines = ("compat", "pymupdf") if file_path.lower().endswith(".pdf") else ("compat",)
+        for engine in engines:
+            for phase in PHASES + BACKENDS:
+                yield file_path, phase, engine
+
+
+def case_key(file_path, phase, engine):
+    return f"{os.path.basename(file_path)}|{phase}|{engine}"
+
+
+def run_suite(file_paths, repeat=3):
+    """Measure every case, one fresh process each, and return {case key: metrics or error}."""
+    from data_extractor.registry import create_extractor
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for file_path, phase, engine in benchmark_cases(file_paths):
+        key = case_key(file_path, phase, engine)
+        try:
+            # Unsupported or corrupt documents fail the content sniff without starting a worker
+            create_extractor(file_path, pdf_engine=engine)
+            # One executor per case (max_tasks_per_child needs Python 3.11; the README targets 3.10)
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                results[key] = executor.submit(measure, file_path, phase, engine, repeat).result()
+        except Exception as error:
+            results[key] = {"error": f"{type(error).__name__}: {error}"}
+        print(format_result(key, results[key]), flush=True)
+    return results
+
+
+def compare_results(results, baseline, threshold=0.1):
+    """Return the measurements that regressed by more than ``threshold`` (a fraction) against ``baseline``."""
+    regressions = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None or "error" in current or "error" in previous:
+            continue
+        for metric, floor in NOISE_FLOOR.items():
+            increase = current[metric] - previous[metric]
+            if previous[metric] > 0 and increase > max(previous[metric] * threshold, floor):
+                regressions.append({"case": key, "metric": metric, "baseline": previous[metric],
+                                    "current": current[metric], "ratio": current[metric] / previous[metric]})
+    return regressions
+
+
+def format_result(key, result):
+    if "error" in result:
+        return f"{key:<48} failed: {result['error']}"
+    return (f"{key:<48}{result['wall_seconds'] * 1000:>10.1f} ms{result['cpu_seconds'] * 1000:>10.1f} ms cpu"
+            f"{result['peak_traced_bytes'] / 2**20:>9.1f} MB traced{result['peak_rss_bytes'] / 2**20:>8.1f} MB rss"
+            f"{result['output_bytes']:>12} B")
+
+
+def save_baseline(path, results, repeat):
+    meta = {"python": platform.python_version(), "platform": platform.platform(), "repeat": repeat,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    with open(path, "w") as f:
+        json.dump({"meta": meta, "results": results}, f, indent=4, sort_keys=True)
+
+
+def load_baseline(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def _fresh_dir(work_dir):
+    return tempfile.mkdtemp(dir=work_dir)
+
+
+def _tree_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("files", nargs="*", help="Documents to benchmark (default: every file in files/)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case; the best is kept")
+    parser.add_argument("--save", help="Write the results as a JSON baseline")
+    parser.add_argument("--baseline", help="Compare against a JSON baseline and flag regressions")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Relative increase reported as a regression (default: 0.1 = 10%%)")
+    args = parser.parse_args(argv)
+
+    file_paths = args.files or sorted(path for path in glob.glob(os.path.join("files", "*")) if os.path.isfile(path))
+    results = run_suite(file_paths, repeat=args.repeat)
+    if args.save:
+        save_baseline(args.save, results, args.repeat)
+
+    if args.baseline:
+        regressions = compare_results(results, load_baseline(args.baseline), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['case']} {regression['metric']}: "
+                  f"{regression['baseline']:.4g} -> {regression['current']:.4g} ({regression['ratio']:.2f}x)")
+        print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
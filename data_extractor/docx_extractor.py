@@ -1,21 +1,63 @@
 from typing import Any, Dict, List
-import fitz
+from docx.oxml.ns import qn
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+from data_extractor import ooxml
 from data_extractor.extractor import Extractor
+from data_extractor.image_ref import ImageRef
+from data_extractor.plan import ExtractionPlan
+from data_extractor.session import DocumentSession
+from file_loaders.source import as_source
 
 class DOCXExtractor(Extractor):
-    def __init__(self, loader):
+    # "compat" walks python-docx objects; "xml" streams word/document.xml with
+    # lxml iterparse (see data_extractor.ooxml) and produces the same records.
+    ENGINES = ("compat", "xml")
+    LIBRARIES = ("python-docx",)
+    # 2: hyperlink records carry their linked_text and paragraph page_number
+    # 3: image records carry a lazy ImageRef and their size
+    # 4: paged image records list each image relationship once
+    VERSION = 4
+
+    def __init__(self, loader, plan=None, engine="compat"):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unsupported DOCX engine: {engine}. Use one of {', '.join(self.ENGINES)}.")
         self.loader = loader
+        self.plan = plan or ExtractionPlan()
+        self.engine = engine
         self.file = None
         self.file_path = None
+        self.source = None
+        self.session = None
         
     def load(self, file_path):
-        """Load the file using the appropriate loader based on file type."""
-        self.file = self.loader.load_file(file_path)
-        self.file_path = file_path 
+        """Load the file using the appropriate loader based on file type.
+
+        ``file_path`` may be any document source (see file_loaders.source).
+        """
+        self.close()
+        self.source = as_source(file_path)
+        if self.engine == "xml":
+            # Only validate through the loader so that python-docx never parses the file
+            if not self.loader.validate_file(self.source.name):
+                raise ValueError("Invalid DOCX file.")
+            self.file = ooxml.Package(self.source.reference)
+        else:
+            self.file = self.loader.load_file(self.source.reference)
+        self.file_path = self.source.name
+        self.session = DocumentSession(self.source.reference, self.file)
+        if self.engine == "xml":
+            self.session.get("package", lambda path: self.file)
         
     def extract_text(self):
         # Extract text from DOCX
-            doc = self.loader.load_file(self.file_path)
+            if not self.plan.wants("text"):
+                return ""
+            if self.plan.limits_pages():
+                return self._single_pass()["text"]
+            if self.engine == "xml":
+                return self._xml_document()["text"]
+            doc = self.file
             text = ""
 
             # Extract text from paragraphs
@@ -32,60 +74,279 @@ class DOCXExtractor(Extractor):
     
     def extract_images(self):
         images = []
+        if not self.plan.wants("images"):
+            return images
+        if self.plan.limits_pages():
+            return self._single_pass()["images"]
+        if self.engine == "xml":
+            for rel in self.file.rels(self.file.main_part).values():
+                if "image" in rel.target_ref and not rel.is_external:
+                    record = self._image_record(rel)
+                    if self.plan.allows_image(record["size"]):
+                        images.append(record)
+            return images
         # DOCX image extraction
-        doc = self.loader.load_file(self.file_path)
+        doc = self.file
         for rel in doc.part.rels.values():
             if "image" in rel.target_ref:
                 image_blob = rel.target_part.blob
-                # Get the image extension
-                image_ext = rel.target_part.content_type.split('/')[1]
-                # Append the image information only if it is not None
-                if image_blob is not None:
-                    images.append({
-                        "image_data": image_blob,
-                        "ext": image_ext
-                    })
-        doc = None  # Explicitly close the document
+                # Append the image information only if it is not None and within the plan's size limit
+                if image_blob is not None and self.plan.allows_image(len(image_blob)):
+                    images.append(self._image_record(rel))
         return images
+
+    def _image_record(self, rel, page_number=None):
+        """Reference an image relationship's target part by its zip member instead of copying its bytes."""
+        if self.engine == "xml":
+            partname, size, content_type = rel.partname, self.file.size(rel.partname), \
+                self.file.content_type(rel.partname)
+        else:
+            image_part = rel.target_part
+            partname, size, content_type = image_part.partname, len(image_part.blob), image_part.content_type
+        record = {
+            "image_data": ImageRef.zip_member(self.source.reference, partname, size),
+            "ext": content_type.split('/')[1],
+            "size": size,
+        }
+        if page_number is not None:
+            record["page"] = page_number
+        return record
     
     def extract_urls(self) -> List[Dict[str, Any]]:
         """Extract hyperlinks from a DOCX file."""
         extracted_links = []
+        if not self.plan.wants("urls"):
+            return extracted_links
+        if self.plan.limits_pages():
+            return self._single_pass()["urls"]
+
+        # Resolve every w:hyperlink in one pass over the body, keyed by relationship id
+        if self.engine == "xml":
+            rels, hyperlink_positions = self.file.rels(self.file.main_part), self._xml_document()["hyperlinks"]
+        else:
+            rels, hyperlink_positions = self.file.part.rels, self._hyperlink_positions()
 
         # Access the document's relationships to find hyperlinks
-        for rel in self.file.part.rels.values():
+        for r_id, rel in rels.items():
             if "hyperlink" in rel.reltype:
-                # Extract the hyperlink target
-                hyperlink = rel.target_ref
-                
-                # Look for the text associated with this hyperlink
-                linked_text = None
-                page_number = None
-                for para_index, para in enumerate(self.file.paragraphs, start=1):
-                    for run in para.runs:
-                        if hyperlink in run._element.xml:
-                            linked_text = run.text
-                            page_number = para_index  # Using the paragraph index as the page number
-                            break
-                    if linked_text:
-                        break
-                
-                # Append the link, associated text, and page number to the extracted links
+                linked_text, page_number = hyperlink_positions.get(r_id, ("", None))
                 extracted_links.append({
-                    "linked_text": linked_text or "",  # Use an empty string if no text is found
-                    "url": hyperlink,
-                    "page_number": page_number
+                    "linked_text": linked_text,
+                    "url": rel.target_ref,
+                    "page_number": page_number  # Index of the body paragraph holding the link
                 })
 
         return extracted_links
 
+    def _hyperlink_positions(self):
+        """Map the r:id of each w:hyperlink to (text, paragraph index) in a single walk of the body.
+
+        The first occurrence of an id wins. Links inside tables keep the index of
+        the last body paragraph before the table.
+        """
+        positions = {}
+        para_index = 0
+        for block in self.file.element.body.iterchildren():
+            if block.tag == qn('w:p'):
+                para_index += 1
+            elif block.tag != qn('w:tbl'):
+                continue
+            self._add_hyperlink_positions(positions, block, para_index)
+        return positions
+
+    @staticmethod
+    def _add_hyperlink_positions(positions, block, para_index):
+        for hyperlink in block.iter(ooxml.W_HYPERLINK):
+            r_id = hyperlink.get(ooxml.R_ID)
+            if r_id and r_id not in positions:
+                text = "".join(node.text or "" for node in hyperlink.iter(ooxml.W_T))
+                positions[r_id] = (text, para_index or None)
+
+    def _xml_document(self):
+        """Stream the body once (xml engine) and keep its text, tables and hyperlink positions for the session.
+
+        Text is laid out as with python-docx: every body paragraph, then the rows of every body table.
+        """
+        return self.session.get("xml_document", lambda path: self._walk_xml_document())
+
+    def _walk_xml_document(self):
+        plan = self.plan
+        paragraphs, table_text, tables, positions = [], [], [], {}
+        para_index = 0
+        for block in self.file.iter_children(self.file.main_part, ooxml.W_BODY, (ooxml.W_P, ooxml.W_TBL)):
+            if block.tag == ooxml.W_P:
+                para_index += 1
+                if plan.wants("text"):
+                    paragraphs.append(ooxml.paragraph_text(block) + "\n")
+            elif plan.wants("text") or plan.wants("tables"):
+                table_content = ooxml.table_rows(block)
+                if plan.wants("text"):
+                    table_text.extend("\t".join(row_data) + "\n" for row_data in table_content)
+                if plan.wants("tables"):
+                    tables.append(table_content)
+            if plan.wants("urls"):
+                self._add_hyperlink_positions(positions, block, para_index)
+        return {"text": "".join(paragraphs) + "".join(table_text), "tables": tables, "hyperlinks": positions}
+
 
 
     def extract_tables(self):
         # Extract tables from DOCX
-        doc = self.loader.load_file(self.file_path)
+        if not self.plan.wants("tables"):
+            return []
+        if self.plan.limits_pages():
+            return self._single_pass()["tables"]
+        if self.engine == "xml":
+            return self._xml_document()["tables"]
+        doc = self.file
         table_data = []
         for table in doc.tables:
             table_content = [[cell.text.strip() for cell in row.cells] for row in table.rows]
             table_data.append(table_content)
-        return table_data
\ No newline at end of file
+        return table_data
+
+    def count_pages(self):
+        """Estimate the page count of the loaded DOCX from its page breaks.
+
+        DOCX files have no fixed pages, so Word's last rendered page breaks are
+        counted when present and explicit page breaks otherwise.
+        """
+        if self.engine == "xml":
+            rendered, explicit = self.file.count_page_breaks(self.file.main_part)
+            return (rendered or explicit) + 1
+        body = self.file.element.body
+        breaks = body.xpath('.//w:lastRenderedPageBreak') or body.xpath('.//w:br[@w:type="page"]')
+        return len(breaks) + 1
+
+    def iter_pages(self):
+        """Yield one record per planned page, splitting the body at page breaks.
+
+        Paragraphs and tables are emitted in document order, and images and
+        hyperlinks are attached to the page whose blocks reference them. Page
+        numbers follow the same page breaks as count_pages(). Blocks before the
+        plan's first page are only scanned for breaks, and the walk stops after
+        its last page.
+        """
+        for page in self._iter_all_pages():
+            if page["page_number"] < self.plan.first_page:
+                continue
+            if not self.plan.includes_page(page["page_number"]):
+                return
+            yield page
+
+    def _iter_all_pages(self):
+        plan = self.plan
+        if self.engine == "xml":
+            package = self.file
+            blocks = package.iter_children(package.main_part, ooxml.W_BODY, (ooxml.W_P, ooxml.W_TBL))
+            rels = package.rels(package.main_part)
+            rendered = package.has_rendered_page_breaks(package.main_part)
+            paragraph_text, table_rows = ooxml.paragraph_text, ooxml.table_rows
+        else:
+            doc = self.file
+            body = doc.element.body
+            blocks = (block for block in body.iterchildren() if block.tag in (qn('w:p'), qn('w:tbl')))
+            rels = doc.part.rels
+            rendered = bool(body.xpath('.//w:lastRenderedPageBreak'))
+
+            def paragraph_text(block):
+                return Paragraph(block, doc._body).text
+
+            def table_rows(block):
+                return [[cell.text.strip() for cell in row.cells] for row in Table(block, doc._body).rows]
+
+        page = self._empty_page(1)
+        seen_images = set()
+        for block in blocks:
+            # A rendered break marks where Word started a new page, so the block
+            # belongs to the next page; explicit breaks end the current page.
+            if rendered:
+                breaks = sum(1 for _ in block.iter(ooxml.W_LAST_RENDERED_PAGE_BREAK))
+            else:
+                breaks = sum(1 for node in block.iter(ooxml.W_BR) if node.get(ooxml.W_TYPE) == "page")
+            if rendered:
+                for _ in range(breaks):
+                    yield page
+                    page = self._empty_page(page["page_number"] + 1)
+
+            planned = plan.includes_page(page["page_number"])
+            if planned and block.tag == qn('w:p') and plan.wants("text"):
+                page["text"] += paragraph_text(block) + "\n"
+            elif planned and block.tag == qn('w:tbl') and (plan.wants("text") or plan.wants("tables")):
+                table_content = table_rows(block)
+                if plan.wants("text"):
+                    for row_data in table_content:
+                        page["text"] += "\t".join(row_data) + "\n"
+                if plan.wants("tables"):
+                    page["tables"].append(table_content)
+
+            for blip in block.iter(ooxml.A_BLIP) if planned and plan.wants("images") else ():
+                r_id = blip.get(ooxml.R_EMBED)
+                rel = rels.get(r_id)
+                # An image drawn several times is one relationship, as in extract_images(); keep its first page
+                if rel is not None and not rel.is_external and "image" in rel.target_ref and r_id not in seen_images:
+                    seen_images.add(r_id)
+                    record = self._image_record(rel, page["page_number"])
+                    if plan.allows_image(record["size"]):
+                        page["images"].append(record)
+
+            for hyperlink in block.iter(ooxml.W_HYPERLINK) if planned and plan.wants("urls") else ():
+                rel = rels.get(hyperlink.get(ooxml.R_ID))
+                if rel is not None and "hyperlink" in rel.reltype:
+                    page["urls"].append({
+                        "linked_text": "".join(node.text or "" for node in hyperlink.iter(ooxml.W_T)),
+                        "url": rel.target_ref,
+                        "page_number": page["page_number"],
+                    })
+
+            if not rendered:
+                for _ in range(breaks):
+                    yield page
+                    page = self._empty_page(page["page_number"] + 1)
+        yield page
+
+    @staticmethod
+    def _empty_page(page_number):
+        return {"page_number": page_number, "text": "", "images": [], "urls": [], "tables": []}
+
+    def options(self):
+        # The default engine adds nothing, so cache entries written before engines existed stay valid
+        return {"engine": self.engine} if self.engine != "compat" else {}
+
+    def libraries(self):
+        return ("lxml",) if self.engine == "xml" else self.LIBRARIES
+
+    def extract_all(self):
+        """Extract text, images, URLs and tables in a single walk of the document."""
+        plan = self.plan
+        if plan.limits_pages():
+            return dict(self._single_pass())
+        if self.engine == "xml":
+            document = self._xml_document()
+            return {
+                "text": document["text"] if plan.wants("text") else "",
+                "images": self.extract_images(),
+                "urls": self.extract_urls(),
+                "tables": document["tables"],
+            }
+        doc = self.file
+        text = ""
+        for paragraph in doc.paragraphs if plan.wants("text") else ():
+            text += paragraph.text + "\n"
+
+        # Each table is walked once and feeds both the text and the table output
+        tables = []
+        for table in doc.tables if plan.wants("text") or plan.wants("tables") else ():
+            table_content = [[cell.text.strip() for cell in row.cells] for row in table.rows]
+            if plan.wants("text"):
+                for row_data in table_content:
+                    text += "\t".join(row_data) + "\n"
+            if plan.wants("tables"):
+                tables.append(table_content)
+
+        return {
+            "text": text,
+            "images": self.extract_images(),
+            "urls": self.extract_urls(),
+            "tables": tables,
+        }
\ No newline at end of file
@@ -1,6 +1,22 @@
+import json
 from abc import ABC, abstractmethod
+from importlib import metadata
+
+import instrumentation
 
 class Extractor(ABC):
+    # Bump VERSION whenever a change alters an extractor's output. Together with
+    # the installed versions of LIBRARIES it keys cached extraction results.
+    VERSION = 1
+    LIBRARIES = ()
+    # Methods timed by the instrumentation layer when it is enabled
+    INSTRUMENTED = ("load", "extract_text", "extract_images", "extract_urls", "extract_tables", "extract_all",
+                    "iter_pages")
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        instrumentation.instrument(cls)
+
     @abstractmethod
     def load(self, file_path):
         pass
@@ -8,15 +24,86 @@ class Extractor(ABC):
     @abstractmethod
     def extract_text(self):
         pass
-    
+
     @abstractmethod
     def extract_images(self):
         pass
-    
+
     @abstractmethod
     def extract_urls(self):
         pass
-    
+
     @abstractmethod
     def extract_tables(self):
-        pass
\ No newline at end of file
+        pass
+
+    @abstractmethod
+    def count_pages(self):
+        pass
+
+    @abstractmethod
+    def iter_pages(self):
+        """Yield one record per page/slide: page_number, text, images, urls and tables."""
+        pass
+
+    def extract_all(self):
+        """Extract text, images, URLs and tables from the loaded document in one call."""
+        return {
+            "text": self.extract_text(),
+            "images": self.extract_images(),
+            "urls": self.extract_urls(),
+            "tables": self.extract_tables(),
+        }
+
+    def options(self):
+        """Return the constructor options that change this extractor's output."""
+        return {}
+
+    def libraries(self):
+        """Return the distributions whose versions affect this extractor's output."""
+        return self.LIBRARIES
+
+    def cache_key(self):
+        """Return (extractor name, engine version, options) identifying this extractor's output."""
+        versions = ",".join(f"{name}={_library_version(name)}" for name in self.libraries())
+        engine_version = f"{self.VERSION};{versions}"
+        options = self.options()
+        # Full plans are left out so that existing cache entries stay valid
+        plan = getattr(self, "plan", None)
+        if plan is not None and not plan.is_full():
+            options = {**options, "plan": plan.options()}
+        return type(self).__name__, engine_version, json.dumps(options, sort_keys=True)
+
+    def _single_pass(self):
+        """Visit the planned pages once through iter_pages() and merge the records, cached for the session."""
+        return self.session.get("single_pass", lambda path: merge_pages(self.iter_pages()))
+
+    def close(self):
+        """Release the parsed document and any handles opened on it."""
+        session = getattr(self, "session", None)
+        if session is not None:
+            session.close()
+            self.session = None
+
+
+instrumentation.instrument(Extractor)
+
+
+def merge_pages(pages):
+    """Combine the per-page records of iter_pages() into an extract_all() result."""
+    text_parts = []
+    merged = {"text": "", "images": [], "urls": [], "tables": []}
+    for page in pages:
+        text_parts.append(page["text"])
+        merged["images"].extend(page["images"])
+        merged["urls"].extend(page["urls"])
+        merged["tables"].extend(page["tables"])
+    merged["text"] = "".join(text_parts)
+    return merged
+
+
+def _library_version(name):
+    try:
+        return metadata.version(name)
+    except metadata.PackageNotFoundError:
+        return "missing"
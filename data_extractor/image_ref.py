@@ -0,0 +1,189 @@
+import contextlib
+import contextvars
+import zipfile
+
+from file_loaders.source import as_source
+
+# Bytes yielded per chunk when an image is streamed from its source file
+CHUNK_SIZE = 64 * 1024
+
+# PDF image filters whose stream fitz's extract_image() returns unchanged, and the extension it reports
+PASSTHROUGH_FILTERS = {"DCTDecode": "jpeg"}
+
+# PDF image filters fitz's extract_image() decodes, and the extension of the image it returns
+CONVERTED_FILTERS = {
+    "FlateDecode": "png",
+    "LZWDecode": "png",
+    "RunLengthDecode": "png",
+    "CCITTFaxDecode": "png",
+    "JPXDecode": "jpx",
+    "JBIG2Decode": "jb2",
+}
+
+# Source handles shared by the ImageRefs read inside shared_sources()
+_shared = contextvars.ContextVar("image_ref_shared", default=None)
+
+
+@contextlib.contextmanager
+def shared_sources():
+    """Open each source document at most once for the ImageRefs read inside the block.
+
+    Nested blocks share the outermost block's handles.
+    """
+    if _shared.get() is not None:
+        yield
+        return
+    shared = {"handles": {}}
+    token = _shared.set(shared)
+    try:
+        yield
+    finally:
+        _shared.reset(token)
+        for handle in shared["handles"].values():
+            handle.close()
+
+
+class ImageRef:
+    """Location of an embedded image inside its source document.
+
+    Extractors put an ImageRef in an image record's ``image_data`` instead of
+    the image bytes. Iterating it reads the bytes from the source in chunks,
+    so storage backends write images one at a time without holding every blob
+    of a document in memory. Images in OOXML packages (DOCX, PPTX) are streamed
+    straight from their zip member. PDF images are read from their xref with
+    fitz: JPEG streams are copied raw, other images are converted the same way
+    as ``fitz.Document.extract_image``. ``source_path`` is the document's path,
+    or the DocumentSource of a document held in memory.
+    """
+
+    def __init__(self, source_path, member=None, xref=None, size=None, raw=False, pdf_document=None):
+        self.source_path = source_path
+        self.member = member
+        self.xref = xref
+        self.size = size
+        self.raw = raw
+        # The extractor session's open fitz document, used while it stays open; never pickled
+        self._pdf_document = pdf_document
+
+    @classmethod
+    def zip_member(cls, source_path, part_name, size=None):
+        """Reference an image part of an OOXML package by its part name (e.g. "/ppt/media/image1.png")."""
+        return cls(source_path, member=str(part_name).lstrip("/"), size=size)
+
+    @classmethod
+    def pdf_xref(cls, source_path, xref, size=None, raw=False, pdf_document=None):
+        """Reference a PDF image XObject; ``raw`` streams the undecoded stream (passthrough filters only).
+
+        ``pdf_document`` is the open document the record was built from; it is
+        read from while it stays open instead of opening the source again.
+        """
+        return cls(source_path, xref=xref, size=size, raw=raw, pdf_document=pdf_document)
+
+    def iter_chunks(self, chunk_size=CHUNK_SIZE):
+        """Yield the image bytes in chunks of at most ``chunk_size``."""
+        shared = _shared.get()
+        if self.member is not None:
+            if shared is not None:
+                package = _shared_handle(shared, ("zip", self.source_path),
+                                         lambda: zipfile.ZipFile(as_source(self.source_path).readable()))
+                context = contextlib.nullcontext(package)
+            else:
+                context = zipfile.ZipFile(as_source(self.source_path).readable())
+            with context as package, package.open(self.member) as member:
+                for chunk in iter(lambda: member.read(chunk_size), b""):
+                    yield chunk
+            return
+
+        with self._open_pdf(shared) as pdf_document:
+            if self.raw:
+                data = pdf_document.xref_stream_raw(self.xref)
+            else:
+                data = pdf_document.extract_image(self.xref)["image"]
+        view = memoryview(data)
+        for start in range(0, len(view), chunk_size):
+            yield view[start:start + chunk_size]
+
+    def _open_pdf(self, shared):
+        """Return a context yielding an open fitz document of the source, opened as rarely as possible."""
+        if self._pdf_document is not None and not self._pdf_document.is_closed:
+            return contextlib.nullcontext(self._pdf_document)
+        if shared is not None:
+            return contextlib.nullcontext(_shared_handle(shared, ("fitz", self.source_path),
+                                                         lambda: as_source(self.source_path).open_fitz()))
+        return as_source(self.source_path).open_fitz()
+
+    def __iter__(self):
+        return self.iter_chunks()
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state["_pdf_document"] = None
+        return state
+
+    def read(self):
+        """Return the whole image as bytes."""
+        return b"".join(self.iter_chunks())
+
+    def __bytes__(self):
+        return self.read()
+
+    def _key(self):
+        return self.source_path, self.member, self.xref
+
+    def __eq__(self, other):
+        if not isinstance(other, ImageRef):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __repr__(self):
+        location = f"member={self.member!r}" if self.member is not None else f"xref={self.xref}"
+        return f"ImageRef({self.source_path!r}, {location}, size={self.size})"
+
+
+def pdf_image_record(pdf_document, source_path, image_info, page_num):
+    """Build the image record for one ``page.get_images(full=True)`` entry without decoding it.
+
+    Extension, dimensions and size come from the xref's dictionary; ``size`` is
+    the length of the image stream in the PDF. Only images with a filter chain
+    whose output is not known up front are extracted here, and their bytes dropped.
+    """
+    xref, width, height, image_filter = image_info[0], image_info[2], image_info[3], image_info[8]
+    ext = PASSTHROUGH_FILTERS.get(image_filter)
+    raw = ext is not None
+    if not raw and pdf_document.xref_get_key(xref, "Filter")[0] == "name":
+        ext = CONVERTED_FILTERS.get(image_filter)
+    size = _stream_length(pdf_document, xref) if ext else None
+    if size is None:
+        base_image = pdf_document.extract_image(xref)
+        ext, size, width, height = base_image["ext"], len(base_image["image"]), base_image["width"], \
+            base_image["height"]
+        raw = False
+    image_ref = ImageRef.pdf_xref(source_path, xref, size, raw=raw, pdf_document=pdf_document)
+    return {
+        "image_data": image_ref,
+        "ext": ext,
+        "page": page_num,
+        "size": size,
+        "dimensions": (width, height)
+    }
+
+
+def _shared_handle(shared, key, opener):
+    handles = shared["handles"]
+    if key not in handles:
+        handles[key] = opener()
+    return handles[key]
+
+
+def _stream_length(pdf_document, xref):
+    kind, value = pdf_document.xref_get_key(xref, "Length")
+    if kind == "xref":
+        # Indirect length such as "12 0 R"
+        value = pdf_document.xref_object(int(value.split()[0]))
+    try:
+        return int(value)
+    except ValueError:
+        return None
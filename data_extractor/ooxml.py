@@ -0,0 +1,293 @@
+"""Streaming reads of OOXML packages (DOCX, PPTX) for the "xml" engine of DOCXExtractor and PPTXExtractor.
+
+Parts are read straight from the zip with ``lxml.etree.iterparse``. Each
+top-level element (a body paragraph or table, a slide shape) is yielded once
+it is complete and cleared as soon as the caller moves on, so memory stays
+flat on large documents. Relationships and content types are resolved from the
+package's own ``.rels`` and ``[Content_Types].xml`` parts. The text helpers
+follow the same rules as python-docx and python-pptx, so both engines produce
+the same records without a Python proxy object per XML node.
+"""
+import posixpath
+import re
+import zipfile
+
+from lxml import etree
+
+from file_loaders.source import as_source
+
+NAMESPACES = {
+    "w": "http://schemas.openxmlformats.org/wordprocessingml/2006/main",
+    "a": "http://schemas.openxmlformats.org/drawingml/2006/main",
+    "p": "http://schemas.openxmlformats.org/presentationml/2006/main",
+    "r": "http://schemas.openxmlformats.org/officeDocument/2006/relationships",
+    "pr": "http://schemas.openxmlformats.org/package/2006/relationships",
+    "ct": "http://schemas.openxmlformats.org/package/2006/content-types",
+}
+OFFICE_DOCUMENT = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"
+TABLE_URI = "http://schemas.openxmlformats.org/drawingml/2006/table"
+# Bytes of a part decompressed per read when it is scanned without parsing
+SCAN_CHUNK_SIZE = 256 * 1024
+# Parts up to this many (uncompressed) bytes are parsed in one call, which is
+# faster than iterparse on small parts such as most slides; larger parts are streamed
+PARSE_LIMIT = 512 * 1024
+# Image formats reported by Pillow -> extension, as python-pptx's Image.ext
+IMAGE_EXTENSIONS = {"BMP": "bmp", "GIF": "gif", "JPEG": "jpg", "PNG": "png", "TIFF": "tiff", "WMF": "wmf"}
+# Leading bytes Pillow accepts for each of those formats; other images are opened with Pillow
+IMAGE_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "PNG"), (b"\xff\xd8\xff", "JPEG"), (b"GIF87a", "GIF"), (b"GIF89a", "GIF"),
+    (b"BM", "BMP"), (b"II*\x00", "TIFF"), (b"MM\x00*", "TIFF"), (b"\xd7\xcd\xc6\x9a\x00\x00", "WMF"),
+)
+
+
+def qn(tag):
+    """Return the Clark name of a prefixed tag, e.g. "w:p" -> "{http://...}p"."""
+    prefix, name = tag.split(":")
+    return f"{{{NAMESPACES[prefix]}}}{name}"
+
+
+W_P, W_TBL, W_TR, W_TC, W_R, W_T = qn("w:p"), qn("w:tbl"), qn("w:tr"), qn("w:tc"), qn("w:r"), qn("w:t")
+W_BODY, W_HYPERLINK, W_BR, W_TYPE = qn("w:body"), qn("w:hyperlink"), qn("w:br"), qn("w:type")
+W_LAST_RENDERED_PAGE_BREAK = qn("w:lastRenderedPageBreak")
+A_P, A_R, A_T, A_BR, A_FLD, A_TR, A_TC = qn("a:p"), qn("a:r"), qn("a:t"), qn("a:br"), qn("a:fld"), qn("a:tr"), \
+    qn("a:tc")
+A_BLIP, R_ID, R_EMBED = qn("a:blip"), qn("r:id"), qn("r:embed")
+P_SP, P_PIC, P_GRAPHIC_FRAME, P_SP_TREE = qn("p:sp"), qn("p:pic"), qn("p:graphicFrame"), qn("p:spTree")
+
+# Text of the run children python-docx reads (w:br counts only as a line break)
+_RUN_TEXT = {qn("w:cr"): "\n", qn("w:noBreakHyphen"): "-", qn("w:ptab"): "\t", qn("w:tab"): "\t"}
+_RENDERED_BREAK = re.compile(rb"<(?:[\w.-]+:)?lastRenderedPageBreak\b")
+
+
+class Relationship:
+    """One relationship of a part. ``partname`` is the absolute target part name, or None for external targets."""
+
+    def __init__(self, r_id, reltype, target_ref, partname):
+        self.r_id = r_id
+        self.reltype = reltype
+        self.target_ref = target_ref
+        self.partname = partname
+
+    @property
+    def is_external(self):
+        return self.partname is None
+
+
+class Package:
+    """An OOXML zip package opened without python-docx or python-pptx."""
+
+    def __init__(self, file_path):
+        self.zip = zipfile.ZipFile(as_source(file_path).readable())
+        self._rels = {}
+        self._content_types = None
+
+    @property
+    def main_part(self):
+        """Part name of the main document part, e.g. "/word/document.xml"."""
+        for rel in self.rels("/").values():
+            if rel.reltype == OFFICE_DOCUMENT:
+                return rel.partname
+        raise ValueError("The package has no main document part.")
+
+    def open(self, partname):
+        return self.zip.open(partname.lstrip("/"))
+
+    def size(self, partname):
+        return self.zip.getinfo(partname.lstrip("/")).file_size
+
+    def rels(self, partname):
+        """Return the relationships of a part ("/" for the package) as an ordered dict keyed by r:id."""
+        if partname not in self._rels:
+            base_uri, name = posixpath.split(partname)
+            rels_member = posixpath.join(base_uri, "_rels", name + ".rels").lstrip("/")
+            rels = {}
+            if rels_member in self.zip.NameToInfo:
+                for element in _parse(self.zip.read(rels_member)).iterfind("pr:Relationship", NAMESPACES):
+                    rels[element.get("Id")] = _relationship(element, base_uri)
+            self._rels[partname] = rels
+        return self._rels[partname]
+
+    def content_type(self, partname):
+        """Return a part's content type, from its Override or the Default for its extension."""
+        if self._content_types is None:
+            overrides, defaults = {}, {}
+            for element in _parse(self.zip.read("[Content_Types].xml")):
+                if element.tag == qn("ct:Override"):
+                    overrides[element.get("PartName").lower()] = element.get("ContentType")
+                elif element.tag == qn("ct:Default"):
+                    defaults[element.get("Extension").lower()] = element.get("ContentType")
+            self._content_types = overrides, defaults
+        overrides, defaults = self._content_types
+        if partname.lower() in overrides:
+            return overrides[partname.lower()]
+        return defaults[posixpath.splitext(partname)[1][1:].lower()]
+
+    def image_ext(self, partname):
+        """Return the extension python-pptx reports for an image part, from the format Pillow detects."""
+        with self.open(partname) as stream:
+            head = stream.read(16)
+            image_format = next((name for signature, name in IMAGE_SIGNATURES if head.startswith(signature)), None)
+            if image_format is None:
+                from PIL import Image
+                stream.seek(0)
+                image_format = Image.open(stream).format
+        if image_format not in IMAGE_EXTENSIONS:
+            raise ValueError(f"unsupported image format, expected one of: {IMAGE_EXTENSIONS.keys()}, "
+                             f"got '{image_format}'")
+        return IMAGE_EXTENSIONS[image_format]
+
+    def iter_children(self, partname, parent_tag, tags):
+        """Yield each complete element with one of ``tags`` whose parent is a ``parent_tag`` element.
+
+        Elements of streamed parts are cleared, and dropped from their parent,
+        when the caller asks for the next one.
+        """
+        if self.size(partname) <= PARSE_LIMIT:
+            root = _parse(self.zip.read(partname.lstrip("/")))
+            for parent in root.iter(parent_tag):
+                yield from (element for element in parent if element.tag in tags)
+            return
+        with self.open(partname) as stream:
+            for _, element in etree.iterparse(stream, events=("end",), tag=tags, remove_blank_text=True,
+                                              resolve_entities=False):
+                parent = element.getparent()
+                if parent is None or parent.tag != parent_tag:
+                    continue
+                yield element
+                element.clear()
+                while element.getprevious() is not None:
+                    del parent[0]
+
+    def count_page_breaks(self, partname):
+        """Return (rendered, explicit) page break counts of a part: w:lastRenderedPageBreak and w:br type="page"."""
+        rendered = explicit = 0
+        with self.open(partname) as stream:
+            for _, element in etree.iterparse(stream, events=("end",), tag=(W_LAST_RENDERED_PAGE_BREAK, W_BR),
+                                              resolve_entities=False):
+                if element.tag == W_LAST_RENDERED_PAGE_BREAK:
+                    rendered += 1
+                elif element.get(W_TYPE) == "page":
+                    explicit += 1
+                element.clear()
+        return rendered, explicit
+
+    def has_rendered_page_breaks(self, partname):
+        """Return whether a part holds a w:lastRenderedPageBreak, scanning its bytes without parsing.
+
+        A literal "<" in text is always escaped, so only a tag can match.
+        """
+        tail = b""
+        with self.open(partname) as stream:
+            for chunk in iter(lambda: stream.read(SCAN_CHUNK_SIZE), b""):
+                if _RENDERED_BREAK.search(tail + chunk):
+                    return True
+                tail = chunk[-64:]
+        return False
+
+    def slide_partnames(self):
+        """Return the part names of a presentation's slides in presentation order."""
+        presentation = self.main_part
+        rels = self.rels(presentation)
+        with self.open(presentation) as stream:
+            root = _parse(stream.read())
+        return [rels[slide_id.get(R_ID)].partname
+                for slide_id in root.iterfind("p:sldIdLst/p:sldId", NAMESPACES)]
+
+    def close(self):
+        self.zip.close()
+
+
+def paragraph_text(paragraph):
+    """Text of a w:p as python-docx's Paragraph.text: its runs, and the runs of its hyperlinks."""
+    parts = []
+    for child in paragraph:
+        if child.tag == W_R:
+            parts.append(run_text(child))
+        elif child.tag == W_HYPERLINK:
+            parts.extend(run_text(run) for run in child if run.tag == W_R)
+    return "".join(parts)
+
+
+def run_text(run):
+    parts = []
+    for child in run:
+        if child.tag == W_T:
+            parts.append(child.text or "")
+        elif child.tag == W_BR:
+            # Page and column breaks have no text
+            parts.append("\n" if child.get(W_TYPE, "textWrapping") == "textWrapping" else "")
+        elif child.tag in _RUN_TEXT:
+            parts.append(_RUN_TEXT[child.tag])
+    return "".join(parts)
+
+
+def table_rows(table):
+    """Rows of a w:tbl as lists of stripped cell texts, laid out as python-docx's _Row.cells.
+
+    A cell spanning several grid columns is repeated for each, and a
+    vertically merged continuation cell repeats the cell it continues.
+    """
+    rows = []
+    above = {}
+    for row in table.iterfind("w:tr", NAMESPACES):
+        cells, current = [], {}
+        grid_before = row.find("w:trPr/w:gridBefore", NAMESPACES)
+        offset = int(grid_before.get(qn("w:val"))) if grid_before is not None else 0
+        for cell in row.iterfind("w:tc", NAMESPACES):
+            span = _grid_span(cell)
+            vertical_merge = cell.find("w:tcPr/w:vMerge", NAMESPACES)
+            if vertical_merge is not None and vertical_merge.get(qn("w:val"), "continue") == "continue" \
+                    and offset in above:
+                resolved = above[offset]
+            else:
+                text = "\n".join(paragraph_text(paragraph) for paragraph in cell if paragraph.tag == W_P)
+                resolved = text.strip(), span
+            current[offset] = resolved
+            cells.extend([resolved[0]] * resolved[1])
+            offset += span
+        rows.append(cells)
+        above = current
+    return rows
+
+
+def _grid_span(cell):
+    grid_span = cell.find("w:tcPr/w:gridSpan", NAMESPACES)
+    return int(grid_span.get(qn("w:val"))) if grid_span is not None else 1
+
+
+def text_frame_text(text_body):
+    """Text of an a:txBody/p:txBody as python-pptx's TextFrame.text; line breaks become "\\v"."""
+    if text_body is None:
+        return ""
+    return "\n".join(drawing_paragraph_text(paragraph) for paragraph in text_body if paragraph.tag == A_P)
+
+
+def drawing_paragraph_text(paragraph):
+    parts = []
+    for child in paragraph:
+        if child.tag in (A_R, A_FLD):
+            text = child.find(A_T)
+            parts.append(text.text or "" if text is not None else "")
+        elif child.tag == A_BR:
+            parts.append("\v")
+    return "".join(parts)
+
+
+def is_placeholder(shape):
+    """Return True if the first child of a slide shape element (its nv*Pr) marks a placeholder."""
+    properties = shape[0] if len(shape) else None
+    return properties is not None and properties.find("p:nvPr/p:ph", NAMESPACES) is not None
+
+
+def _relationship(element, base_uri):
+    target = element.get("Target")
+    if element.get("TargetMode") == "External":
+        return Relationship(element.get("Id"), element.get("Type"), target, None)
+    partname = posixpath.abspath(posixpath.join(base_uri, target))
+    # Internal targets are reported relative to the source part, as python-docx/python-pptx do
+    target_ref = partname[1:] if base_uri == "/" else posixpath.relpath(partname, base_uri)
+    return Relationship(element.get("Id"), element.get("Type"), target_ref, partname)
+
+
+def _parse(data):
+    return etree.fromstring(data, etree.XMLParser(remove_blank_text=True, resolve_entities=False))
@@ -1,75 +1,353 @@
 from typing import Any, Dict, List
-import fitz
-import pdfplumber
 from data_extractor.extractor import Extractor
+from data_extractor.image_ref import pdf_image_record
+from data_extractor.plan import ExtractionPlan
+from data_extractor.session import DocumentSession
+from file_loaders.source import as_source
+
+
+# fitz and pdfplumber are imported on first use so that importing this module
+# (or running another format) does not pay for the PDF stacks. ``file_path`` is
+# a path or an in-memory DocumentSource.
+def _open_fitz(file_path):
+    return as_source(file_path).open_fitz()
+
+
+def _open_pdfplumber(file_path):
+    import pdfplumber
+    return pdfplumber.open(as_source(file_path).readable())
+
+
+# Coordinates closer than this (in points) count as the same for edge orientation
+EDGE_TOLERANCE = 0.5
+
+
+def _is_table_candidate(page):
+    """Return True if the vector graphics on a fitz page could form a ruled table.
+
+    pdfplumber and PyMuPDF both find tables (with their default "lines"
+    strategy) from the horizontal and vertical edges of lines, rectangles and
+    curves, and even one cell needs two edges of each orientation. A page
+    without them cannot hold a table. Counting is deliberately loose: slanted
+    segments count as both orientations.
+    """
+    horizontal = vertical = 0
+    for path in page.get_cdrawings():
+        for item in path["items"]:
+            if item[0] in ("re", "qu"):
+                horizontal += 2
+                vertical += 2
+            else:
+                for start, end in zip(item[1:], item[2:]):
+                    flat = abs(start[1] - end[1]) <= EDGE_TOLERANCE
+                    upright = abs(start[0] - end[0]) <= EDGE_TOLERANCE
+                    horizontal += flat or not upright
+                    vertical += upright or not flat
+            if horizontal >= 2 and vertical >= 2:
+                return True
+    return False
+
+
+def _find_page_tables(file_path, page_numbers):
+    """Run pdfplumber's table finder on the given pages. Runs in a table worker process."""
+    with _open_pdfplumber(file_path) as pdf:
+        results = []
+        for page_num in page_numbers:
+            page = pdf.pages[page_num - 1]
+            results.append(page.extract_tables())
+            page.close()
+    return results
+
+
+def _extract_page_range(loader, file_path, engine, table_prefilter, plan, first, last):
+    """Extract pages ``first``..``last`` (1-based, inclusive) of a PDF. Runs in a page worker process."""
+    extractor = PDFExtractor(loader, engine=engine, table_prefilter=table_prefilter, plan=plan)
+    extractor.load(file_path)
+    try:
+        return list(extractor._iter_page_range(first, last))
+    finally:
+        extractor.close()
+
 
 class PDFExtractor(Extractor):
-    def __init__(self, loader):
+    # "compat" parses with PyPDF2, fitz and pdfplumber; "pymupdf" does everything
+    # with a single fitz.Document in one pass over the pages.
+    ENGINES = ("compat", "pymupdf")
+    LIBRARIES = ("PyPDF2", "PyMuPDF", "pdfplumber")
+    # 2: image records carry a lazy ImageRef and their size
+    # 3: converted image records carry the length of their stream in the PDF
+    VERSION = 3
+    # Per-page stages of the compat engine: fitz image extraction, PyPDF2 links, pdfplumber table scan
+    INSTRUMENTED = Extractor.INSTRUMENTED + ("_page_images", "_page_urls", "_page_tables")
+
+    # Pages per range handed to a page worker are at most page_count / (page_workers * this),
+    # so a slow range does not leave the other workers idle at the end
+    RANGES_PER_WORKER = 4
+
+    def __init__(self, loader, engine="compat", table_workers=1, table_prefilter=True, page_workers=1,
+                 split_threshold=200, plan=None):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unsupported PDF engine: {engine}. Use one of {', '.join(self.ENGINES)}.")
         self.loader = loader
+        self.engine = engine
+        # None of these options changes the output, so they are not part of options()/cache_key():
+        # table_workers > 1 splits the compat engine's pdfplumber table scan across processes,
+        # table_prefilter skips the table finder on pages without ruling edges, and documents
+        # of at least split_threshold pages are split into page ranges across page_workers processes.
+        self.table_workers = table_workers
+        self.table_prefilter = table_prefilter
+        self.page_workers = page_workers
+        self.split_threshold = split_threshold
+        self.plan = plan or ExtractionPlan()
         self.file = None
         self.file_path = None
+        self.source = None
+        self.session = None
         
     def load(self, file_path):
-        """Load the file using the appropriate loader based on file type."""
-        self.file = self.loader.load_file(file_path)
-        self.file_path = file_path 
+        """Load the file using the appropriate loader based on file type.
+
+        ``file_path`` may be any document source (see file_loaders.source). An
+        in-memory document is shared by every library that parses it.
+        """
+        self.close()
+        self.source = as_source(file_path)
+        if self.engine == "pymupdf":
+            # Only validate through the loader so that PyPDF2 never parses the file
+            if not self.loader.validate_file(self.source.name):
+                raise ValueError("Invalid PDF file.")
+            self.file = _open_fitz(self.source)
+        else:
+            self.file = self.loader.load_file(self.source.reference)
+        self.file_path = self.source.name
+        self.session = DocumentSession(self.source.reference, self.file)
+        if self.engine == "pymupdf":
+            self.session.get("fitz", lambda path: self.file)
         
     def extract_text(self):
+        if not self.plan.wants("text"):
+            return ""
+        if self._page_records():
+            return self._single_pass()["text"]
         # Extract text from PDF
-        reader = self.loader.load_file(self.file_path)
+        reader = self.file
         text = ""
         for page in reader.pages:
             text += page.extract_text()
         return text
 
     def extract_images(self):
+        if not self.plan.wants("images"):
+            return []
+        if self._page_records():
+            return self._single_pass()["images"]
         images = []
         # PDF image extraction
-        pdf_document = fitz.open(self.file_path)
+        # The fitz document is opened once per session and shared across calls
+        pdf_document = self.session.get("fitz", _open_fitz)
         for page_num in range(len(pdf_document)):
-            page = pdf_document.load_page(page_num)
-            image_list = page.get_images(full=True)
-            for img in image_list:
-                xref = img[0]
-                base_image = pdf_document.extract_image(xref)
-                image_bytes = base_image["image"]
-                image_ext = base_image["ext"]
-                width, height = base_image["width"], base_image["height"]
-                images.append({
-                    "image_data": image_bytes,
-                    "ext": image_ext,
-                    "page": page_num + 1,
-                    "dimensions": (width, height)
-                })
-        pdf_document.close()
+            images.extend(self._page_images(pdf_document, page_num + 1))
         return images
 
     def extract_urls(self) -> List[Dict[str, Any]]:
         """Extract hyperlinks from a PDF file."""
+        if not self.plan.wants("urls"):
+            return []
+        if self._page_records():
+            return self._single_pass()["urls"]
         extracted_links = []
         for page_num, page in enumerate(self.file.pages, start=1):
-            # Extract annotations from the page
-            if '/Annots' in page:
-                annotations = page['/Annots']
-                for annot in annotations:
-                    annot_obj = annot.get_object()  # Get the annotation object
-                    # Check if the annotation object has the expected structure
-                    if '/A' in annot_obj and '/URI' in annot_obj['/A']:
-                        link = annot_obj['/A']['/URI']
-                        extracted_links.append({                            
-                            "linked_text": link,  # You can also extract the text if needed
-                            "url": link,
-                            "page_number": page_num
-                        })
+            extracted_links.extend(self._page_urls(page, page_num))
         return extracted_links
 
     def extract_tables(self):
+        if not self.plan.wants("tables"):
+            return []
+        if self._page_records():
+            return self._single_pass()["tables"]
         tables = []
         # Extract tables from PDF
-        with pdfplumber.open(self.file_path) as pdf:
-            for page in pdf.pages:
-                # Extract tables from each page
-                page_tables = page.extract_tables()
-                for table in page_tables:
-                    tables.append(table)  # Each table is a list of lists
-        return tables
\ No newline at end of file
+        for _, page_tables in self._iter_page_tables():
+            for table in page_tables:
+                tables.append(table)  # Each table is a list of lists
+        return tables
+
+    def options(self):
+        return {"engine": self.engine}
+
+    def libraries(self):
+        return ("PyMuPDF",) if self.engine == "pymupdf" else self.LIBRARIES
+
+    def count_pages(self):
+        """Return the number of pages in the loaded PDF."""
+        if self.engine == "pymupdf":
+            return self.file.page_count
+        return len(self.file.pages)
+
+    def iter_pages(self):
+        """Yield one record per planned page with that page's text, images, URLs and tables.
+
+        Plans with at least ``split_threshold`` pages are extracted in page
+        ranges by ``page_workers`` processes, and the records are yielded in
+        page order.
+        """
+        first, last = self.plan.page_range(self.count_pages())
+        if self._splits():
+            yield from self._iter_split_pages(first, last)
+            return
+        yield from self._iter_page_range(first, last)
+
+    def _splits(self):
+        if self.page_workers <= 1:
+            return False
+        first, last = self.plan.page_range(self.count_pages())
+        return last - first + 1 >= self.split_threshold
+
+    def _page_records(self):
+        """Return True when extract_*() merge the iter_pages() records instead of walking the whole document."""
+        return self.engine == "pymupdf" or self.plan.limits_pages() or self._splits()
+
+    def _iter_split_pages(self, first_page, last_page):
+        from concurrent.futures import ProcessPoolExecutor
+
+        page_count = last_page - first_page + 1
+        range_size = max(1, -(-page_count // (self.page_workers * self.RANGES_PER_WORKER)))
+        ranges = [(first, min(first + range_size - 1, last_page))
+                  for first in range(first_page, last_page + 1, range_size)]
+        with ProcessPoolExecutor(max_workers=self.page_workers) as executor:
+            # Each worker opens the file itself; only the finished page records come back
+            futures = [executor.submit(_extract_page_range, self.loader, self.source.reference, self.engine,
+                                       self.table_prefilter, self.plan, first, last) for first, last in ranges]
+            for future in futures:
+                yield from future.result()
+
+    def _iter_page_range(self, first, last):
+        """Yield the records of pages ``first``..``last`` (1-based, inclusive) in this process."""
+        if self.engine == "pymupdf":
+            yield from self._iter_pymupdf_pages(first, last)
+            return
+        plan = self.plan
+        # fitz and pdfplumber are only opened for the artifacts that need them
+        pdf_document = self.session.get("fitz", _open_fitz) if plan.wants("images") else None
+        page_tables = self._iter_page_tables(first, last) if plan.wants("tables") else None
+        for page_num in range(first, last + 1):
+            page = self.file.pages[page_num - 1]
+            yield {
+                "page_number": page_num,
+                "text": page.extract_text() if plan.wants("text") else "",
+                "images": self._page_images(pdf_document, page_num) if plan.wants("images") else [],
+                "urls": self._page_urls(page, page_num) if plan.wants("urls") else [],
+                "tables": next(page_tables)[1] if page_tables is not None else [],
+            }
+        if page_tables is not None:
+            page_tables.close()
+
+    def extract_all(self):
+        """Extract text, images, URLs and tables from the loaded PDF."""
+        if self._page_records():
+            return dict(self._single_pass())
+        return super().extract_all()
+
+    def _page_images(self, pdf_document, page_num):
+        # Records hold an ImageRef to the xref; the bytes are read when the image is stored
+        page = pdf_document.load_page(page_num - 1)
+        return self._image_records(pdf_document, page, page_num)
+
+    def _image_records(self, pdf_document, page, page_num):
+        records = (pdf_image_record(pdf_document, self.source.reference, img, page_num)
+                   for img in page.get_images(full=True))
+        return [record for record in records if self.plan.allows_image(record["size"])]
+
+    def _page_tables(self, plumber_page):
+        return plumber_page.extract_tables()
+
+    def _is_candidate_page(self, page_num):
+        if not self.table_prefilter:
+            return True
+        return _is_table_candidate(self.session.get("fitz", _open_fitz)[page_num - 1])
+
+    def _iter_page_tables(self, first=1, last=None):
+        """Yield (page number, tables) for pages ``first``..``last`` in order, running pdfplumber only on candidates.
+
+        With table_workers > 1 the candidate pages are split into contiguous
+        chunks that worker processes scan in parallel.
+        """
+        last = len(self.file.pages) if last is None else last
+        candidates = [page_num for page_num in range(first, last + 1) if self._is_candidate_page(page_num)]
+        if self.table_workers > 1 and len(candidates) > 1:
+            yield from self._iter_parallel_page_tables(candidates, first, last)
+            return
+        candidates = set(candidates)
+        for page_num in range(first, last + 1):
+            if page_num not in candidates:
+                yield page_num, []
+                continue
+            plumber_page = self.session.get("pdfplumber", _open_pdfplumber).pages[page_num - 1]
+            tables = self._page_tables(plumber_page)
+            # Drop pdfplumber's cached layout objects so memory does not grow with page count
+            plumber_page.close()
+            yield page_num, tables
+
+    def _iter_parallel_page_tables(self, candidates, first, last):
+        from concurrent.futures import ProcessPoolExecutor
+
+        workers = min(self.table_workers, len(candidates))
+        chunk_size = -(-len(candidates) // workers)
+        chunks = [candidates[start:start + chunk_size] for start in range(0, len(candidates), chunk_size)]
+        chunk_of_page = {page_num: index for index, chunk in enumerate(chunks) for page_num in chunk}
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_find_page_tables, self.source.reference, chunk) for chunk in chunks]
+            found = {}
+            for page_num in range(first, last + 1):
+                if page_num in chunk_of_page and page_num not in found:
+                    # Wait for the chunk holding this page; later chunks keep running meanwhile
+                    chunk_index = chunk_of_page[page_num]
+                    found.update(zip(chunks[chunk_index], futures[chunk_index].result()))
+                yield page_num, found.pop(page_num, [])
+
+    def _page_urls(self, page, page_num):
+        extracted_links = []
+        # Extract annotations from the page
+        if '/Annots' in page:
+            annotations = page['/Annots']
+            for annot in annotations:
+                annot_obj = annot.get_object()  # Get the annotation object
+                # Check if the annotation object has the expected structure
+                if '/A' in annot_obj and '/URI' in annot_obj['/A']:
+                    link = annot_obj['/A']['/URI']
+                    extracted_links.append({                            
+                        "linked_text": link,  # You can also extract the text if needed
+                        "url": link,
+                        "page_number": page_num
+                    })
+        return extracted_links
+
+    def _iter_pymupdf_pages(self, first, last):
+        import fitz
+        pdf_document = self.file
+        plan = self.plan
+        for page_num in range(first, last + 1):
+            page = pdf_document[page_num - 1]
+            images = self._image_records(pdf_document, page, page_num) if plan.wants("images") else []
+
+            extracted_links = []
+            for link in page.get_links() if plan.wants("urls") else ():
+                if link.get("kind") == fitz.LINK_URI and link.get("uri"):
+                    extracted_links.append({
+                        "linked_text": link["uri"],  # Same record as the compat engine
+                        "url": link["uri"],
+                        "page_number": page_num
+                    })
+
+            # Table candidates come from PyMuPDF's own table finder, on pages with ruling edges only
+            tables = []
+            if plan.wants("tables") and (not self.table_prefilter or _is_table_candidate(page)):
+                tables = [table.extract() for table in page.find_tables().tables]
+
+            yield {
+                "page_number": page_num,
+                "text": page.get_text() if plan.wants("text") else "",
+                "images": images,
+                "urls": extracted_links,
+                "tables": tables,
+            }
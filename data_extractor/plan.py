@@ -0,0 +1,87 @@
+"""What an extractor should produce: which artifacts, from which pages, within which limits.
+
+An ExtractionPlan is passed to an extractor's constructor (or to
+registry.create_extractor). Extractors check it before doing any work, so an
+artifact that is not requested is never computed and the library that would
+produce it is never opened: a text-only PDF run does not open pdfplumber or
+fitz. Page records keep their shape; skipped artifacts are empty ("" or []).
+"""
+
+ARTIFACTS = ("text", "images", "urls", "tables")
+
+
+class ExtractionPlan:
+    """Artifacts to extract, an inclusive 1-based page/slide range and a maximum image size in bytes.
+
+    ``last_page=None`` means the end of the document, and ``max_image_size=None``
+    keeps every image. Pages outside the range are not yielded by iter_pages()
+    and do not contribute to extract_*().
+    """
+
+    def __init__(self, artifacts=ARTIFACTS, first_page=1, last_page=None, max_image_size=None):
+        artifacts = tuple(artifacts)
+        unknown = [artifact for artifact in artifacts if artifact not in ARTIFACTS]
+        if unknown:
+            raise ValueError(f"Unknown artifact: {', '.join(unknown)}. Use any of {', '.join(ARTIFACTS)}.")
+        if first_page < 1:
+            raise ValueError("first_page must be 1 or more.")
+        if last_page is not None and last_page < first_page:
+            raise ValueError("last_page must not be before first_page.")
+        if max_image_size is not None and max_image_size < 0:
+            raise ValueError("max_image_size must be 0 or more.")
+        self.artifacts = frozenset(artifacts)
+        self.first_page = first_page
+        self.last_page = last_page
+        self.max_image_size = max_image_size
+
+    @classmethod
+    def parse(cls, artifacts=None, pages=None, max_image_size=None):
+        """Build a plan from command-line strings such as ``"text,tables"`` and ``"3-10"``, ``"5"`` or ``"5-"``."""
+        if artifacts:
+            artifacts = [artifact.strip() for artifact in artifacts.split(",") if artifact.strip()]
+        first_page, last_page = 1, None
+        if pages:
+            first, _, last = pages.partition("-")
+            try:
+                first_page = int(first) if first.strip() else 1
+                last_page = (int(last) if last.strip() else None) if "-" in pages else first_page
+            except ValueError:
+                raise ValueError(f"Invalid page range: {pages}. Use N, N-M, N- or -M.") from None
+        return cls(artifacts or ARTIFACTS, first_page, last_page, max_image_size)
+
+    def wants(self, artifact):
+        return artifact in self.artifacts
+
+    def includes_page(self, page_num):
+        return page_num >= self.first_page and (self.last_page is None or page_num <= self.last_page)
+
+    def page_range(self, page_count):
+        """Return (first, last) of the pages to extract from a document of ``page_count`` pages; empty if first > last."""
+        last = page_count if self.last_page is None else min(self.last_page, page_count)
+        return self.first_page, last
+
+    def limits_pages(self):
+        return self.first_page > 1 or self.last_page is not None
+
+    def allows_image(self, size):
+        return self.max_image_size is None or size is None or size <= self.max_image_size
+
+    def is_full(self):
+        """Return True for the default plan: every artifact of every page, with no limits."""
+        return self.artifacts == frozenset(ARTIFACTS) and not self.limits_pages() and self.max_image_size is None
+
+    def options(self):
+        """Return the plan as a JSON-serializable dict, for cache keys."""
+        return {"artifacts": [artifact for artifact in ARTIFACTS if artifact in self.artifacts],
+                "pages": [self.first_page, self.last_page], "max_image_size": self.max_image_size}
+
+    def __eq__(self, other):
+        return isinstance(other, ExtractionPlan) and self.options() == other.options()
+
+    def __hash__(self):
+        return hash(repr(self))
+
+    def __repr__(self):
+        options = self.options()
+        return (f"ExtractionPlan(artifacts={tuple(options['artifacts'])}, first_page={self.first_page}, "
+                f"last_page={self.last_page}, max_image_size={self.max_image_size})")
@@ -1,21 +1,56 @@
 from typing import Any, Dict, List
-import fitz
-from data_extractor.extractor import Extractor
+from data_extractor import ooxml
+from data_extractor.extractor import Extractor, merge_pages
+from data_extractor.image_ref import ImageRef
+from data_extractor.plan import ExtractionPlan
+from data_extractor.session import DocumentSession
+from file_loaders.source import as_source
 
 class PPTXExtractor(Extractor):
-    def __init__(self, loader):
+    # "compat" walks python-pptx objects; "xml" streams each ppt/slides/slideN.xml
+    # with lxml iterparse (see data_extractor.ooxml) and produces the same records.
+    ENGINES = ("compat", "xml")
+    LIBRARIES = ("python-pptx",)
+    # 2: image records carry a lazy ImageRef and their size
+    VERSION = 2
+
+    def __init__(self, loader, plan=None, engine="compat"):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unsupported PPTX engine: {engine}. Use one of {', '.join(self.ENGINES)}.")
         self.loader = loader
+        self.plan = plan or ExtractionPlan()
+        self.engine = engine
         self.file = None
         self.file_path = None
+        self.source = None
+        self.session = None
         
     def load(self, file_path):
-        """Load the file using the appropriate loader based on file type."""
-        self.file = self.loader.load_file(file_path)
-        self.file_path = file_path 
+        """Load the file using the appropriate loader based on file type.
+
+        ``file_path`` may be any document source (see file_loaders.source).
+        """
+        self.close()
+        self.source = as_source(file_path)
+        if self.engine == "xml":
+            # Only validate through the loader so that python-pptx never parses the file
+            if not self.loader.validate_file(self.source.name):
+                raise ValueError("Invalid PPT file.")
+            self.file = ooxml.Package(self.source.reference)
+        else:
+            self.file = self.loader.load_file(self.source.reference)
+        self.file_path = self.source.name
+        self.session = DocumentSession(self.source.reference, self.file)
+        if self.engine == "xml":
+            self.session.get("package", lambda path: self.file)
 
     def extract_text(self):
         # Extract text from PPTX
-        ppt = self.loader.load_file(self.file_path)
+        if not self.plan.wants("text"):
+            return ""
+        if self.engine == "xml" or self.plan.limits_pages():
+            return self._single_pass()["text"]
+        ppt = self.file
         text = ""
 
         # Extract text from shapes
@@ -34,24 +69,46 @@ class PPTXExtractor(Extractor):
 
     def extract_images(self):
         images = []
+        if not self.plan.wants("images"):
+            return images
+        if self.engine == "xml" or self.plan.limits_pages():
+            return self._single_pass()["images"]
         # PPTX image extraction
-        ppt = self.loader.load_file(self.file_path)
+        ppt = self.file
         # Extract images
         for slide_num, slide in enumerate(ppt.slides):
             for shape in slide.shapes:
                 if shape.shape_type == 13:  # Picture type
-                    image_stream = shape.image.blob
-                    image_ext = shape.image.ext
-                    images.append({
-                        "image_data": image_stream,
-                        "ext": image_ext,
-                        "page": slide_num + 1,
-                    })
+                    record = self._image_record(slide, shape, slide_num + 1)
+                    if record is not None:
+                        images.append(record)
         return images
 
+    def _image_record(self, slide, shape, slide_num):
+        """Reference a picture's image part by its zip member instead of copying its bytes into the record.
+
+        Returns None for images larger than the plan allows.
+        """
+        image_part = slide.part.related_part(shape._element.blip_rId)
+        return self._planned_image(image_part.partname, len(image_part.blob), lambda: shape.image.ext, slide_num)
+
+    def _planned_image(self, partname, size, ext, slide_num):
+        if not self.plan.allows_image(size):
+            return None
+        return {
+            "image_data": ImageRef.zip_member(self.source.reference, partname, size),
+            "ext": ext(),
+            "page": slide_num,
+            "size": size,
+        }
+
     def extract_urls(self) -> List[Dict[str, Any]]:
         """Extract hyperlinks from a PPTX file."""
         extracted_links = []
+        if not self.plan.wants("urls"):
+            return extracted_links
+        if self.engine == "xml" or self.plan.limits_pages():
+            return self._single_pass()["urls"]
         # Loop through each slide in the presentation
         for slide_num, slide in enumerate(self.file.slides, start=1):
             # Loop through each shape in the slide
@@ -73,8 +130,12 @@ class PPTXExtractor(Extractor):
 
     def extract_tables(self):
         tables=[]
+        if not self.plan.wants("tables"):
+            return tables
+        if self.engine == "xml" or self.plan.limits_pages():
+            return self._single_pass()["tables"]
         # Extract tables from PPTX (typically tables are part of shapes)
-        ppt = self.loader.load_file(self.file_path)
+        ppt = self.file
         for slide in ppt.slides:
             for shape in slide.shapes:
                 if shape.has_table:  # Check if the shape contains a table
@@ -84,4 +145,139 @@ class PPTXExtractor(Extractor):
                         row_data = [cell.text_frame.text.strip() if cell.text_frame else '' for cell in row.cells]
                         table_content.append(row_data)
                     tables.append(table_content)
-        return tables
\ No newline at end of file
+        return tables
+
+    def count_pages(self):
+        """Return the number of slides in the loaded presentation."""
+        if self.engine == "xml":
+            return len(self.file.slide_partnames())
+        return len(self.file.slides)
+
+    def iter_pages(self):
+        """Yield one record per planned slide with that slide's text, images, URLs and tables."""
+        if self.engine == "xml":
+            yield from self._iter_xml_slides()
+            return
+        plan = self.plan
+        for slide_num, slide in enumerate(self.file.slides, start=1):
+            if slide_num < plan.first_page:
+                continue
+            if not plan.includes_page(slide_num):
+                break
+            text = ""
+            images = []
+            extracted_links = []
+            tables = []
+            for shape in slide.shapes:
+                if plan.wants("text") and hasattr(shape, "text"):
+                    text += shape.text + "\n"
+
+                if (plan.wants("text") or plan.wants("tables")) and shape.has_table:
+                    table_content = []
+                    for row in shape.table.rows:
+                        if plan.wants("text"):
+                            text += "\t".join(cell.text.strip() for cell in row.cells) + "\n"
+                        table_content.append([cell.text_frame.text.strip() if cell.text_frame else '' for cell in row.cells])
+                    if plan.wants("tables"):
+                        tables.append(table_content)
+
+                if plan.wants("images") and shape.shape_type == 13:  # Picture type
+                    record = self._image_record(slide, shape, slide_num)
+                    if record is not None:
+                        images.append(record)
+
+                if plan.wants("urls") and hasattr(shape, "text_frame") and shape.text_frame is not None:
+                    for paragraph in shape.text_frame.paragraphs:
+                        for run in paragraph.runs:
+                            if run.hyperlink and run.hyperlink.address:
+                                extracted_links.append({
+                                    "linked_text": run.text,
+                                    "url": run.hyperlink.address,
+                                    "page_number": slide_num
+                                })
+
+            yield {
+                "page_number": slide_num,
+                "text": text,
+                "images": images,
+                "urls": extracted_links,
+                "tables": tables,
+            }
+
+    def _iter_xml_slides(self):
+        """Stream each planned slide's top-level shapes (xml engine), following python-pptx's shape classes.
+
+        Autoshapes and text placeholders (p:sp) have text and links, graphic
+        frames holding an a:tbl have tables, and p:pic elements that are
+        neither placeholders nor movies are pictures.
+        """
+        plan = self.plan
+        package = self.file
+        for slide_num, partname in enumerate(package.slide_partnames(), start=1):
+            if slide_num < plan.first_page:
+                continue
+            if not plan.includes_page(slide_num):
+                break
+            rels = package.rels(partname)
+            text_parts = []
+            images = []
+            extracted_links = []
+            tables = []
+            for shape in package.iter_children(partname, ooxml.P_SP_TREE,
+                                               (ooxml.P_SP, ooxml.P_PIC, ooxml.P_GRAPHIC_FRAME)):
+                if shape.tag == ooxml.P_SP:
+                    text_body = shape.find("p:txBody", ooxml.NAMESPACES)
+                    if plan.wants("text"):
+                        text_parts.append(ooxml.text_frame_text(text_body) + "\n")
+                    if plan.wants("urls") and text_body is not None:
+                        for run in text_body.iterfind("a:p/a:r", ooxml.NAMESPACES):
+                            link = run.find("a:rPr/a:hlinkClick", ooxml.NAMESPACES)
+                            rel = rels.get(link.get(ooxml.R_ID)) if link is not None else None
+                            if rel is not None and rel.target_ref:
+                                run_text = run.find(ooxml.A_T)
+                                extracted_links.append({
+                                    "linked_text": run_text.text or "" if run_text is not None else "",
+                                    "url": rel.target_ref,
+                                    "page_number": slide_num
+                                })
+
+                elif shape.tag == ooxml.P_GRAPHIC_FRAME and (plan.wants("text") or plan.wants("tables")):
+                    table = shape.find(f"a:graphic/a:graphicData[@uri='{ooxml.TABLE_URI}']/a:tbl",
+                                       ooxml.NAMESPACES)
+                    if table is not None:
+                        table_content = [[ooxml.text_frame_text(cell.find("a:txBody", ooxml.NAMESPACES)).strip()
+                                          for cell in row.iterfind("a:tc", ooxml.NAMESPACES)]
+                                         for row in table.iterfind("a:tr", ooxml.NAMESPACES)]
+                        if plan.wants("text"):
+                            text_parts.extend("\t".join(row_data) + "\n" for row_data in table_content)
+                        if plan.wants("tables"):
+                            tables.append(table_content)
+
+                elif shape.tag == ooxml.P_PIC and plan.wants("images") and not ooxml.is_placeholder(shape) \
+                        and shape.find("p:nvPicPr/p:nvPr/a:videoFile", ooxml.NAMESPACES) is None:
+                    blip = shape.find("p:blipFill/a:blip", ooxml.NAMESPACES)
+                    rel = rels.get(blip.get(ooxml.R_EMBED)) if blip is not None else None
+                    if rel is not None and not rel.is_external:
+                        record = self._planned_image(rel.partname, package.size(rel.partname),
+                                                     lambda: package.image_ext(rel.partname), slide_num)
+                        if record is not None:
+                            images.append(record)
+
+            yield {
+                "page_number": slide_num,
+                "text": "".join(text_parts),
+                "images": images,
+                "urls": extracted_links,
+                "tables": tables,
+            }
+
+    def options(self):
+        # The default engine adds nothing, so cache entries written before engines existed stay valid
+        return {"engine": self.engine} if self.engine != "compat" else {}
+
+    def libraries(self):
+        return ("lxml", "Pillow") if self.engine == "xml" else self.LIBRARIES
+
+    def extract_all(self):
+        """Extract text, images, URLs and tables in a single walk over the slides."""
+        return merge_pages(self.iter_pages())
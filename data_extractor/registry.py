@@ -0,0 +1,114 @@
+import importlib
+import zipfile
+
+from file_loaders.source import as_source
+
+# File extension -> (loader class, extractor class) as "module:Class" paths.
+# Modules are imported the first time a file of that format is handled, so a
+# DOCX-only run never imports the PDF or PPTX stacks.
+FORMATS = {
+    ".pdf": ("file_loaders.pdf_loader:PDFLoader", "data_extractor.pdf_extractor:PDFExtractor"),
+    ".docx": ("file_loaders.docx_loader:DOCXLoader", "data_extractor.docx_extractor:DOCXExtractor"),
+    ".pptx": ("file_loaders.ppt_loader:PPTLoader", "data_extractor.pptx_extractor:PPTXExtractor"),
+    ".ppt": ("file_loaders.ppt_loader:PPTLoader", "data_extractor.pptx_extractor:PPTXExtractor"),
+}
+
+# Detected content type -> FORMATS key of the loader/extractor pair that reads it
+CONTENT_TYPES = {
+    "pdf": ".pdf",
+    "docx": ".docx",
+    "pptx": ".pptx",
+}
+
+# Bytes read from the start of a file to detect its content type. PDF readers
+# accept a %PDF header anywhere in the first kilobyte.
+SNIFF_SIZE = 1024
+OLE2_SIGNATURE = b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"
+ZIP_SIGNATURE = b"PK\x03\x04"
+
+
+def is_supported(file_path: str) -> bool:
+    """Return True if the file extension maps to a known extractor."""
+    return _extension(file_path) in FORMATS
+
+
+def sniff_content_type(file_path):
+    """Return "pdf", "docx", "pptx", "ooxml", "ole2" or "empty" from the file's leading bytes, or None.
+
+    ``file_path`` may be any document source (see file_loaders.source). Only
+    the header is read, plus the zip directory for OOXML packages, so no
+    document parser is involved.
+    """
+    source = as_source(file_path)
+    head = source.head(SNIFF_SIZE)
+    if not head:
+        return "empty"
+    if b"%PDF-" in head:
+        return "pdf"
+    if head.startswith(OLE2_SIGNATURE):
+        return "ole2"
+    if head.startswith(ZIP_SIGNATURE):
+        try:
+            with zipfile.ZipFile(source.readable()) as package:
+                names = set(package.namelist())
+        except zipfile.BadZipFile:
+            return None
+        if "[Content_Types].xml" not in names:
+            return None
+        if "word/document.xml" in names:
+            return "docx"
+        if "ppt/presentation.xml" in names:
+            return "pptx"
+        return "ooxml"
+    return None
+
+
+def create_extractor(file_path, pdf_engine: str = "compat", sniff: bool = True, pdf_options: dict = None,
+                     plan=None, office_engine: str = "compat"):
+    """Create the extractor (with its loader) that handles the given file.
+
+    ``file_path`` may be a path or any other document source: bytes, a
+    memoryview, an mmap, a binary file object or an ``"<archive>!<member>"``
+    name. The format comes from the source's name; buffers without a name are
+    named from their content. With ``sniff``, the content type is checked
+    against the extension first, so empty, corrupt, legacy binary or
+    mislabeled files raise ValueError before any parser is imported or
+    constructed. ``pdf_options`` are extra PDFExtractor arguments such as
+    ``table_workers``. ``plan`` is an ExtractionPlan (see data_extractor.plan)
+    selecting the artifacts, the page range and the maximum image size.
+    ``office_engine`` selects the DOCX/PPTX engine: "compat" (python-docx and
+    python-pptx) or "xml" (data_extractor.ooxml).
+    """
+    source = as_source(file_path)
+    extension = _extension(source.name)
+    if extension not in FORMATS:
+        raise ValueError("Unsupported file format. Use PDF, DOCX, or PPTX.")
+    if sniff:
+        _check_content_type(source, extension)
+    loader_class, extractor_class = (_import_class(path) for path in FORMATS[extension])
+    if extension == ".pdf":
+        return extractor_class(loader_class(), engine=pdf_engine, plan=plan, **(pdf_options or {}))
+    return extractor_class(loader_class(), plan=plan, engine=office_engine)
+
+
+def _check_content_type(source, extension: str):
+    file_path = source.name
+    content_type = sniff_content_type(source)
+    if content_type == "empty":
+        raise ValueError(f"{file_path} is empty.")
+    if content_type == "ole2":
+        raise ValueError(f"{file_path} is a legacy binary (OLE2) Office file. Save it as PPTX or DOCX.")
+    if content_type not in CONTENT_TYPES:
+        raise ValueError(f"{file_path} is not a PDF, DOCX or PPTX document.")
+    # .ppt files holding a PPTX package share the .pptx pair and are read as PPTX
+    if FORMATS[CONTENT_TYPES[content_type]] != FORMATS[extension]:
+        raise ValueError(f"{file_path} contains a {content_type.upper()} document, not {extension[1:].upper()}.")
+
+
+def _extension(file_path: str) -> str:
+    return "." + file_path.rsplit(".", 1)[-1].lower() if "." in file_path else ""
+
+
+def _import_class(path: str):
+    module_name, class_name = path.split(":")
+    return getattr(importlib.import_module(module_name), class_name)
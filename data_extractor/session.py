@@ -0,0 +1,26 @@
+class DocumentSession:
+    """Keeps one parsed document and any extra handles opened on the same file.
+
+    An extractor creates a session in ``load()`` and every ``extract_*`` call
+    reuses it, so a document is parsed once per library instead of once per call.
+    """
+
+    def __init__(self, file_path, document):
+        self.file_path = file_path
+        self.document = document
+        self._handles = {}
+
+    def get(self, name, opener):
+        """Return the handle cached under ``name``, opening it with ``opener(file_path)`` on first use."""
+        if name not in self._handles:
+            self._handles[name] = opener(self.file_path)
+        return self._handles[name]
+
+    def close(self):
+        """Close every extra handle opened through the session."""
+        for handle in self._handles.values():
+            close = getattr(handle, "close", None)
+            if close is not None:
+                close()
+        self._handles.clear()
+        self.document = None
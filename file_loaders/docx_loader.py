@@ -1,14 +1,16 @@
 import docx
 from file_loaders.file_loader import FileLoader
+from file_loaders.source import as_source
 
 class DOCXLoader(FileLoader):
     
     def validate_file(self, file_path: str) -> bool:
         return file_path.lower().endswith('.docx')
 
-    def load_file(self, file_path: str) -> docx.Document:
-        if not self.validate_file(file_path):
+    def load_file(self, file_path) -> docx.Document:
+        source = as_source(file_path)
+        if not self.validate_file(source.name):
             raise ValueError("Invalid DOCX file.")
-        return docx.Document(file_path)
+        return docx.Document(source.readable())
     
     
\ No newline at end of file
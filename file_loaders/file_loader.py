@@ -9,8 +9,13 @@ class FileLoader(ABC):
         pass
 
     @abstractmethod
-    def load_file(self, file_path: str) -> Any:
-        """Load and return the file object."""
+    def load_file(self, file_path) -> Any:
+        """Load and return the file object.
+
+        ``file_path`` is a path or any other document source accepted by
+        file_loaders.source.as_source (bytes, memoryview, mmap, binary file
+        object, archive member).
+        """
         pass
 
     
\ No newline at end of file
@@ -1,8 +1,12 @@
 import os
-from PyPDF2 import PdfReader
+from typing import TYPE_CHECKING
 # The PdfReader class from the PyPDF2 library is used to read PDF files in Python. It allows you to extract 
 # information from PDF documents, such as text, metadata, and more.
 from file_loaders.file_loader import FileLoader
+from file_loaders.source import as_source
+
+if TYPE_CHECKING:
+    from PyPDF2 import PdfReader
 
 class PDFLoader(FileLoader):
     
@@ -10,9 +14,12 @@ class PDFLoader(FileLoader):
     def validate_file(self, file_path: str) -> bool:
         return file_path.lower().endswith('.pdf')
 
-    def load_file(self, file_path: str) -> PdfReader:
-        if not self.validate_file(file_path):
+    def load_file(self, file_path) -> "PdfReader":
+        source = as_source(file_path)
+        if not self.validate_file(source.name):
             raise ValueError("Invalid PDF file.")
-        return PdfReader(file_path)
+        # Imported here so that non-PDF runs never load PyPDF2
+        from PyPDF2 import PdfReader
+        return PdfReader(source.readable())
 
     
\ No newline at end of file
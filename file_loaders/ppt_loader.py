@@ -1,14 +1,16 @@
 import pptx
 from file_loaders.file_loader import FileLoader
+from file_loaders.source import as_source
 
 class PPTLoader(FileLoader):
     
     def validate_file(self, file_path: str) -> bool:
         return file_path.lower().endswith('.pptx') or file_path.lower().endswith('.ppt')
 
-    def load_file(self, file_path: str) -> pptx.Presentation:
-        if not self.validate_file(file_path):
+    def load_file(self, file_path) -> pptx.Presentation:
+        source = as_source(file_path)
+        if not self.validate_file(source.name):
             raise ValueError("Invalid PPT file.")
-        return pptx.Presentation(file_path)
+        return pptx.Presentation(source.readable())
     
    
\ No newline at end of file
@@ -0,0 +1,238 @@
+"""Documents given as paths, in-memory buffers, file objects or archive members.
+
+Loaders and extractors accept any of:
+
+- a path (``str`` or ``os.PathLike``)
+- ``bytes``, ``bytearray``, ``memoryview`` or an ``mmap.mmap``
+- a binary file object (an ``io.BytesIO``, an open file, a socket file, ...)
+- an archive member written as ``"<archive>!<member>"``, e.g. ``"bundle.zip!docs/report.pdf"``
+- a DocumentSource wrapping any of the above
+
+Everything is wrapped in a DocumentSource. Paths stay paths, so every library
+opens the file itself as before. Other inputs are exposed as one read-only
+memoryview, and every library that takes a file object (PyPDF2, pdfplumber,
+python-docx, python-pptx, zipfile) reads that view through its own cursor
+without copying the document. Only PyMuPDF insists on a ``bytes`` object; a
+buffer that is not one already is copied once and shared by every fitz handle.
+"""
+import io
+import mmap
+import os
+import tarfile
+import zipfile
+
+# Separates an archive path from a member name in a source name
+ARCHIVE_SEPARATOR = "!"
+ARCHIVE_EXTENSIONS = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+
+
+class DocumentSource:
+    """One document to parse, on disk or in memory.
+
+    ``name`` is used wherever a file name is needed (format detection by
+    extension, output folder names, database rows). It defaults to the path,
+    the file object's ``name``, or ``document.<ext>`` with the extension
+    detected from the content.
+    """
+
+    def __init__(self, data, name=None):
+        self.path = None
+        self._buffer = None
+        self._bytes = None
+        if isinstance(data, (str, os.PathLike)):
+            self.path = os.fspath(data)
+        elif isinstance(data, (bytes, bytearray, memoryview, mmap.mmap)):
+            self._buffer = memoryview(data).cast("B")
+        elif hasattr(data, "read"):
+            self._buffer = _file_buffer(data)
+            file_name = getattr(data, "name", None)
+            name = name or (file_name if isinstance(file_name, str) else None)
+        else:
+            raise ValueError(f"Unsupported document source: {type(data).__name__}.")
+        self._name = name or self.path
+
+    @classmethod
+    def from_archive(cls, archive_path, member):
+        """Read one member of a ZIP or TAR archive into memory; nothing is written to disk."""
+        name = f"{archive_path}{ARCHIVE_SEPARATOR}{member}"
+        try:
+            if zipfile.is_zipfile(archive_path):
+                with zipfile.ZipFile(archive_path) as archive:
+                    return cls(archive.read(member), name)
+            with tarfile.open(archive_path) as archive:
+                member_file = archive.extractfile(member)
+                if member_file is None:
+                    raise ValueError(f"{name} is not a regular file.")
+                return cls(member_file.read(), name)
+        except KeyError:
+            raise ValueError(f"{name} does not exist.") from None
+
+    @property
+    def name(self):
+        if self._name is None:
+            # Imported here: the registry imports this module
+            from data_extractor.registry import CONTENT_TYPES, sniff_content_type
+            self._name = "document" + CONTENT_TYPES.get(sniff_content_type(self), "")
+        return self._name
+
+    @property
+    def reference(self):
+        """What image references and worker processes should hold: the path on disk, or this source."""
+        return self.path if self.path is not None else self
+
+    @property
+    def buffer(self):
+        """A read-only memoryview of the whole document (memory-mapped for files on disk)."""
+        if self._buffer is None:
+            with open(self.path, "rb") as f:
+                self._buffer = _file_buffer(f)
+        return self._buffer
+
+    def head(self, size):
+        """Return the first ``size`` bytes."""
+        if self.path is not None:
+            with open(self.path, "rb") as f:
+                return f.read(size)
+        return bytes(self.buffer[:size])
+
+    def readable(self):
+        """Return the path on disk, or a new seekable binary reader over the shared buffer."""
+        if self.path is not None:
+            return self.path
+        return BufferReader(self.buffer)
+
+    def as_bytes(self):
+        """Return the document as ``bytes``, copying the buffer at most once (for PyMuPDF)."""
+        if self._bytes is None:
+            underlying = self.buffer.obj
+            if isinstance(underlying, bytes) and len(underlying) == self.buffer.nbytes:
+                self._bytes = underlying
+            else:
+                self._bytes = self.buffer.tobytes()
+        return self._bytes
+
+    def open_fitz(self):
+        """Open the document with PyMuPDF."""
+        import fitz
+        if self.path is not None:
+            return fitz.open(self.path)
+        return fitz.open(stream=self.as_bytes(), filetype="pdf")
+
+    def __len__(self):
+        if self.path is not None and self._buffer is None:
+            return os.path.getsize(self.path)
+        return self.buffer.nbytes
+
+    def __reduce__(self):
+        # Paths are sent to worker processes as paths; buffers (mmaps cannot be pickled) as bytes
+        if self.path is not None:
+            return DocumentSource, (self.path, self._name)
+        return DocumentSource, (self.as_bytes(), self._name)
+
+    def __repr__(self):
+        if self.path is not None:
+            return f"DocumentSource({self.path!r})"
+        return f"DocumentSource(<{len(self)} bytes>, name={self._name!r})"
+
+
+class BufferReader(io.RawIOBase):
+    """Seekable, read-only binary file over a memoryview. Reads slice the view instead of copying the document."""
+
+    def __init__(self, view):
+        super().__init__()
+        self._view = view
+        self._position = 0
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def read(self, size=-1):
+        end = self._view.nbytes if size is None or size < 0 else min(self._position + size, self._view.nbytes)
+        data = self._view[self._position:end].tobytes()
+        self._position = max(self._position, end)
+        return data
+
+    def readall(self):
+        return self.read()
+
+    def readinto(self, target):
+        data = self.read(len(target))
+        target[:len(data)] = data
+        return len(data)
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self._view.nbytes + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        if position < 0:
+            raise ValueError("Negative seek position")
+        self._position = position
+        return position
+
+    def tell(self):
+        return self._position
+
+
+def as_source(data, name=None):
+    """Wrap ``data`` in a DocumentSource, or return it unchanged if it already is one."""
+    if isinstance(data, DocumentSource):
+        return data
+    if isinstance(data, str) and name is None:
+        archive_member = split_archive_member(data)
+        if archive_member is not None:
+            return DocumentSource.from_archive(*archive_member)
+    return DocumentSource(data, name)
+
+
+def source_name(data):
+    """Return the file name used for ``data``: the string itself for paths and archive members."""
+    if isinstance(data, (str, os.PathLike)):
+        return os.fspath(data)
+    return as_source(data).name
+
+
+def is_archive(path):
+    return str(path).lower().endswith(ARCHIVE_EXTENSIONS)
+
+
+def split_archive_member(name):
+    """Return (archive path, member) for an ``"<archive>!<member>"`` name whose archive exists, otherwise None."""
+    if ARCHIVE_SEPARATOR not in name or os.path.exists(name):
+        return None
+    archive_path, member = name.split(ARCHIVE_SEPARATOR, 1)
+    if not (is_archive(archive_path) and os.path.isfile(archive_path)):
+        return None
+    return archive_path, member
+
+
+def archive_members(archive_path):
+    """Return the names of the regular files in a ZIP or TAR archive, in archive order."""
+    if zipfile.is_zipfile(archive_path):
+        with zipfile.ZipFile(archive_path) as archive:
+            return [info.filename for info in archive.infolist() if not info.is_dir()]
+    with tarfile.open(archive_path) as archive:
+        return [member.name for member in archive.getmembers() if member.isfile()]
+
+
+def _file_buffer(file_object):
+    """Return a read-only memoryview of a binary file object's whole content, without copying when possible."""
+    if isinstance(file_object, io.BytesIO):
+        return file_object.getbuffer().toreadonly()
+    try:
+        fileno = file_object.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        fileno = None
+    if fileno is not None and os.fstat(fileno).st_size > 0:
+        # Files on disk are memory-mapped, so pages are read by the OS only when a parser touches them
+        return memoryview(mmap.mmap(fileno, 0, access=mmap.ACCESS_READ))
+    if getattr(file_object, "seekable", lambda: False)():
+        file_object.seek(0)
+    return memoryview(file_object.read())
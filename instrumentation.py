@@ -0,0 +1,337 @@
+"""Per-stage timing, item and byte counts for extractors and storage backends.
+
+Extractor and Storage subclasses list the methods to measure in their
+``INSTRUMENTED`` attribute, and those methods are wrapped when the class is
+defined. While instrumentation is disabled (the default), a wrapped call costs
+one global lookup. Once enable() is called, every call records its wall and
+CPU time, the items and bytes it produced (extractors) or received (storage),
+and whether it raised. Records are added to in-process totals and, optionally,
+appended as JSON lines to a trace file.
+
+Usage:
+    import instrumentation
+    instrumentation.enable("trace.jsonl")
+    ...  # extract and store documents
+    instrumentation.write_prometheus(instrumentation.get_recorder().totals, "metrics.prom")
+    instrumentation.disable()
+
+Stages nest: extract_all() on the base class calls the extract_* stages, and
+save_pages() calls _write_image(), so totals of nested stages overlap.
+
+set_stage_listener() reports the innermost running stage as it changes, even
+while recording is disabled; the batch supervisor uses it to tell which phase
+a document was in when it timed out or ran out of memory.
+"""
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import os
+import time
+from collections.abc import Iterable, Sized
+
+_recorder = None
+# Called with the innermost running stage ("Component.stage") whenever it changes
+_stage_listener = None
+# Stages running in this process, outermost first
+_active_stages = []
+# Source document that storage stages are working on, set with document()
+_current_document = contextvars.ContextVar("current_document", default=None)
+
+METRICS = (
+    ("calls", "extractor_stage_calls_total", "Number of calls of each stage."),
+    ("errors", "extractor_stage_errors_total", "Number of calls of each stage that raised."),
+    ("seconds", "extractor_stage_seconds_total", "Wall time spent in each stage."),
+    ("cpu_seconds", "extractor_stage_cpu_seconds_total", "CPU time spent in each stage."),
+    ("items", "extractor_stage_items_total", "Items produced (extractors) or received (storage) by each stage."),
+    ("bytes", "extractor_stage_bytes_total", "Payload bytes produced (extractors) or received (storage) by each stage."),
+)
+
+# Parameter names of the payload that storage stages ("input" measure) are given
+DATA_PARAMETERS = ("data", "items", "pages", "images", "image", "urls", "tables", "table", "frame", "metadata")
+
+
+class Recorder:
+    """Collects stage records in memory and optionally appends them to a JSON-lines trace."""
+
+    def __init__(self, trace_path=None):
+        self.trace_path = trace_path
+        self.totals = {}
+        # Line buffered so records survive a worker process that exits without closing
+        self._trace = open(trace_path, "a", buffering=1) if trace_path else None
+
+    def record(self, component, stage, document, seconds, cpu_seconds, items, nbytes, error=None):
+        _add(self.totals, component, stage, seconds, cpu_seconds, items, nbytes, error is not None)
+        if self._trace is not None:
+            entry = {"time": time.time(), "pid": os.getpid(), "document": document, "component": component,
+                     "stage": stage, "seconds": seconds, "cpu_seconds": cpu_seconds, "items": items, "bytes": nbytes}
+            if error is not None:
+                entry["error"] = error
+            self._trace.write(json.dumps(entry) + "\n")
+
+    def close(self):
+        if self._trace is not None:
+            self._trace.close()
+            self._trace = None
+
+
+def enable(trace_path=None):
+    """Start recording in this process and return the Recorder."""
+    global _recorder
+    disable()
+    _recorder = Recorder(trace_path)
+    return _recorder
+
+
+def disable():
+    """Stop recording and close the trace file."""
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+        _recorder = None
+
+
+def get_recorder():
+    return _recorder
+
+
+def set_stage_listener(listener):
+    """Call ``listener(stage)`` whenever the innermost running stage changes; None removes the listener.
+
+    ``stage`` is "Component.stage", or None once the outermost stage has
+    returned. When a stage raises, the listener is not told about the
+    stages unwound, so it keeps the stage that failed.
+    """
+    global _stage_listener
+    _stage_listener = listener
+    _active_stages.clear()
+
+
+@contextlib.contextmanager
+def document(file_path):
+    """Attribute storage stages run inside the block to ``file_path``."""
+    token = _current_document.set(file_path)
+    try:
+        yield
+    finally:
+        _current_document.reset(token)
+
+
+def instrument(cls, measure="result"):
+    """Wrap the methods named in ``cls.INSTRUMENTED`` that ``cls`` itself defines.
+
+    ``measure`` picks what items and bytes are counted from: the method's
+    return value ("result") or its data argument ("input"), the first
+    parameter named in DATA_PARAMETERS, whatever its type. A generator or
+    other unsized iterable argument is counted item by item as it is consumed.
+    """
+    for name in getattr(cls, "INSTRUMENTED", ()):
+        method = cls.__dict__.get(name)
+        if method is None or getattr(method, "__instrumented__", False):
+            continue
+        setattr(cls, name, _wrap(method, cls.__name__, name.lstrip("_"), measure))
+
+
+def _wrap(method, component, stage, measure):
+    data_parameter = _data_parameter(method) if measure == "input" else None
+    if inspect.isgeneratorfunction(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if _recorder is None and _stage_listener is None:
+                return method(self, *args, **kwargs)
+            return _traced_generator(method(self, *args, **kwargs), self, component, stage)
+    else:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if _recorder is None and _stage_listener is None:
+                return method(self, *args, **kwargs)
+            counted = None
+            if _recorder is not None and data_parameter is not None:
+                # Generators and other unsized iterables are measured as the stage consumes them
+                args, kwargs, counted = _count_argument(data_parameter, args, kwargs)
+            _enter_stage(component, stage)
+            start_wall, start_cpu = time.perf_counter(), time.process_time()
+            error = None
+            result = None
+            try:
+                result = method(self, *args, **kwargs)
+                return result
+            except BaseException as exc:
+                error = f"{type(exc).__name__}: {exc}"
+                raise
+            finally:
+                _exit_stage(error is not None)
+                seconds, cpu_seconds = time.perf_counter() - start_wall, time.process_time() - start_cpu
+                recorder = _recorder
+                if recorder is not None:
+                    if measure == "result":
+                        items, nbytes = _measure(result)
+                    elif counted is not None:
+                        items, nbytes = counted.items, counted.nbytes
+                    else:
+                        items, nbytes = _measure(_argument(data_parameter, args, kwargs))
+                    recorder.record(component, stage, _document_of(self), seconds, cpu_seconds, items, nbytes,
+                                    error)
+    wrapper.__instrumented__ = True
+    return wrapper
+
+
+def _data_parameter(method):
+    """Return (position after self, name) of the method's data parameter, or None if it has none."""
+    parameters = list(inspect.signature(method).parameters)[1:]
+    for position, name in enumerate(parameters):
+        if name in DATA_PARAMETERS:
+            return position, name
+    return None
+
+
+def _argument(parameter, args, kwargs):
+    if parameter is None:
+        return None
+    position, name = parameter
+    if name in kwargs:
+        return kwargs[name]
+    return args[position] if position < len(args) else None
+
+
+def _count_argument(parameter, args, kwargs):
+    """Replace an unsized iterable data argument with a _CountedIterable; return (args, kwargs, counted or None)."""
+    value = _argument(parameter, args, kwargs)
+    if value is None or isinstance(value, (str, bytes, bytearray, memoryview, Sized)) \
+            or not isinstance(value, Iterable):
+        return args, kwargs, None
+    counted = _CountedIterable(value)
+    position, name = parameter
+    if name in kwargs:
+        kwargs = {**kwargs, name: counted}
+    else:
+        args = args[:position] + (counted,) + args[position + 1:]
+    return args, kwargs, counted
+
+
+class _CountedIterable:
+    """Pass the items of an iterable through, counting them and their payload bytes."""
+
+    def __init__(self, iterable):
+        self.iterable = iterable
+        self.items = 0
+        self.nbytes = 0
+
+    def __iter__(self):
+        for item in self.iterable:
+            self.items += 1
+            self.nbytes += _measure(item)[1]
+            yield item
+
+
+def _traced_generator(generator, owner, component, stage):
+    """Time only the work done inside ``generator``, not the consumer's, and count what it yields."""
+    seconds = cpu_seconds = 0.0
+    items = nbytes = 0
+    error = None
+    try:
+        while True:
+            _enter_stage(component, stage)
+            start_wall, start_cpu = time.perf_counter(), time.process_time()
+            try:
+                item = next(generator)
+            except StopIteration:
+                return
+            except BaseException as exc:
+                error = f"{type(exc).__name__}: {exc}"
+                raise
+            finally:
+                _exit_stage(error is not None)
+                seconds += time.perf_counter() - start_wall
+                cpu_seconds += time.process_time() - start_cpu
+            items += 1
+            if _recorder is not None:
+                nbytes += _measure(item)[1]
+            yield item
+    finally:
+        generator.close()
+        recorder = _recorder
+        if recorder is not None:
+            recorder.record(component, stage, _document_of(owner), seconds, cpu_seconds, items, nbytes, error)
+
+
+def _enter_stage(component, stage):
+    listener = _stage_listener
+    if listener is not None:
+        _active_stages.append(f"{component}.{stage}")
+        listener(_active_stages[-1])
+
+
+def _exit_stage(failed):
+    listener = _stage_listener
+    if listener is not None and _active_stages:
+        _active_stages.pop()
+        if not failed:
+            listener(_active_stages[-1] if _active_stages else None)
+
+
+def _document_of(owner):
+    return getattr(owner, "file_path", None) or _current_document.get()
+
+
+def _measure(value):
+    """Return (items, payload bytes) of a stage's result or input."""
+    if value is None:
+        return 0, 0
+    if isinstance(value, str):
+        return 1, len(value.encode("utf-8", "replace"))
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return 1, len(value)
+    if isinstance(value, dict):
+        # Image records carry their size; other records count their text payload
+        if isinstance(value.get("size"), int):
+            return 1, value["size"]
+        return 1, sum(_measure(item)[1] for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return len(value), sum(_measure(item)[1] for item in value)
+    return 0, 0
+
+
+def _add(totals, component, stage, seconds, cpu_seconds, items, nbytes, failed):
+    entry = totals.setdefault((component, stage), {"calls": 0, "errors": 0, "seconds": 0.0, "cpu_seconds": 0.0,
+                                                   "items": 0, "bytes": 0})
+    entry["calls"] += 1
+    entry["errors"] += failed
+    entry["seconds"] += seconds
+    entry["cpu_seconds"] += cpu_seconds
+    entry["items"] += items
+    entry["bytes"] += nbytes
+
+
+def totals_from_traces(trace_paths):
+    """Aggregate JSON-lines traces (e.g. one per worker process) into stage totals."""
+    totals = {}
+    for trace_path in trace_paths:
+        with open(trace_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                _add(totals, entry["component"], entry["stage"], entry["seconds"], entry["cpu_seconds"],
+                     entry["items"], entry["bytes"], "error" in entry)
+    return totals
+
+
+def write_prometheus(totals, path):
+    """Write stage totals in the Prometheus text exposition format (e.g. for the node_exporter textfile collector)."""
+    lines = []
+    for field, metric, help_text in METRICS:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} counter")
+        for (component, stage), entry in sorted(totals.items()):
+            lines.append(f'{metric}{{component="{_escape(component)}",stage="{_escape(stage)}"}} {entry[field]}')
+    # Written next to the target and renamed so a scraper never reads a partial file
+    temp_path = path + ".tmp"
+    with open(temp_path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    os.replace(temp_path, path)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
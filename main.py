@@ -1,14 +1,67 @@
+import hashlib
 import os
-from tkinter import Tk
-from tkinter.filedialog import askopenfilename
-from data_extractor.docx_extractor import DOCXExtractor
-from data_extractor.pdf_extractor import PDFExtractor
-from data_extractor.pptx_extractor import PPTXExtractor
-from file_loaders.pdf_loader import PDFLoader
-from file_loaders.docx_loader import DOCXLoader
-from file_loaders.ppt_loader import PPTLoader
+import instrumentation
+from data_extractor.registry import create_extractor
+from file_loaders.source import source_name
 from storage.file_storage import FileStorage
 from storage.sql_storage import SQLStorage
+
+# Hex digits of the source name hash in each document's output folder name
+OUTPUT_HASH_LENGTH = 8
+ 
+ 
+def output_dir_for(file_path, output_root="extracted_data"):
+    """Return <output_root>/<file name>-<hash>, unique to the document's full source name.
+
+    The name keeps its extension and the short hash of the absolute path (or archive
+    member name) tells apart documents with the same name in different places.
+    """
+    file_path = source_name(file_path)
+    digest = hashlib.sha256(os.path.abspath(file_path).encode()).hexdigest()[:OUTPUT_HASH_LENGTH]
+    return os.path.join(output_root, f"{os.path.basename(file_path)}-{digest}")
+
+
+def save_to_files(file_path, pages, output_root="extracted_data", storage_options=None):
+    """Save per-page records under output_dir_for(file_path, output_root) and return that folder.
+ 
+    Image files go to the shared <output_root>/_images store, named by content hash,
+    so an image repeated across documents is written once. ``storage_options`` are
+    passed to FileStorage (columnar_tables, table_format).
+    """
+    file_path = source_name(file_path)
+    output_dir = output_dir_for(file_path, output_root)
+    file_storage = FileStorage(output_dir, image_dir=os.path.join(output_root, "_images"), **(storage_options or {}))
+ 
+    # Save the text, images, URLs and tables page by page
+    with instrumentation.document(file_path):
+        file_storage.store(pages, os.path.basename(file_path), 'pages')
+ 
+    file_storage.close()
+    return output_dir
+ 
+ 
+class PageCounter:
+    """Pass page records through as they are produced, counting them and appending each to ``kept`` if given."""
+
+    def __init__(self, pages, kept=None):
+        self.pages = pages
+        self.kept = kept
+        self.count = 0
+
+    def __iter__(self):
+        for page in self.pages:
+            self.count += 1
+            if self.kept is not None:
+                self.kept.append(page)
+            yield page
+
+
+def save_to_sql(sql_storage, file_path, pages):
+    """Store the document and its pages in the normalized SQL schema and return its id."""
+    file_path = source_name(file_path)
+    with instrumentation.document(file_path):
+        return sql_storage.store_document(file_path, pages)
+ 
  
 def main():
     """
@@ -19,6 +72,10 @@ def main():
     to extract content, and then saves the extracted data to a folder and a SQL database.
     """
  
+    # Imported here so that headless entry points (batch.py) can reuse this module without Tk
+    from tkinter import Tk
+    from tkinter.filedialog import askopenfilename
+ 
     # Create a Tkinter root window (it won't be shown)
     root = Tk()
     root.withdraw()  # Hide the root window
@@ -35,72 +92,22 @@ def main():
         return
  
     # Determine the file type and use the appropriate loader
-    if file_path.endswith(".pdf"):
-        loader = PDFLoader()
-        extractor = PDFExtractor(loader)
-    elif file_path.endswith(".docx"):
-        loader = DOCXLoader()
-        extractor = DOCXExtractor(loader)
-    elif file_path.endswith(".pptx") or file_path.endswith(".ppt"):
-        loader = PPTLoader()
-        extractor = PPTXExtractor(loader)
-    else:
-        raise ValueError("Unsupported file format. Use PDF, DOCX, or PPTX.")
- 
-    # Extract text from the file
-    extractor.load(file_path)
-    extracted_text = extractor.extract_text()
- 
-    # Extract images (if available)
-    images = extractor.extract_images()
- 
-    # Extract URLs (if it's a PDF or DOCX)
-    urls = extractor.extract_urls()
- 
-    # Extract tables (for PDFs or DOCX only)
-    tables = extractor.extract_tables()
- 
-    # Create a folder for storing the extracted data
-    base_name = os.path.splitext(os.path.basename(file_path))[0]
-    output_dir = os.path.join("extracted_data", base_name)
-    file_storage = FileStorage(output_dir)
- 
-    # Save the extracted text
-    file_storage.store(extracted_text, os.path.basename(file_path), 'text')
- 
-    # Save the extracted images
-    if images:
-        file_storage.store(images, os.path.basename(file_path), 'image')
- 
-    # Save the extracted URLs (if any)
-    if urls:
-        file_storage.store(urls, os.path.basename(file_path), 'url')
- 
-    # Save the extracted tables (if any)
-    if tables:
-        file_storage.store(tables, os.path.basename(file_path), 'table')
+    extractor = create_extractor(file_path)
  
+    # Load the file once and extract text, images, URLs and tables page by page; each page is
+    # written to the folder as it is extracted, and its record (image references, not bytes)
+    # is kept for the SQL database
+    extractor.load(file_path)
+    pages = []
+    try:
+        output_dir = save_to_files(file_path, PageCounter(extractor.iter_pages(), pages))
+    finally:
+        extractor.close()
     print(f"Extracted data saved to: {output_dir}")
  
     # Create an instance of SQLStorage
     sql_storage = SQLStorage("assignment4.db")
- 
-    # Store the extracted text in the SQL database
-    sql_storage.store("text", extracted_text)
- 
-    # Store the extracted images in the SQL database
-    if images:
-        sql_storage.store("image", images)
- 
-    # Store the extracted URLs in the SQL database
-    if urls:
-        sql_storage.store("url", urls)
- 
-    # Store the extracted tables in the SQL database
-    if tables:
-        for table in tables:
-            sql_storage.store("data_table", table)
- 
+    save_to_sql(sql_storage, file_path, pages)
     print("Data stored in SQL database")
     sql_storage.close()
  
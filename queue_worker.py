@@ -0,0 +1,206 @@
+"""Extract documents from a shared, crash-safe SQLite job queue (see storage/job_queue.py).
+
+Any number of worker processes, started by one or several ``work`` commands,
+pull documents from the same queue. Each claims a job under a lease, renews
+the lease from a heartbeat thread while the extractor runs, saves the document
+with FileStorage (and SQLStorage) and marks the job done. A worker that
+crashes or is killed leaves its job to be claimed again once the lease runs
+out, up to the job's ``max_attempts``; an exception raised by the extractor
+fails the job at once. Finished documents are never extracted again. A document stored in
+SQL just before its worker died may be stored a second time.
+
+Usage:
+    python queue_worker.py enqueue files/ "reports/**/*.pdf" bundle.zip --queue job_queue.db
+    python queue_worker.py work --queue job_queue.db --workers 4 --lease 120
+    python queue_worker.py stats --queue job_queue.db
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from batch import collect_files, extract_document
+from data_extractor.plan import ARTIFACTS, ExtractionPlan
+from main import save_to_sql
+from storage.job_queue import DEFAULT_LEASE_SECONDS, QUEUE_FILENAME, JobQueue
+from storage.sql_storage import SQLStorage
+
+# Seconds a worker's SQL write waits for the other workers' writes to the shared database
+SQL_BUSY_TIMEOUT = 300
+
+
+class _Heartbeat(threading.Thread):
+    """Renew a job's lease every ``lease_seconds / 3`` seconds until stopped, on its own queue connection."""
+
+    def __init__(self, queue_path, lease_seconds, job_id, worker):
+        super().__init__(daemon=True)
+        self.queue_path = queue_path
+        self.lease_seconds = lease_seconds
+        self.job_id = job_id
+        self.worker = worker
+        self.lost = False
+        self._stopped = threading.Event()
+
+    def run(self):
+        queue = JobQueue(self.queue_path, lease_seconds=self.lease_seconds)
+        try:
+            while not self._stopped.wait(self.lease_seconds / 3):
+                if not queue.heartbeat(self.job_id, self.worker):
+                    self.lost = True
+                    return
+        finally:
+            queue.close()
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+
+def run_worker(queue_path=QUEUE_FILENAME, output_root="extracted_data", db_path="assignment4.db",
+               pdf_engine="compat", office_engine="compat", plan=None, lease_seconds=DEFAULT_LEASE_SECONDS,
+               poll_interval=None):
+    """Claim and extract jobs until the queue is empty, and return the number of documents completed.
+
+    With ``poll_interval``, an empty queue is polled every that many seconds
+    instead, so the worker keeps serving jobs enqueued later.
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    queue = JobQueue(queue_path, lease_seconds=lease_seconds)
+    # WAL lets the workers' document writes queue up behind each other without blocking readers
+    # A long busy timeout lets a document write wait for the other workers' writes instead of failing
+    sql_storage = SQLStorage(db_path, journal_mode="WAL", busy_timeout=SQL_BUSY_TIMEOUT) if db_path else None
+    completed = 0
+    try:
+        while True:
+            job = queue.claim(worker)
+            if job is None:
+                if not poll_interval:
+                    return completed
+                time.sleep(poll_interval)
+                continue
+            heartbeat = _Heartbeat(queue_path, lease_seconds, job["id"], worker)
+            heartbeat.start()
+            try:
+                result = extract_document(job["key"], output_root, pdf_engine, None, None, plan, office_engine,
+                                          sql_storage is not None)
+                if sql_storage is not None and not heartbeat.lost:
+                    save_to_sql(sql_storage, job["key"], result["pages"])
+            except Exception as error:
+                heartbeat.stop()
+                # As under supervisor.py, only running out of memory is retried; other errors would repeat.
+                # A database still locked by other workers after the busy timeout is retried too
+                retry = isinstance(error, (MemoryError, sqlite3.OperationalError))
+                queue.fail(job["id"], worker, f"{type(error).__name__}: {error}", retry=retry)
+                print(f"FAILED {job['key']} (attempt {job['attempts']}): {type(error).__name__}: {error}")
+                continue
+            heartbeat.stop()
+            if queue.complete(job["id"], worker, result["page_count"], result["output_dir"]):
+                completed += 1
+                print(f"OK     {job['key']} -> {result['output_dir']}")
+            else:
+                print(f"LOST   {job['key']}: the lease expired and the job was handed to another worker")
+    finally:
+        queue.close()
+        if sql_storage is not None:
+            sql_storage.close()
+
+
+def _worker_process(results, worker_options):
+    results.put(run_worker(**worker_options))
+
+
+def run_workers(workers=None, **worker_options):
+    """Run ``workers`` worker processes (default: CPU count) over one queue and return the documents completed."""
+    context = multiprocessing.get_context()
+    results = context.SimpleQueue()
+    # Not daemons: extractors may start their own page or table worker processes
+    processes = [context.Process(target=_worker_process, args=(results, worker_options))
+                 for _ in range(workers or os.cpu_count() or 1)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    # A worker that crashed reports nothing; its job is claimed again once the lease expires
+    completed = 0
+    while not results.empty():
+        completed += results.get()
+    return completed
+
+
+def print_stats(stats):
+    oldest = stats["oldest_queued_seconds"]
+    print(f"Queued: {stats['queued']}  Running: {stats['running']} ({stats['expired']} expired)  "
+          f"Done: {stats['done']}  Failed: {stats['failed']}")
+    print(f"Throughput: {stats['documents_per_sec']:.2f} documents/sec, {stats['pages_per_sec']:.2f} pages/sec"
+          + (f"  Oldest queued: {oldest:.0f}s" if oldest is not None else ""))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Shared SQLite job queue for document extraction.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    enqueue = subparsers.add_parser("enqueue", help="Add documents to the queue")
+    enqueue.add_argument("paths", nargs="+", help="Files, directories, glob patterns or archives")
+    enqueue.add_argument("--max-attempts", type=int, default=3, help="Attempts per document before it fails")
+    work = subparsers.add_parser("work", help="Extract queued documents")
+    work.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    work.add_argument("--lease", type=float, default=DEFAULT_LEASE_SECONDS,
+                      help="Seconds a job stays claimed without a heartbeat")
+    work.add_argument("--poll", type=float, help="Keep polling an empty queue every this many seconds")
+    work.add_argument("--output-dir", default="extracted_data", help="Root folder for FileStorage output")
+    work.add_argument("--db", default="assignment4.db", help="SQLite database for SQLStorage")
+    work.add_argument("--no-sql", action="store_true", help="Skip writing to the SQL database")
+    work.add_argument("--pdf-engine", default="compat", choices=["compat", "pymupdf"], help="PDF extraction engine")
+    work.add_argument("--office-engine", default="compat", choices=["compat", "xml"],
+                      help="DOCX/PPTX extraction engine")
+    work.add_argument("--artifacts", default=",".join(ARTIFACTS),
+                      help="Comma-separated artifacts to extract (default: all of text,images,urls,tables)")
+    work.add_argument("--pages", help="Page/slide range to extract: N, N-M, N- or -M (default: all)")
+    work.add_argument("--max-image-size", type=int, help="Skip images larger than this, in KB")
+    stats = subparsers.add_parser("stats", help="Print queue depth and processing rates")
+    stats.add_argument("--window", type=float, default=60, help="Seconds of finished jobs the rates cover")
+    stats.add_argument("--retry-failed", action="store_true", help="Requeue failed documents first")
+    for command in (enqueue, work, stats):
+        command.add_argument("--queue", default=QUEUE_FILENAME, help="SQLite job queue database")
+    args = parser.parse_args(argv)
+
+    if args.command == "enqueue":
+        file_paths = collect_files(args.paths)
+        queue = JobQueue(args.queue)
+        try:
+            added = queue.enqueue(file_paths, max_attempts=args.max_attempts)
+        finally:
+            queue.close()
+        print(f"Enqueued {added} of {len(file_paths)} documents ({len(file_paths) - added} already queued)")
+        return 0
+
+    if args.command == "work":
+        try:
+            plan = ExtractionPlan.parse(args.artifacts, args.pages,
+                                        args.max_image_size and args.max_image_size * 2**10)
+        except ValueError as error:
+            parser.error(str(error))
+        start = time.perf_counter()
+        completed = run_workers(args.workers, queue_path=args.queue, output_root=args.output_dir,
+                                db_path=None if args.no_sql else args.db, pdf_engine=args.pdf_engine,
+                                office_engine=args.office_engine, plan=plan, lease_seconds=args.lease,
+                                poll_interval=args.poll)
+        print(f"\nCompleted {completed} documents in {time.perf_counter() - start:.2f}s")
+
+    queue = JobQueue(args.queue)
+    try:
+        if args.command == "stats" and args.retry_failed:
+            print(f"Requeued {queue.requeue_failed()} failed documents")
+        failures = queue.failures()
+        print_stats(queue.stats(getattr(args, "window", 60)))
+    finally:
+        queue.close()
+    for key, attempts, error in failures:
+        print(f"  {key}: {error} after {attempts} attempts")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
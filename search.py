@@ -0,0 +1,53 @@
+"""Full-text search over the pages stored by SQLStorage.
+
+Usage:
+    python search.py "quarterly revenue" --db assignment4.db --limit 10
+    python search.py '"exact phrase" OR extract*' --raw --json
+"""
+import argparse
+import json
+import time
+
+from storage.sql_storage import SQLStorage
+
+
+def format_hit(hit):
+    return f"{hit['file_name']} p.{hit['page_number']} (doc {hit['document_id']}, {hit['score']:.2f})  {hit['snippet']}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("query", help="Words that must all appear on a page (or an FTS5 query with --raw)")
+    parser.add_argument("--db", default="assignment4.db", help="SQLite database written by SQLStorage")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of hits")
+    parser.add_argument("--document-id", type=int, help="Only search this document")
+    parser.add_argument("--raw", action="store_true", help="Pass the query to FTS5 unchanged")
+    parser.add_argument("--json", action="store_true", help="Print the hits as one JSON array")
+    parser.add_argument("--rebuild", action="store_true", help="Re-index every stored page before searching")
+    args = parser.parse_args(argv)
+
+    sql_storage = SQLStorage(args.db)
+    try:
+        if args.rebuild:
+            sql_storage.rebuild_search_index()
+        start = time.perf_counter()
+        try:
+            hits = sql_storage.search(args.query, limit=args.limit, document_id=args.document_id, raw=args.raw)
+        except ValueError as error:
+            print(error)
+            return 2
+        elapsed = time.perf_counter() - start
+    finally:
+        sql_storage.close()
+
+    if args.json:
+        print(json.dumps(hits, indent=4))
+    else:
+        for hit in hits:
+            print(format_hit(hit))
+        print(f"{len(hits)} hit(s) in {elapsed * 1000:.1f} ms")
+    return 0 if hits else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
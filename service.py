@@ -0,0 +1,279 @@
+"""Resident extraction service with pre-warmed worker processes.
+
+Clients send JSON lines over a Unix socket (or localhost TCP), one job per line:
+
+    {"id": 1, "path": "files/sample.pdf", "pdf_engine": "pymupdf"}
+
+and get one JSON line back per job as soon as it finishes (not necessarily in
+request order). Workers import every parser library once at start-up, so a
+job only pays for parsing. Each worker saves its document with FileStorage,
+and the service writes SQLStorage from a single thread.
+
+If a worker dies (a crash or the OOM killer), the pool is replaced and
+re-warmed, and the jobs it was running are tried once more; a job that breaks
+the new pool too fails on its own. A job running longer than ``job_timeout``
+fails, and its pool is replaced the same way to stop it.
+
+Usage:
+    python service.py serve --socket /tmp/extractor.sock --workers 4
+    python service.py submit --socket /tmp/extractor.sock files/sample.pdf files/test.docx
+"""
+import argparse
+import asyncio
+import functools
+import json
+import os
+import signal
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from batch import extract_document
+from main import save_to_sql
+from storage.sql_storage import SQLStorage
+
+# Modules imported by every worker before it accepts jobs
+WARM_MODULES = ("fitz", "pdfplumber", "PyPDF2", "docx", "pptx", "PIL.Image",
+                "data_extractor.registry", "storage.file_storage")
+
+
+def _warm_worker():
+    """Process-pool initializer: import the heavy parser stacks once per worker."""
+    import importlib
+    for module in WARM_MODULES:
+        importlib.import_module(module)
+
+
+def _ping():
+    return os.getpid()
+
+
+class ExtractionService:
+    def __init__(self, socket_path=None, host="127.0.0.1", port=8765, workers=None, max_concurrency=None,
+                 output_root="extracted_data", db_path="assignment4.db", pdf_engine="compat", job_timeout=None):
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+        self.workers = workers or os.cpu_count() or 1
+        # Jobs in flight across all connections; further requests wait, which stops
+        # the connection from being read and pushes back on the client
+        self.max_concurrency = max_concurrency or self.workers * 2
+        self.output_root = output_root
+        self.db_path = db_path
+        self.pdf_engine = pdf_engine
+        # Seconds a job may run before it fails and its worker pool is replaced
+        self.job_timeout = job_timeout
+        self._server = None
+        self._pool = None
+        self._pool_lock = None
+        self._sql_thread = None
+        self._sql_storage = None
+        self._slots = None
+
+    async def start(self):
+        """Start the worker pool, warm every worker and begin accepting connections."""
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._pool_lock = asyncio.Lock()
+        self._pool = await self._start_pool()
+        self._sql_thread = ThreadPoolExecutor(max_workers=1)
+        if self.socket_path:
+            self._server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        else:
+            self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+
+    async def _start_pool(self):
+        loop = asyncio.get_running_loop()
+        pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        # One round-trip per worker makes the pool spawn and warm up before the first job
+        await asyncio.gather(*(loop.run_in_executor(pool, _ping) for _ in range(self.workers)))
+        return pool
+
+    async def _replace_pool(self, broken):
+        """Replace ``broken`` with a fresh, warmed pool, unless another job already did."""
+        async with self._pool_lock:
+            if self._pool is not broken:
+                return
+            # Kill the workers, so a job stuck past its timeout stops; the jobs still running fail
+            # with BrokenProcessPool and are retried on the new pool
+            for process in list((broken._processes or {}).values()):
+                process.kill()
+            await asyncio.to_thread(broken.shutdown, wait=True, cancel_futures=True)
+            self._pool = await self._start_pool()
+
+    async def _extract(self, extract):
+        """Run ``extract`` in the worker pool, replacing the pool if a worker dies or the job times out."""
+        loop = asyncio.get_running_loop()
+        for attempt in range(2):
+            pool = self._pool
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(pool, extract), self.job_timeout)
+            except BrokenProcessPool:
+                await self._replace_pool(pool)
+                if attempt:
+                    raise
+            except asyncio.TimeoutError:
+                await self._replace_pool(pool)
+                raise TimeoutError(f"Timed out after {self.job_timeout:g}s") from None
+
+    async def serve_forever(self):
+        """Serve until SIGINT or SIGTERM, then shut down cleanly."""
+        await self.start()
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        try:
+            await stop.wait()
+        finally:
+            await self.close()
+
+    async def close(self):
+        loop = asyncio.get_running_loop()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        # Draining the pool and the SQL thread blocks, so it runs off the event loop
+        if self._pool is not None:
+            await asyncio.to_thread(self._pool.shutdown)
+            self._pool = None
+        if self._sql_thread is not None:
+            await loop.run_in_executor(self._sql_thread, self._close_sql)
+            await asyncio.to_thread(self._sql_thread.shutdown)
+            self._sql_thread = None
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    async def _handle_connection(self, reader, writer):
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                # Wait for a free slot before reading the next request (backpressure)
+                await self._slots.acquire()
+                task = asyncio.create_task(self._run_job(line, writer, write_lock))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    async def _run_job(self, line, writer, write_lock):
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        job_id = None
+        try:
+            request = json.loads(line)
+            job_id = request.get("id")
+            file_path = request["path"]
+            pdf_engine = request.get("pdf_engine", self.pdf_engine)
+            # Page records only come back from the worker when they are stored in SQL
+            extract = functools.partial(extract_document, file_path, self.output_root, pdf_engine,
+                                        keep_pages=bool(self.db_path))
+            result = await self._extract(extract)
+            document_id = None
+            if self.db_path:
+                document_id = await loop.run_in_executor(self._sql_thread, self._store_sql, file_path,
+                                                         result["pages"])
+            response = {"id": job_id, "status": "ok", "path": file_path, "output_dir": result["output_dir"],
+                        "page_count": result["page_count"], "document_id": document_id}
+        except Exception as error:
+            response = {"id": job_id, "status": "error", "error": f"{type(error).__name__}: {error}"}
+        finally:
+            self._slots.release()
+        response["seconds"] = round(time.perf_counter() - start, 4)
+        async with write_lock:
+            writer.write((json.dumps(response) + "\n").encode())
+            await writer.drain()
+
+    def _store_sql(self, file_path, pages):
+        # Runs on the single SQL thread, which owns the SQLite connection
+        if self._sql_storage is None:
+            self._sql_storage = SQLStorage(self.db_path)
+        return save_to_sql(self._sql_storage, file_path, pages)
+
+    def _close_sql(self):
+        if self._sql_storage is not None:
+            self._sql_storage.close()
+            self._sql_storage = None
+
+
+async def submit(paths, socket_path=None, host="127.0.0.1", port=8765, pdf_engine=None):
+    """Send extraction jobs to a running service and yield each response as it arrives."""
+    if socket_path:
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+
+    async def send_jobs():
+        for job_id, path in enumerate(paths, start=1):
+            request = {"id": job_id, "path": path}
+            if pdf_engine:
+                request["pdf_engine"] = pdf_engine
+            writer.write((json.dumps(request) + "\n").encode())
+            # Honour the service's backpressure instead of buffering every job locally
+            await writer.drain()
+        if writer.can_write_eof():
+            writer.write_eof()
+
+    # Send and receive concurrently so neither side can stall on a full socket buffer
+    sender = asyncio.create_task(send_jobs())
+    try:
+        for _ in paths:
+            line = await reader.readline()
+            if not line:
+                break
+            yield json.loads(line)
+        await sender
+    finally:
+        sender.cancel()
+        writer.close()
+        await writer.wait_closed()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resident document extraction service.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name in ("serve", "submit"):
+        command = subparsers.add_parser(name)
+        command.add_argument("--socket", help="Unix socket path (default: TCP on --host/--port)")
+        command.add_argument("--host", default="127.0.0.1")
+        command.add_argument("--port", type=int, default=8765)
+        command.add_argument("--pdf-engine", choices=["compat", "pymupdf"])
+    serve = subparsers.choices["serve"]
+    serve.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    serve.add_argument("--max-concurrency", type=int, default=None, help="Jobs in flight (default: 2 x workers)")
+    serve.add_argument("--output-dir", default="extracted_data", help="Root folder for FileStorage output")
+    serve.add_argument("--db", default="assignment4.db", help="SQLite database for SQLStorage")
+    serve.add_argument("--no-sql", action="store_true", help="Skip writing to the SQL database")
+    serve.add_argument("--timeout", type=float, help="Seconds a job may run before it fails")
+    subparsers.choices["submit"].add_argument("paths", nargs="+", help="Documents to extract")
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        service = ExtractionService(socket_path=args.socket, host=args.host, port=args.port, workers=args.workers,
+                                    max_concurrency=args.max_concurrency, output_root=args.output_dir,
+                                    db_path=None if args.no_sql else args.db,
+                                    pdf_engine=args.pdf_engine or "compat", job_timeout=args.timeout)
+        asyncio.run(service.serve_forever())
+        return 0
+
+    async def print_responses():
+        failed = 0
+        async for response in submit(args.paths, args.socket, args.host, args.port, args.pdf_engine):
+            failed += response["status"] != "ok"
+            print(json.dumps(response))
+        return failed
+
+    return 1 if asyncio.run(print_responses()) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,173 @@
+"""Typed, columnar copies of extracted tables.
+
+Extractors return tables as lists of rows of strings (or None for empty
+cells). table_to_frame() turns one into a pandas DataFrame: the first row
+becomes the header when it looks like one, and each column is converted to a
+nullable integer, float, datetime or string dtype with whole-column
+(vectorized) parsing; numbers written with leading zeros stay strings.
+write_frame() saves the frame as Parquet or Feather when pyarrow is installed
+and as a compressed NumPy ``.npz`` archive otherwise; read_frame() loads any
+of them back.
+
+pandas and numpy are imported on first use, so plain CSV output never needs them.
+"""
+import importlib.util
+
+FORMATS = ("parquet", "feather", "npz")
+EXTENSIONS = {"parquet": ".parquet", "feather": ".feather", "npz": ".npz"}
+
+# Date layouts tried, in order, on columns that are not numeric; a column is a
+# date column when every non-empty cell parses with one of them
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%d/%m/%Y", "%m/%d/%Y", "%d.%m.%Y", "%d-%m-%Y", "%Y-%m-%d %H:%M:%S",
+                "%d %b %Y", "%d %B %Y", "%b %d, %Y", "%B %d, %Y")
+# Thousands separators, currency signs and spaces dropped before numeric parsing
+NUMERIC_NOISE = r"[,\s$€£¥]"
+# A numeric-looking cell with a leading zero ("007", "-01") keeps its column as strings
+LEADING_ZERO = r"^[-+]?0\d"
+# Whole floats such as "3.0" become integers only while a float still holds them exactly
+MAX_EXACT_FLOAT_INTEGER = 2 ** 53
+
+
+def default_format():
+    """Return "parquet" when pyarrow is installed, otherwise "npz"."""
+    return "parquet" if importlib.util.find_spec("pyarrow") is not None else "npz"
+
+
+def table_to_frame(rows):
+    """Return a typed DataFrame for a table given as a list of rows.
+
+    Short rows are padded, and empty or whitespace-only cells become missing
+    values. The first row is used as the header when the table has more
+    rows and every cell of the first row is a distinct, non-numeric label;
+    otherwise the columns are named ``column_1``, ``column_2``, ...
+    """
+    import pandas as pd
+
+    rows = [["" if cell is None else str(cell) for cell in row] for row in rows]
+    width = max((len(row) for row in rows), default=0)
+    rows = [row + [""] * (width - len(row)) for row in rows]
+    if has_header(rows):
+        columns, rows = [label.strip() for label in rows[0]], rows[1:]
+    else:
+        columns = [f"column_{index + 1}" for index in range(width)]
+    frame = pd.DataFrame(rows, columns=columns, dtype=object)
+    return pd.DataFrame({column: infer_column(frame[column]) for column in frame.columns}, index=frame.index)
+
+
+def has_header(rows):
+    """Return whether the first of ``rows`` (lists of strings) reads as a header row."""
+    if len(rows) < 2 or not rows[0]:
+        return False
+    labels = [cell.strip() for cell in rows[0]]
+    if not all(labels) or len(set(labels)) != len(labels):
+        return False
+    return not any(_is_number(label) for label in labels)
+
+
+def infer_column(column):
+    """Convert an object Series of strings to the narrowest of Int64, Float64, datetime64 or string."""
+    import pandas as pd
+
+    text = column.astype("string").str.strip()
+    text = text.mask(text == "")
+    present = text.notna()
+    if not present.any():
+        return text
+
+    cleaned = _numeric_text(text)
+    # Parsed from the strings themselves: integer columns come back Int64 without a float round trip
+    numbers = pd.to_numeric(cleaned, errors="coerce")
+    if numbers[present].notna().all():
+        if cleaned.str.match(LEADING_ZERO).any():
+            # Codes such as "007" or ZIP codes lose their meaning as numbers
+            return text
+        if str(numbers.dtype) == "Int64":
+            return numbers
+        numbers = numbers.astype("Float64")
+        whole = numbers.dropna()
+        if (whole % 1 == 0).all() and (whole.abs() <= MAX_EXACT_FLOAT_INTEGER).all():
+            return numbers.astype("Int64")
+        return numbers
+
+    for date_format in DATE_FORMATS:
+        dates = pd.to_datetime(text, format=date_format, errors="coerce")
+        if dates[present].notna().all():
+            # The inferred unit differs between pandas versions; keep the metadata stable
+            return dates.astype("datetime64[ns]")
+    return text
+
+
+def write_frame(frame, path_stem, table_format=None):
+    """Write ``frame`` to ``path_stem`` plus the format's extension and return the path."""
+    table_format = table_format or default_format()
+    if table_format not in FORMATS:
+        raise ValueError(f"Unsupported table format: {table_format}. Use one of {', '.join(FORMATS)}.")
+    path = path_stem + EXTENSIONS[table_format]
+    if table_format == "parquet":
+        frame.to_parquet(path, index=False)
+    elif table_format == "feather":
+        frame.reset_index(drop=True).to_feather(path)
+    else:
+        _write_npz(frame, path)
+    return path
+
+
+def read_frame(path):
+    """Load a table written by write_frame()."""
+    import pandas as pd
+
+    if path.endswith(EXTENSIONS["parquet"]):
+        return pd.read_parquet(path)
+    if path.endswith(EXTENSIONS["feather"]):
+        return pd.read_feather(path)
+    return _read_npz(path)
+
+
+def _write_npz(frame, path):
+    """Store each column as a plain NumPy array plus a missing-value mask, so loading needs no pickle."""
+    import numpy as np
+
+    arrays = {"columns": np.array([str(column) for column in frame.columns], dtype=str),
+              "dtypes": np.array([str(dtype) for dtype in frame.dtypes], dtype=str)}
+    for index, column in enumerate(frame.columns):
+        series = frame[column]
+        mask = series.isna().to_numpy()
+        if str(series.dtype) == "Int64":
+            values = series.to_numpy(dtype="int64", na_value=0)
+        elif str(series.dtype) == "Float64":
+            values = series.to_numpy(dtype="float64", na_value=np.nan)
+        elif series.dtype.kind == "M":
+            values = series.to_numpy(dtype="datetime64[ns]")
+        else:
+            values = series.fillna("").to_numpy(dtype=str)
+        arrays[f"values_{index}"] = values
+        arrays[f"mask_{index}"] = mask
+    with open(path, "wb") as f:
+        np.savez_compressed(f, **arrays)
+
+
+def _read_npz(path):
+    import numpy as np
+    import pandas as pd
+
+    with np.load(path, allow_pickle=False) as archive:
+        data = {}
+        for index, (column, dtype) in enumerate(zip(archive["columns"], archive["dtypes"])):
+            series = pd.Series(archive[f"values_{index}"]).astype(str(dtype))
+            data[str(column)] = series.mask(archive[f"mask_{index}"])
+    return pd.DataFrame(data)
+
+
+def _numeric_text(text):
+    # "(1,200)" is accounting notation for -1200
+    cleaned = text.str.replace(NUMERIC_NOISE, "", regex=True)
+    return cleaned.str.replace(r"^\((.*)\)$", r"-\1", regex=True)
+
+
+def _is_number(label):
+    try:
+        float(label.replace(",", ""))
+    except ValueError:
+        return False
+    return True
+
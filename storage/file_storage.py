@@ -1,19 +1,53 @@
 import os
+import csv
 import json
-import pandas as pd  # For saving tables as CSV
+import hashlib
+import sys
+import tempfile
 from io import BytesIO
-from PIL import Image as PILImage
-from storage.storage import Storage  # For handling PPTX images
+from data_extractor.image_ref import shared_sources
+from storage.columnar import table_to_frame, write_frame
+from storage.storage import Storage
+
+# Size of the write buffer used for every output file
+DEFAULT_BUFFER_SIZE = 64 * 1024
+
+
+# PIL and pandas are only checked against, never needed to write plain text,
+# so look them up in sys.modules: an object of their type can only exist if the
+# caller has already imported them.
+def _is_pil_image(obj) -> bool:
+    pil_image = sys.modules.get("PIL.Image")
+    return pil_image is not None and isinstance(obj, pil_image.Image)
+
+
+def _is_dataframe(obj) -> bool:
+    pandas = sys.modules.get("pandas")
+    return pandas is not None and isinstance(obj, pandas.DataFrame)
+
 
 class FileStorage(Storage):
-    def __init__(self, output_dir: str):
+    INSTRUMENTED = ("store", "save_text", "save_images", "save_urls", "save_tables", "save_pages", "_write_image",
+                    "_write_table", "_write_columnar", "_write_metadata")
+
+    def __init__(self, output_dir: str, buffer_size: int = DEFAULT_BUFFER_SIZE, image_dir: str = None,
+                 columnar_tables: bool = False, table_format: str = None):
         self.output_dir = output_dir
+        self.buffer_size = buffer_size
+        # Images are stored as <sha256>.<ext>; pass a shared image_dir to deduplicate across documents
+        self.image_dir = image_dir
+        # With columnar_tables, every table also gets a typed binary copy (see storage.columnar);
+        # table_format is "parquet", "feather" or "npz" (default: parquet if pyarrow is installed)
+        self.columnar_tables = columnar_tables
+        self.table_format = table_format
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
 
     def store(self, data, filename: str, data_type: str):
-        """Save data based on type: 'text', 'image', 'url', or 'table'."""
-        if data_type == 'text':
+        """Save data based on type: 'text', 'image', 'url', 'table', or 'pages'."""
+        if data_type == 'pages':
+            self.save_pages(data, filename)
+        elif data_type == 'text':
             self.save_text(data, filename)
         elif data_type == 'image':
             self.save_images(data, filename)
@@ -22,55 +56,99 @@ class FileStorage(Storage):
         elif data_type == 'table':
             self.save_tables(data, filename)
         else:
-            raise ValueError("Unsupported data type. Use 'text', 'image', 'url', or 'table'.")
+            raise ValueError("Unsupported data type. Use 'text', 'image', 'url', 'table', or 'pages'.")
 
     def save_text(self, data, filename: str):
-        """Save text data as a .txt file."""
+        """Save text data as a .txt file.
+
+        ``data`` is either a string or an iterable of string chunks; chunks are
+        appended through a bounded buffer as they arrive.
+        """
         txt_filename = os.path.splitext(filename)[0] + ".txt"
         output_path = os.path.join(self.output_dir, txt_filename)
-        with open(output_path, 'w') as f:
-            f.write(data)
+        if isinstance(data, str):
+            data = (data,)
+        with self._open(output_path, 'w') as f:
+            for chunk in data:
+                f.write(chunk)
+
+    def _open(self, path, mode, **kwargs):
+        """Open an output file with the storage's bounded write buffer."""
+        return open(path, mode, buffering=self.buffer_size, **kwargs)
 
     def save_images(self, images, filename: str):
-        """Save image data to image files and metadata."""
+        """Save image data to image files and metadata.
+
+        ``images`` may be a generator; each image is written as soon as it is yielded.
+        """
         images_dir = os.path.join(self.output_dir, "images")
         if not os.path.exists(images_dir):
             os.makedirs(images_dir)
 
         metadata = []
-        for idx, image in enumerate(images):
-            # Check if the image is a PIL Image object (PPTX case)
-            if isinstance(image, PILImage.Image):  
-                # Convert the image to bytes (PNG format)
-                image_bytes = BytesIO()
-                image.save(image_bytes, format='PNG')  # Save as PNG
-                image_bytes = image_bytes.getvalue()
-                image_filename = f"image_{idx + 1}.png"
-                image_ext = 'png'
-            # Otherwise, assume it's a dictionary (PDF/DOCX case)
-            elif isinstance(image, dict):
-                # Check if it's a dictionary and has the necessary keys
-                image_filename = f"image_{idx + 1}.{image.get('ext', 'jpg')}"
-                image_bytes = image.get('image_data', b"")
-                image_ext = image.get('ext', 'jpg')  # noqa: F841
-            else:
-                # If the image is neither a PIL Image nor a dictionary, skip it
-                continue
+        with shared_sources():
+            for image in images:
+                entry = self._write_image(images_dir, image)
+                if entry is not None:
+                    metadata.append(entry)
 
-            # Save the image data to file
-            image_path = os.path.join(images_dir, image_filename)
-            with open(image_path, "wb") as img_file:
-                img_file.write(image_bytes)
+        self._write_metadata(os.path.join(images_dir, 'metadata.json'), metadata)
 
-            metadata.append({
-                "file_name": image_filename,
-                "page_number": image.get("page", "N/A"),
-                "dimensions": image.get("dimensions", "N/A")
-            })
+    def _write_image(self, images_dir, image):
+        """Write one image under its SHA-256 name and return its metadata entry, or None if skipped.
 
-        metadata_file = os.path.join(images_dir, 'metadata.json')
-        with open(metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=4)
+        Identical images share one file; an image already present is not written again.
+        """
+        # Check if the image is a PIL Image object (PPTX case)
+        if _is_pil_image(image):
+            # Convert the image to bytes (PNG format)
+            image_bytes = BytesIO()
+            image.save(image_bytes, format='PNG')  # Save as PNG
+            image_bytes = image_bytes.getvalue()
+            image_ext = 'png'
+            image_info = {}
+        # Otherwise, assume it's a dictionary (PDF/DOCX case)
+        elif isinstance(image, dict):
+            # Check if it's a dictionary and has the necessary keys
+            image_bytes = image.get('image_data', b"")
+            image_ext = image.get('ext', 'jpg')
+            image_info = image
+        else:
+            # If the image is neither a PIL Image nor a dictionary, skip it
+            return None
+
+        blob_dir = self.image_dir or images_dir
+        os.makedirs(blob_dir, exist_ok=True)
+
+        # Hash while writing to a temporary file; image_data may also be an iterable of byte chunks,
+        # such as an ImageRef that streams the image from its source document
+        if isinstance(image_bytes, (bytes, bytearray, memoryview)):
+            image_bytes = (image_bytes,)
+        digest = hashlib.sha256()
+        fd, temp_path = tempfile.mkstemp(dir=blob_dir, suffix=".tmp")
+        try:
+            with self._open(fd, "wb") as img_file:
+                for chunk in image_bytes:
+                    digest.update(chunk)
+                    img_file.write(chunk)
+            sha256 = digest.hexdigest()
+            image_path = os.path.join(blob_dir, f"{sha256}.{image_ext}")
+            if os.path.exists(image_path):
+                os.remove(temp_path)
+            else:
+                # Atomic, so concurrent writers of the same image never expose a partial file
+                os.replace(temp_path, image_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+        return {
+            "file_name": os.path.relpath(image_path, images_dir),
+            "sha256": sha256,
+            "page_number": image_info.get("page", "N/A"),
+            "dimensions": image_info.get("dimensions", "N/A")
+        }
 
     def save_urls(self, urls, filename: str):
         urls_dir = os.path.join(self.output_dir, "urls")
@@ -89,41 +167,115 @@ class FileStorage(Storage):
                     "page_number": url_info["page_number"]
                 })
 
-        metadata_file = os.path.join(urls_dir, "metadata.json")
-        with open(metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=4)
+        self._write_metadata(os.path.join(urls_dir, "metadata.json"), metadata)
 
     def save_tables(self, tables, filename: str):
-        """Save extracted tables as CSV files and generate metadata."""
+        """Save extracted tables as CSV files and generate metadata.
+
+        ``tables`` and each table in it may be generators; rows are written to
+        the CSV file as they arrive.
+        """
         tables_dir = os.path.join(self.output_dir, "tables")
         if not os.path.exists(tables_dir):
             os.makedirs(tables_dir)
 
         metadata = []
         for idx, table in enumerate(tables):
-            csv_filename = f"table_{idx + 1}.csv"
-            csv_path = os.path.join(tables_dir, csv_filename)
-            
-            # Save table data to CSV file
-            if isinstance(table, pd.DataFrame):
-                table.to_csv(csv_path, index=False)
-            elif isinstance(table, list):
-                with open(csv_path, 'w', newline='') as f:
-                    for row in table:
-                        f.write(",".join(row) + "\n")
-            
-            # Add metadata for the current table
-            metadata.append({
-                "table_filename": csv_filename,
-                "row_count": len(table) if isinstance(table, list) else table.shape[0],
-                "column_count": len(table[0]) if isinstance(table, list) and table else table.shape[1]
-            })
+            metadata.append(self._write_table(tables_dir, idx, table))
 
         # Save the metadata for all tables in a JSON file
-        metadata_file = os.path.join(tables_dir, "metadata.json")
+        self._write_metadata(os.path.join(tables_dir, "metadata.json"), metadata)
+
+    def _write_table(self, tables_dir, idx, table):
+        """Write one table as a CSV file and return its metadata entry."""
+        csv_filename = f"table_{idx + 1}.csv"
+        csv_path = os.path.join(tables_dir, csv_filename)
+        
+        # Save table data to CSV file
+        if _is_dataframe(table):
+            table.to_csv(csv_path, index=False)
+            row_count, column_count = table.shape
+            frame = table
+        else:
+            # Lists and row generators are streamed one row at a time; rows are only
+            # kept when a typed copy is written afterwards
+            rows = [] if self.columnar_tables else None
+            row_count = 0
+            column_count = 0
+            with self._open(csv_path, 'w', newline='') as f:
+                # Cells holding commas, quotes or line breaks are quoted; None cells are written empty
+                writer = csv.writer(f, lineterminator="\n")
+                for row in table:
+                    row = list(row)
+                    if row_count == 0:
+                        column_count = len(row)
+                    writer.writerow(row)
+                    if rows is not None:
+                        rows.append(row)
+                    row_count += 1
+            frame = table_to_frame(rows) if rows is not None else None
+        
+        # Add metadata for the current table
+        entry = {
+            "table_filename": csv_filename,
+            "row_count": row_count,
+            "column_count": column_count
+        }
+        if self.columnar_tables:
+            entry.update(self._write_columnar(tables_dir, idx, frame))
+        return entry
+
+    def _write_columnar(self, tables_dir, idx, frame):
+        """Write the typed copy of one table and return its metadata fields."""
+        path = write_frame(frame, os.path.join(tables_dir, f"table_{idx + 1}"), self.table_format)
+        return {
+            "columnar_filename": os.path.basename(path),
+            "columns": [{"name": str(name), "dtype": str(dtype)} for name, dtype in frame.dtypes.items()]
+        }
+
+    def save_pages(self, pages, filename: str):
+        """Save per-page records from Extractor.iter_pages() as they are produced.
+
+        Text is appended page by page and images and tables are written as soon
+        as their page arrives, so the whole document is never held in memory.
+        The output layout is the same as storing text, images, URLs and tables
+        separately.
+        """
+        txt_filename = os.path.splitext(filename)[0] + ".txt"
+        images_dir = os.path.join(self.output_dir, "images")
+        tables_dir = os.path.join(self.output_dir, "tables")
+        image_metadata = []
+        table_metadata = []
+        urls = []
+
+        # Image references of the document share one open source while it is saved
+        with shared_sources(), self._open(os.path.join(self.output_dir, txt_filename), 'w') as text_file:
+            for page in pages:
+                text_file.write(page["text"])
+
+                for image in page["images"]:
+                    os.makedirs(images_dir, exist_ok=True)
+                    entry = self._write_image(images_dir, image)
+                    if entry is not None:
+                        image_metadata.append(entry)
+
+                for table in page["tables"]:
+                    os.makedirs(tables_dir, exist_ok=True)
+                    table_metadata.append(self._write_table(tables_dir, len(table_metadata), table))
+
+                urls.extend(page["urls"])
+
+        if image_metadata:
+            self._write_metadata(os.path.join(images_dir, 'metadata.json'), image_metadata)
+        if table_metadata:
+            self._write_metadata(os.path.join(tables_dir, "metadata.json"), table_metadata)
+        if urls:
+            self.save_urls(urls, filename)
+
+    def _write_metadata(self, metadata_file, metadata):
         with open(metadata_file, 'w') as f:
             json.dump(metadata, f, indent=4)
-                        
+
     def close(self):
         pass
 
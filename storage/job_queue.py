@@ -0,0 +1,177 @@
+"""Durable queue of documents to extract, shared by worker processes through SQLite.
+
+Every job is one document key (a path or ``"<archive>!<member>"`` name) and
+moves through STATUSES:
+
+    queued -> running -> done
+                      -> queued (failed with attempts left, or lease expired)
+                      -> failed (out of attempts)
+
+A worker claims the oldest queued job with a lease of ``lease_seconds`` and
+renews it with heartbeat() while it works. The claim runs in a ``BEGIN
+IMMEDIATE`` transaction, so two workers never get the same job. If a worker
+crashes, its lease runs out and the next claim puts the job back in the queue,
+or fails it when it has no attempts left. complete(), fail() and heartbeat()
+only act on a job the worker still holds, so a worker whose lease was taken
+over cannot overwrite the new holder's result. Jobs are enqueued at most once
+per key, so enqueuing a corpus again after a crash adds only new documents and
+never repeats finished ones.
+
+The database uses WAL journaling with ``synchronous=NORMAL``. A committed
+state change survives a crash of any process. A power loss can roll back the
+last few commits, and the affected jobs are then simply run again.
+"""
+import sqlite3
+import time
+from contextlib import contextmanager
+
+QUEUE_FILENAME = "job_queue.db"
+STATUSES = ("queued", "running", "done", "failed")
+# Seconds a claim holds a job without a heartbeat
+DEFAULT_LEASE_SECONDS = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    worker TEXT,
+    lease_expires REAL,
+    enqueued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    page_count INTEGER,
+    output_dir TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id);
+CREATE INDEX IF NOT EXISTS idx_jobs_lease ON jobs(status, lease_expires);
+CREATE INDEX IF NOT EXISTS idx_jobs_finished ON jobs(status, finished_at);
+"""
+
+
+class JobQueue:
+    """One connection to a job queue database. Use one instance per process or thread."""
+
+    def __init__(self, db_path=QUEUE_FILENAME, lease_seconds=DEFAULT_LEASE_SECONDS, busy_timeout=30):
+        if lease_seconds <= 0:
+            raise ValueError("lease_seconds must be more than 0.")
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        # Autocommit mode: every write below is its own statement or an explicit transaction
+        self.conn = sqlite3.connect(db_path, timeout=busy_timeout, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _transaction(self):
+        # IMMEDIATE takes the write lock up front, so a read-then-update cannot race another worker
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("COMMIT")
+
+    def enqueue(self, keys, max_attempts=3):
+        """Add a job for every key not already in the queue, whatever its status, and return how many were added."""
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be 1 or more.")
+        now = time.time()
+        with self._transaction():
+            before = self.conn.total_changes
+            self.conn.executemany("INSERT OR IGNORE INTO jobs (key, max_attempts, enqueued_at) VALUES (?, ?, ?)",
+                                  ((key, max_attempts, now) for key in keys))
+            return self.conn.total_changes - before
+
+    def claim(self, worker):
+        """Lease the oldest queued job to ``worker`` and return it as a dict, or None if nothing is queued.
+
+        Jobs whose lease has expired are requeued (or failed, when out of
+        attempts) first. The returned dict has the job's ``id``, ``key``,
+        ``attempts`` (including this one) and ``lease_expires``.
+        """
+        now = time.time()
+        with self._transaction():
+            self.conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+                "error = 'Lease of ' || worker || ' expired', worker = NULL, lease_expires = NULL, "
+                "finished_at = CASE WHEN attempts < max_attempts THEN NULL ELSE ? END "
+                "WHERE status = 'running' AND lease_expires < ?", (now, now))
+            row = self.conn.execute(
+                "SELECT id, key, attempts FROM jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+            if row is None:
+                return None
+            job_id, key, attempts = row
+            lease_expires = now + self.lease_seconds
+            self.conn.execute(
+                "UPDATE jobs SET status = 'running', worker = ?, attempts = attempts + 1, lease_expires = ?, "
+                "started_at = ? WHERE id = ?", (worker, lease_expires, now, job_id))
+        return {"id": job_id, "key": key, "attempts": attempts + 1, "lease_expires": lease_expires}
+
+    def heartbeat(self, job_id, worker):
+        """Extend the worker's lease on a job; False means the lease was lost and the job may run elsewhere."""
+        return self._update_held(job_id, worker, "lease_expires = ?", time.time() + self.lease_seconds)
+
+    def complete(self, job_id, worker, page_count=None, output_dir=None):
+        """Mark a held job done. Returns False, changing nothing, if the worker no longer holds it."""
+        return self._update_held(job_id, worker, "status = 'done', worker = NULL, lease_expires = NULL, "
+                                                 "finished_at = ?, page_count = ?, output_dir = ?, error = NULL",
+                                 time.time(), page_count, output_dir)
+
+    def fail(self, job_id, worker, error, retry=True):
+        """Record a held job's error and requeue it while it has attempts left (and ``retry``), else fail it."""
+        return self._update_held(job_id, worker,
+                                 "status = CASE WHEN ? AND attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+                                 "finished_at = CASE WHEN ? AND attempts < max_attempts THEN NULL ELSE ? END, "
+                                 "worker = NULL, lease_expires = NULL, error = ?",
+                                 bool(retry), bool(retry), time.time(), error)
+
+    def _update_held(self, job_id, worker, assignments, *values):
+        cursor = self.conn.execute(
+            f"UPDATE jobs SET {assignments} WHERE id = ? AND worker = ? AND status = 'running'",
+            (*values, job_id, worker))
+        return cursor.rowcount == 1
+
+    def requeue_failed(self):
+        """Give every failed job a fresh set of attempts and return how many were requeued."""
+        cursor = self.conn.execute(
+            "UPDATE jobs SET status = 'queued', attempts = 0, finished_at = NULL WHERE status = 'failed'")
+        return cursor.rowcount
+
+    def failures(self):
+        """Return (key, attempts, error) of every failed job."""
+        return self.conn.execute(
+            "SELECT key, attempts, error FROM jobs WHERE status = 'failed' ORDER BY id").fetchall()
+
+    def stats(self, window=60):
+        """Return the queue depth and recent processing rates.
+
+        The dict holds the number of jobs in each of STATUSES, ``expired``
+        (running jobs whose lease has run out), ``oldest_queued_seconds``, and
+        ``documents_per_sec`` and ``pages_per_sec`` over jobs finished in the
+        last ``window`` seconds, measured from the start of the earliest of them
+        when that is less than ``window`` ago.
+        """
+        now = time.time()
+        stats = dict.fromkeys(STATUSES, 0)
+        stats.update(self.conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        stats["expired"] = self.conn.execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'running' AND lease_expires < ?", (now,)).fetchone()[0]
+        oldest = self.conn.execute("SELECT MIN(enqueued_at) FROM jobs WHERE status = 'queued'").fetchone()[0]
+        stats["oldest_queued_seconds"] = now - oldest if oldest is not None else None
+        documents, pages, first_started = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(page_count), 0), MIN(started_at) FROM jobs "
+            "WHERE status = 'done' AND finished_at >= ?", (now - window,)).fetchone()
+        # A queue busy for less than the window is measured over the time it has been working
+        elapsed = min(window, now - first_started) if first_started is not None else window
+        stats["documents_per_sec"] = documents / elapsed if elapsed > 0 else 0.0
+        stats["pages_per_sec"] = pages / elapsed if elapsed > 0 else 0.0
+        return stats
+
+    def close(self):
+        self.conn.close()
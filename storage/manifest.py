@@ -0,0 +1,88 @@
+import hashlib
+import os
+import sqlite3
+
+from file_loaders.source import as_source
+
+MANIFEST_FILENAME = "extraction_manifest.db"
+
+
+def file_content_hash(file_path, chunk_size=1024 * 1024):
+    """Return the SHA-256 of a file, read in chunks, or of an in-memory document source."""
+    source = as_source(file_path)
+    if source.path is None:
+        return hashlib.sha256(source.buffer).hexdigest()
+    file_path = source.path
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def manifest_path_for(db_path):
+    """Return the manifest of the given SQLite database: <db name>.manifest.db next to it.
+
+    Each database has its own manifest, so entries made while writing another
+    database in the same folder are never taken for documents stored in this one.
+    """
+    return os.path.splitext(os.path.abspath(db_path))[0] + ".manifest.db"
+
+
+class ExtractionManifest:
+    """Persistent record of finished extractions used to skip unchanged documents.
+
+    Entries are keyed by source path, file content hash, extractor class, engine
+    version and options (see Extractor.cache_key()), so a copy of a document at
+    another path gets its own outputs. Changing an extractor's code version,
+    library versions or options only misses the entries made under the old key.
+    """
+
+    def __init__(self, db_path=MANIFEST_FILENAME):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS manifest_entries (
+            content_hash TEXT NOT NULL,
+            extractor TEXT NOT NULL,
+            engine_version TEXT NOT NULL,
+            options TEXT NOT NULL,
+            source_path TEXT NOT NULL,
+            output_dir TEXT,
+            document_id INTEGER,
+            page_count INTEGER,
+            extracted_at TEXT DEFAULT CURRENT_TIMESTAMP,
+            PRIMARY KEY (source_path, content_hash, extractor, engine_version, options)
+        )""")
+        self.conn.commit()
+
+    def lookup(self, content_hash, cache_key, source_path):
+        """Return the stored entry for this source, content and extractor key, or None."""
+        extractor, engine_version, options = cache_key
+        row = self.conn.execute(
+            "SELECT source_path, output_dir, document_id, page_count FROM manifest_entries "
+            "WHERE source_path = ? AND content_hash = ? AND extractor = ? AND engine_version = ? AND options = ?",
+            (source_path, content_hash, extractor, engine_version, options)).fetchone()
+        if row is None:
+            return None
+        return {"source_path": row[0], "output_dir": row[1], "document_id": row[2], "page_count": row[3]}
+
+    def record(self, content_hash, cache_key, source_path, output_dir=None, document_id=None, page_count=None):
+        """Record a finished extraction, replacing any entry with the same key."""
+        extractor, engine_version, options = cache_key
+        self.conn.execute(
+            "INSERT OR REPLACE INTO manifest_entries (content_hash, extractor, engine_version, options, source_path, "
+            "output_dir, document_id, page_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (content_hash, extractor, engine_version, options, source_path, output_dir, document_id, page_count))
+        self.conn.commit()
+
+    def prune(self, cache_key):
+        """Delete entries of this extractor and options made with another engine version."""
+        extractor, engine_version, options = cache_key
+        cursor = self.conn.execute(
+            "DELETE FROM manifest_entries WHERE extractor = ? AND options = ? AND engine_version != ?",
+            (extractor, options, engine_version))
+        self.conn.commit()
+        return cursor.rowcount
+
+    def close(self):
+        self.conn.close()
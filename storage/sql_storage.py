@@ -1,38 +1,379 @@
 
 # sql_storage.py
  
+import hashlib
+import os
 import sqlite3  # Make sure to import sqlite3 here
+from contextlib import contextmanager
 from storage.storage import Storage # type: ignore
  
+# Accepted values for the optional PRAGMA settings
+JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+ 
+# Normalized schema for extracted documents; every artifact row carries its
+# document id and page number so per-document and per-page reads use an index.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source_path TEXT NOT NULL,
+    file_name TEXT NOT NULL,
+    format TEXT,
+    page_count INTEGER,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS pages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    page_number INTEGER NOT NULL,
+    UNIQUE (document_id, page_number)
+);
+CREATE TABLE IF NOT EXISTS text_segments (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    page_number INTEGER NOT NULL,
+    content TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS image_blobs (
+    sha256 TEXT PRIMARY KEY,
+    ext TEXT,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS images (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    page_number INTEGER,
+    image_index INTEGER NOT NULL,
+    sha256 TEXT NOT NULL REFERENCES image_blobs(sha256),
+    width INTEGER,
+    height INTEGER
+);
+CREATE TABLE IF NOT EXISTS links (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    page_number INTEGER,
+    url TEXT NOT NULL,
+    linked_text TEXT
+);
+CREATE TABLE IF NOT EXISTS table_cells (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_id INTEGER NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    page_number INTEGER,
+    table_index INTEGER NOT NULL,
+    row_index INTEGER NOT NULL,
+    column_index INTEGER NOT NULL,
+    value TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_documents_source_path ON documents(source_path);
+CREATE INDEX IF NOT EXISTS idx_text_segments_document_page ON text_segments(document_id, page_number);
+CREATE INDEX IF NOT EXISTS idx_images_document_page ON images(document_id, page_number);
+CREATE INDEX IF NOT EXISTS idx_images_sha256 ON images(sha256);
+CREATE INDEX IF NOT EXISTS idx_links_document_page ON links(document_id, page_number);
+CREATE INDEX IF NOT EXISTS idx_links_url ON links(url);
+CREATE INDEX IF NOT EXISTS idx_table_cells_document_page ON table_cells(document_id, page_number, table_index);
+"""
+
+# Full-text index over text_segments (one row per document page). It is an
+# external-content FTS5 table: it stores only the index, and triggers keep it in
+# step with every insert, update and delete of a segment, including cascades.
+SEARCH_SCHEMA = (
+    """CREATE VIRTUAL TABLE IF NOT EXISTS text_search USING fts5(
+    content, content='text_segments', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+)""",
+    """CREATE TRIGGER IF NOT EXISTS text_segments_search_insert AFTER INSERT ON text_segments BEGIN
+    INSERT INTO text_search (rowid, content) VALUES (new.id, new.content);
+END""",
+    """CREATE TRIGGER IF NOT EXISTS text_segments_search_delete AFTER DELETE ON text_segments BEGIN
+    INSERT INTO text_search (text_search, rowid, content) VALUES ('delete', old.id, old.content);
+END""",
+    """CREATE TRIGGER IF NOT EXISTS text_segments_search_update AFTER UPDATE ON text_segments BEGIN
+    INSERT INTO text_search (text_search, rowid, content) VALUES ('delete', old.id, old.content);
+    INSERT INTO text_search (rowid, content) VALUES (new.id, new.content);
+END""",
+)
+
+# Search results are ranked by FTS5's bm25 and carry a snippet of about this many tokens
+SNIPPET_TOKENS = 16
+ 
 class SQLStorage(Storage):
-    def __init__(self, connection_string):
+    INSTRUMENTED = ("store", "store_many", "store_document", "flush", "search")
+
+    def __init__(self, connection_string, commit_batch_size=1, journal_mode=None, synchronous=None,
+                 busy_timeout=5):
         super().__init__()  # Call parent constructor
         self.connection_string = connection_string
-        self.conn = sqlite3.connect(connection_string)  # Connect to the provided database string
+        # Seconds a write waits for another connection's lock before raising "database is locked"
+        self.conn = sqlite3.connect(connection_string, timeout=busy_timeout)
         self.cursor = self.conn.cursor()
+        # Number of transaction() blocks grouped into one commit
+        self.commit_batch_size = max(1, commit_batch_size)
+        self._known_tables = set()
+        # Tables created inside the current transaction() block; its rollback drops them again
+        self._block_tables = set()
+        self._in_transaction = False
+        self._pending_blocks = 0
+        self._schema_ready = False
+ 
+        if journal_mode is not None:
+            if journal_mode.upper() not in JOURNAL_MODES:
+                raise ValueError(f"Unsupported journal mode: {journal_mode}")
+            self.cursor.execute(f"PRAGMA journal_mode={journal_mode.upper()}")
+        if synchronous is not None:
+            if synchronous.upper() not in SYNCHRONOUS_MODES:
+                raise ValueError(f"Unsupported synchronous setting: {synchronous}")
+            self.cursor.execute(f"PRAGMA synchronous={synchronous.upper()}")
  
     def store(self, table_name, data):
         """Stores data in a SQL database."""
+        escaped_table_name = self._ensure_table(table_name)
+ 
+        # Insert the data into the table
+        self.cursor.execute(f"INSERT INTO {escaped_table_name} (data) VALUES (?)", (str(data),))
+ 
+        # Commit the changes
+        self._commit()
+ 
+    def store_many(self, table_name, items):
+        """Stores several items in a table with a single executemany call."""
+        escaped_table_name = self._ensure_table(table_name)
+        self.cursor.executemany(f"INSERT INTO {escaped_table_name} (data) VALUES (?)",
+                                ((str(data),) for data in items))
+        self._commit()
+ 
+    def store_document(self, source_path, pages):
+        """Store a document and its per-page records (from Extractor.iter_pages()).
+ 
+        ``pages`` may be a generator; each page is written as it arrives. Returns
+        the new document id.
+        """
+        self._ensure_schema()
+        file_name = os.path.basename(source_path)
+        doc_format = os.path.splitext(file_name)[1].lstrip(".").lower() or None
+        with self.transaction():
+            self.cursor.execute("INSERT INTO documents (source_path, file_name, format) VALUES (?, ?, ?)",
+                                (source_path, file_name, doc_format))
+            document_id = self.cursor.lastrowid
+            page_count = 0
+            image_index = 0
+            table_index = 0
+            for page in pages:
+                page_number = page["page_number"]
+                page_count += 1
+                self.cursor.execute("INSERT INTO pages (document_id, page_number) VALUES (?, ?)",
+                                    (document_id, page_number))
+                if page["text"]:
+                    self.cursor.execute(
+                        "INSERT INTO text_segments (document_id, page_number, content) VALUES (?, ?, ?)",
+                        (document_id, page_number, page["text"]))
+ 
+                # Image bytes are stored once per SHA-256; each occurrence is a reference row
+                blob_rows = []
+                image_rows = []
+                for image in page["images"]:
+                    data = bytes(image.get("image_data") or b"")
+                    sha256 = hashlib.sha256(data).hexdigest()
+                    width, height = image.get("dimensions") or (None, None)
+                    blob_rows.append((sha256, image.get("ext"), len(data), data))
+                    image_rows.append((document_id, page_number, image_index, sha256, width, height))
+                    image_index += 1
+                self.cursor.executemany(
+                    "INSERT OR IGNORE INTO image_blobs (sha256, ext, size, data) VALUES (?, ?, ?, ?)", blob_rows)
+                self.cursor.executemany(
+                    "INSERT INTO images (document_id, page_number, image_index, sha256, width, height) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", image_rows)
+ 
+                self.cursor.executemany(
+                    "INSERT INTO links (document_id, page_number, url, linked_text) VALUES (?, ?, ?, ?)",
+                    [(document_id, page_number, link["url"], link.get("linked_text")) for link in page["urls"]])
+ 
+                cell_rows = []
+                for table in page["tables"]:
+                    for row_index, row in enumerate(table):
+                        for column_index, value in enumerate(row):
+                            cell_rows.append((document_id, page_number, table_index, row_index, column_index, value))
+                    table_index += 1
+                self.cursor.executemany(
+                    "INSERT INTO table_cells (document_id, page_number, table_index, row_index, column_index, value) "
+                    "VALUES (?, ?, ?, ?, ?, ?)", cell_rows)
+ 
+            self.cursor.execute("UPDATE documents SET page_count = ? WHERE id = ?", (page_count, document_id))
+        return document_id
+ 
+    def load_page(self, document_id, page_number):
+        """Read back one page of a stored document as a page record."""
+        self._ensure_schema()
+        text = "".join(row[0] for row in self.conn.execute(
+            "SELECT content FROM text_segments WHERE document_id = ? AND page_number = ? ORDER BY id",
+            (document_id, page_number)))
+        images = [{"image_data": data, "ext": ext, "page": page_number}
+                  for ext, data in self.conn.execute(
+                      "SELECT image_blobs.ext, image_blobs.data FROM images "
+                      "JOIN image_blobs ON image_blobs.sha256 = images.sha256 "
+                      "WHERE images.document_id = ? AND images.page_number = ? ORDER BY images.image_index",
+                      (document_id, page_number))]
+        urls = [{"linked_text": linked_text, "url": url, "page_number": page_number}
+                for url, linked_text in self.conn.execute(
+                    "SELECT url, linked_text FROM links WHERE document_id = ? AND page_number = ? ORDER BY id",
+                    (document_id, page_number))]
+        tables = {}
+        for table_index, row_index, value in self.conn.execute(
+                "SELECT table_index, row_index, value FROM table_cells "
+                "WHERE document_id = ? AND page_number = ? ORDER BY table_index, row_index, column_index",
+                (document_id, page_number)):
+            rows = tables.setdefault(table_index, [])
+            while len(rows) <= row_index:
+                rows.append([])
+            rows[row_index].append(value)
+        return {"page_number": page_number, "text": text, "images": images, "urls": urls,
+                "tables": list(tables.values())}
+ 
+    def load_image(self, sha256):
+        """Return the stored bytes of an image by its SHA-256, or None if unknown."""
+        self._ensure_schema()
+        row = self.conn.execute("SELECT data FROM image_blobs WHERE sha256 = ?", (sha256,)).fetchone()
+        return row[0] if row else None
+ 
+    def has_document(self, document_id):
+        """Return whether a document with this id is stored."""
+        self._ensure_schema()
+        return self.conn.execute("SELECT 1 FROM documents WHERE id = ?", (document_id,)).fetchone() is not None
+
+    def find_documents_by_url(self, url):
+        """Return (document_id, page_number) pairs for every page linking to ``url``."""
+        self._ensure_schema()
+        return self.conn.execute(
+            "SELECT document_id, page_number FROM links WHERE url = ? ORDER BY document_id, page_number",
+            (url,)).fetchall()
+ 
+    def search(self, query, limit=20, document_id=None, raw=False):
+        """Return the pages whose text best matches ``query``, best first.
+
+        Each hit is a dict with the document id, source path, file name, page
+        number, bm25 score (lower is better) and a snippet with the matched
+        terms in ``[...]``. By default every word of ``query`` must appear on
+        the page; with ``raw`` the query is passed to FTS5 as is, so phrases,
+        prefixes (``extract*``), ``OR``/``NOT`` and ``NEAR`` can be used.
+        """
+        self._ensure_schema()
+        match = query if raw else _match_all_terms(query)
+        if not match:
+            return []
+        sql = ("SELECT text_segments.document_id, documents.source_path, documents.file_name, "
+               "text_segments.page_number, bm25(text_search), "
+               f"snippet(text_search, 0, '[', ']', '...', {SNIPPET_TOKENS}) "
+               "FROM text_search "
+               "JOIN text_segments ON text_segments.id = text_search.rowid "
+               "JOIN documents ON documents.id = text_segments.document_id "
+               "WHERE text_search MATCH ?")
+        params = [match]
+        if document_id is not None:
+            sql += " AND text_segments.document_id = ?"
+            params.append(document_id)
+        sql += " ORDER BY bm25(text_search) LIMIT ?"
+        params.append(limit)
+        try:
+            rows = self.conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as error:
+            raise ValueError(f"Invalid search query {query!r}: {error}") from error
+        return [{"document_id": doc_id, "source_path": source_path, "file_name": file_name,
+                 "page_number": page_number, "score": score, "snippet": snippet}
+                for doc_id, source_path, file_name, page_number, score, snippet in rows]
+
+    def rebuild_search_index(self):
+        """Re-index every stored text segment, e.g. after rows were changed with the triggers dropped."""
+        self._ensure_schema()
+        with self.transaction():
+            self.cursor.execute("INSERT INTO text_search (text_search) VALUES ('rebuild')")
+
+    def optimize_search_index(self):
+        """Merge the index's b-trees into one; worth running after large batches of stores."""
+        self._ensure_schema()
+        with self.transaction():
+            self.cursor.execute("INSERT INTO text_search (text_search) VALUES ('optimize')")
+
+    def _ensure_schema(self):
+        """Create the normalized tables, indexes and search index once per connection."""
+        if not self._schema_ready:
+            self.cursor.execute("PRAGMA foreign_keys = ON")
+            indexed = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'text_search'").fetchone()
+            # Statements run one by one; executescript() would commit pending work
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    self.cursor.execute(statement)
+            for statement in SEARCH_SCHEMA:
+                self.cursor.execute(statement)
+            if not indexed:
+                # Databases written before the search index existed have segments to index
+                self.cursor.execute("INSERT INTO text_search (text_search) VALUES ('rebuild')")
+            self._schema_ready = True
+ 
+    @contextmanager
+    def transaction(self):
+        """Group every store call made inside the block into one transaction.
+ 
+        Commits are deferred until ``commit_batch_size`` blocks have completed, or
+        until flush()/close(). A failing block is rolled back on its own without
+        discarding earlier blocks that are still waiting for their commit.
+        """
+        if self._in_transaction:
+            yield self
+            return
+        self._in_transaction = True
+        self._block_tables = set()
+        # An explicit BEGIN keeps RELEASE from committing, so blocks can share one commit
+        if not self.conn.in_transaction:
+            self.cursor.execute("BEGIN")
+        self.cursor.execute("SAVEPOINT document")
+        try:
+            yield self
+        except BaseException:
+            self.cursor.execute("ROLLBACK TO SAVEPOINT document")
+            self.cursor.execute("RELEASE SAVEPOINT document")
+            self._known_tables -= self._block_tables
+            raise
+        else:
+            self.cursor.execute("RELEASE SAVEPOINT document")
+            self._pending_blocks += 1
+            if self._pending_blocks >= self.commit_batch_size:
+                self.flush()
+        finally:
+            self._in_transaction = False
+ 
+    def flush(self):
+        """Commit any work deferred by transaction()."""
+        self.conn.commit()
+        self._pending_blocks = 0
+ 
+    def _commit(self):
+        # Inside transaction() the commit happens when the block (or batch) ends
+        if not self._in_transaction:
+            self.conn.commit()
+ 
+    def _ensure_table(self, table_name):
+        """Create the table on first use and return its escaped name."""
         self.table_name = table_name.replace(" ", "_").replace("-", "_")
  
         # Create the table if it doesn't exist
         escaped_table_name = f'"{self.table_name}"'
- 
-        self.cursor.execute(f"""CREATE TABLE IF NOT EXISTS {escaped_table_name} (
+        if self.table_name not in self._known_tables:
+            self.cursor.execute(f"""CREATE TABLE IF NOT EXISTS {escaped_table_name} (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             data TEXT
         )""")
- 
-        # Insert the data into the table
-        self.cursor.execute(f"INSERT INTO {escaped_table_name} (data) VALUES (?)", (str(data),))
- 
-        # Commit the changes
-        self.conn.commit()
+            self._known_tables.add(self.table_name)
+            if self._in_transaction:
+                self._block_tables.add(self.table_name)
+        return escaped_table_name
  
     def close(self):
         """Closes the connection to the database."""
+        if self._pending_blocks:
+            self.flush()
         self.conn.close()
- 
- 
- 
- 
\ No newline at end of file
+
+
+def _match_all_terms(query):
+    """Quote every word of a plain query so FTS5 operators and punctuation are matched literally."""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
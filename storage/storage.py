@@ -1,8 +1,18 @@
 import sqlite3
 from abc import ABC, abstractmethod
 import os
+
+import instrumentation
  
 class Storage(ABC):
+    # Methods timed by the instrumentation layer when it is enabled
+    INSTRUMENTED = ("store",)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Storage stages count the items and bytes they are given
+        instrumentation.instrument(cls, measure="input")
+
     def __init__(self, db_name='assignment4.db'):
         self.db_name = db_name
         
@@ -0,0 +1,322 @@
+"""Run tasks in worker processes under a watchdog.
+
+Each worker process runs one task at a time. The supervisor enforces, per task:
+
+- a wall-clock ``timeout``: the worker is killed and replaced;
+- an address-space cap (``memory_limit``, set with RLIMIT_AS in each worker):
+  allocations beyond it fail, usually with MemoryError;
+- a resident-memory cap (``rss_limit``, polled from /proc on Linux every
+  RSS_POLL_INTERVAL seconds and summed over the worker and its descendants):
+  the worker is killed and replaced;
+- a retry policy: tasks that time out, run out of memory or crash the worker
+  are run again, up to ``retries`` more times, in a fresh worker. Exceptions
+  raised by the task itself are not retried.
+
+Workers are recycled after ``max_tasks_per_worker`` tasks, so memory leaked by
+parser libraries does not build up. Workers report the innermost running
+instrumented stage (see instrumentation.set_stage_listener) through shared
+memory, so every failure records the phase the task was in. Killing one worker
+never stops the others. Each worker leads its own process group, so killing
+it also kills the page and table worker processes its extractor started.
+
+Usage:
+    supervisor = Supervisor(workers=4, timeout=60, memory_limit=2 * 2**30, retries=1)
+    for outcome in supervisor.run((path, extract_document, (path,)) for path in paths):
+        print(outcome["key"], outcome["status"], outcome["phase"])
+"""
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.connection import wait
+
+import instrumentation
+
+# Bytes of shared memory holding a worker's current phase name
+PHASE_SIZE = 256
+# Statuses of a finished task; all but "ok" are failures, and RETRIED ones are run again
+STATUSES = ("ok", "error", "timeout", "memory", "crashed")
+RETRIED = ("timeout", "memory", "crashed")
+# Seconds between checks of a worker's RSS while it runs a task
+RSS_POLL_INTERVAL = 0.5
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def _proc_stat(pid):
+    """Return the fields of /proc/<pid>/stat after the command name (state, ppid, pgrp, ...), or None."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+
+
+def _worker_main(connection, phase, memory_limit, initializer, initargs):
+    """Worker loop: receive (function, args), run it and send back (status, result or error)."""
+    # Processes started by the task join this group and are killed with the worker
+    if hasattr(os, "setsid"):
+        os.setsid()
+    if memory_limit:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    if initializer is not None:
+        initializer(*initargs)
+
+    def report(stage):
+        phase.value = (stage or "").encode()[:PHASE_SIZE - 1]
+
+    instrumentation.set_stage_listener(report)
+    while True:
+        task = connection.recv()
+        if task is None:
+            break
+        function, args = task
+        report(None)
+        try:
+            message = ("ok", function(*args))
+        except MemoryError as error:
+            message = ("memory", f"MemoryError: {error}")
+        except Exception as error:
+            message = ("error", f"{type(error).__name__}: {error}")
+        try:
+            connection.send(message)
+        except MemoryError as error:
+            connection.send(("memory", f"MemoryError while sending the result: {error}"))
+    connection.close()
+
+
+class _Worker:
+    """One worker process and the task it is running."""
+
+    def __init__(self, context, memory_limit, initializer, initargs):
+        self.connection, child_connection = context.Pipe()
+        self.phase = context.Array("c", PHASE_SIZE, lock=False)
+        # Not a daemon: extractors may start their own page or table worker processes
+        self.process = context.Process(target=_worker_main,
+                                       args=(child_connection, self.phase, memory_limit, initializer, initargs))
+        self.process.start()
+        child_connection.close()
+        self.task = None
+        self.started = None
+        self.rss_checked = None
+        self.completed = 0
+
+    def assign(self, task):
+        self.task = task
+        self.started = time.monotonic()
+        self.rss_checked = self.started
+        self.phase.value = b""
+        self.connection.send((task["function"], task["args"]))
+
+    def current_phase(self):
+        return self.phase.value.decode(errors="replace") or None
+
+    def rss(self):
+        """Resident set size in bytes of the worker and its descendants, or None where /proc is not available."""
+        pids = self._descendants(self.process.pid)
+        if pids is None:
+            pids = self._group_members()
+        if pids is None:
+            return None
+        total = 0
+        for pid in pids:
+            fields = _proc_stat(pid)
+            if fields is not None:
+                total += int(fields[21]) * _PAGE_SIZE
+        return total
+
+    @staticmethod
+    def _descendants(pid):
+        """Return ``pid`` and its descendants read from /proc/<pid>/task/*/children, or None if unsupported."""
+        pids, pending = [], [pid]
+        while pending:
+            pid = pending.pop()
+            pids.append(pid)
+            try:
+                tasks = os.listdir(f"/proc/{pid}/task")
+            except FileNotFoundError:
+                continue
+            except OSError:
+                return None
+            for task in tasks:
+                try:
+                    with open(f"/proc/{pid}/task/{task}/children") as f:
+                        pending.extend(int(child) for child in f.read().split())
+                except FileNotFoundError:
+                    if not os.path.exists(f"/proc/{pid}/task/{task}"):
+                        continue
+                    # The kernel was built without CONFIG_PROC_CHILDREN
+                    return None
+                except OSError:
+                    continue
+        return pids
+
+    def _group_members(self):
+        """Return the pids in the worker's process group by scanning /proc, or None where it is not available."""
+        try:
+            pids = [int(entry) for entry in os.listdir("/proc") if entry.isdigit()]
+        except OSError:
+            return None
+        members = []
+        for pid in pids:
+            fields = _proc_stat(pid)
+            if fields is not None and int(fields[2]) == self.process.pid:
+                members.append(pid)
+        return members
+
+    def stop(self):
+        """Ask an idle worker to exit."""
+        try:
+            self.connection.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=5)
+        self.kill()
+
+    def kill(self):
+        """Kill the worker and every process left in its group."""
+        try:
+            os.killpg(self.process.pid, signal.SIGKILL)
+        except (AttributeError, ProcessLookupError, PermissionError):
+            # No process groups here, the worker has not called setsid() yet, or its group is gone
+            if self.process.is_alive():
+                self.process.kill()
+        self.process.join()
+        self.connection.close()
+
+
+class Supervisor:
+    def __init__(self, workers=None, timeout=None, memory_limit=None, rss_limit=None, retries=0,
+                 max_tasks_per_worker=None, initializer=None, initargs=(), mp_context=None):
+        if retries < 0:
+            raise ValueError("retries must be 0 or more.")
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self.rss_limit = rss_limit
+        self.retries = retries
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.initializer = initializer
+        self.initargs = initargs
+        self.context = mp_context or multiprocessing.get_context()
+
+    def run(self, tasks):
+        """Run ``tasks``, an iterable of (key, function, args), and yield one outcome per task as it finishes.
+
+        ``tasks`` is consumed lazily, one task whenever a worker is free. Each
+        outcome is a dict with the task's ``key``, ``status`` (one of STATUSES),
+        ``result`` (the function's return value, or None), ``error``, ``phase``
+        (the stage running when the task failed), ``attempts`` and ``seconds``
+        (wall time of the last attempt).
+        """
+        tasks = iter(tasks)
+        retry_queue = []
+        workers = []
+        exhausted = False
+        try:
+            while True:
+                # Hand out work: retries first, then new tasks
+                for index, worker in enumerate(workers):
+                    if worker.task is None and not worker.process.is_alive():
+                        workers[index] = self._start_worker()
+                while len(workers) < self.workers:
+                    workers.append(self._start_worker())
+                for worker in workers:
+                    if worker.task is not None:
+                        continue
+                    if retry_queue:
+                        worker.assign(retry_queue.pop(0))
+                        continue
+                    if exhausted:
+                        break
+                    try:
+                        key, function, args = next(tasks)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    worker.assign({"key": key, "function": function, "args": tuple(args), "attempts": 0})
+                busy = [worker for worker in workers if worker.task is not None]
+                if not busy:
+                    return
+
+                ready = wait([worker.connection for worker in busy] + [worker.process.sentinel for worker in busy],
+                             timeout=self._wait_timeout(busy))
+                for index, worker in enumerate(workers):
+                    if worker.task is None:
+                        continue
+                    outcome = self._check(worker, ready)
+                    if outcome is None:
+                        continue
+                    task, status = worker.task, outcome["status"]
+                    worker.task = None
+                    if status in RETRIED:
+                        # The worker is gone or in an unknown state; replace it
+                        worker.kill()
+                        workers[index] = self._start_worker()
+                    elif self.max_tasks_per_worker and worker.completed >= self.max_tasks_per_worker:
+                        worker.stop()
+                        workers[index] = self._start_worker()
+                    if status in RETRIED and task["attempts"] <= self.retries:
+                        retry_queue.append(task)
+                        continue
+                    yield outcome
+        finally:
+            for worker in workers:
+                if worker.task is None:
+                    worker.stop()
+                else:
+                    worker.kill()
+
+    def _start_worker(self):
+        return _Worker(self.context, self.memory_limit, self.initializer, self.initargs)
+
+    def _wait_timeout(self, busy):
+        deadlines = []
+        if self.timeout:
+            deadlines.extend(worker.started + self.timeout for worker in busy)
+        if self.rss_limit:
+            deadlines.extend(worker.rss_checked + RSS_POLL_INTERVAL for worker in busy)
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+
+    def _check(self, worker, ready):
+        """Return the outcome of the worker's task if it has finished, failed or broken a limit, else None."""
+        task = worker.task
+        elapsed = time.monotonic() - worker.started
+        phase = worker.current_phase()
+        if worker.connection in ready or worker.process.sentinel in ready:
+            try:
+                if worker.connection.poll():
+                    status, value = worker.connection.recv()
+                    worker.completed += 1
+                    task["attempts"] += 1
+                    if status == "ok":
+                        return self._outcome(task, "ok", elapsed, result=value)
+                    return self._outcome(task, status, elapsed, error=value, phase=phase)
+            except (EOFError, OSError):
+                pass
+            if not worker.process.is_alive():
+                worker.process.join()
+                task["attempts"] += 1
+                exitcode = worker.process.exitcode
+                # SIGKILL from outside is most often the kernel's OOM killer
+                status = "memory" if exitcode == -9 else "crashed"
+                return self._outcome(task, status, elapsed, error=f"Worker exited with code {exitcode}", phase=phase)
+        if self.timeout and elapsed >= self.timeout:
+            task["attempts"] += 1
+            return self._outcome(task, "timeout", elapsed, error=f"Timed out after {self.timeout:g}s", phase=phase)
+        if self.rss_limit and time.monotonic() - worker.rss_checked >= RSS_POLL_INTERVAL:
+            worker.rss_checked = time.monotonic()
+            rss = worker.rss()
+            if rss is not None and rss > self.rss_limit:
+                task["attempts"] += 1
+                return self._outcome(task, "memory", elapsed,
+                                     error=f"RSS {rss / 2**20:.0f} MB exceeded the {self.rss_limit / 2**20:.0f} MB "
+                                           f"limit", phase=phase)
+        return None
+
+    @staticmethod
+    def _outcome(task, status, seconds, result=None, error=None, phase=None):
+        return {"key": task["key"], "status": status, "result": result, "error": error, "phase": phase,
+                "attempts": task["attempts"], "seconds": seconds}
@@ -1,4 +1,5 @@
 
+import hashlib
 from sqlite3 import Error
 from unittest.mock import MagicMock, patch
 from unittest.mock import MagicMock, patch
@@ -12,6 +13,7 @@ from file_loaders.ppt_loader import PPTLoader
 from storage.sql_storage import SQLStorage
 from data_extractor.docx_extractor import DOCXExtractor
 from data_extractor.pptx_extractor import PPTXExtractor
+from data_extractor.pdf_extractor import PDFExtractor
  
 @pytest.fixture
 def docx_loader():
@@ -261,8 +263,9 @@ def test_extract_images(pptx_extractor, mock_loader):
     mock_slide = MagicMock()
     mock_shape = MagicMock()
     mock_shape.shape_type = 13  # Indicates a picture shape
-    mock_shape.image.blob = b'image_data'
     mock_shape.image.ext = 'png'
+    mock_slide.part.related_part.return_value.partname = "/ppt/media/image1.png"
+    mock_slide.part.related_part.return_value.blob = b'image_data'
     mock_slide.shapes = [mock_shape]
     mock_loader.load_file.return_value.slides = [mock_slide]
  
@@ -270,7 +273,8 @@ def test_extract_images(pptx_extractor, mock_loader):
     images = pptx_extractor.extract_images()
     
     assert len(images) == 1, "No images extracted from PPTX file."
-    assert images[0]["image_data"] == b'image_data', "Extracted image data does not match."
+    assert images[0]["image_data"].member == "ppt/media/image1.png", "Extracted image reference does not match."
+    assert images[0]["size"] == len(b'image_data'), "Extracted image size does not match."
     assert images[0]["ext"] == 'png', "Extracted image extension does not match."
  
 def test_extract_urls(pptx_extractor, mock_loader):
@@ -459,4 +463,1133 @@ def test_store_inserts_large_data(sql_storage, mock_connection):
  
  
  
- 
\ No newline at end of file
+def test_extract_methods_reuse_loaded_document(pptx_extractor, mock_loader):
+    """Test that the file is parsed once by load() and reused by every extract call."""
+    mock_loader.load_file.return_value.slides = []
+ 
+    pptx_extractor.load("fake_path.pptx")
+    pptx_extractor.extract_text()
+    pptx_extractor.extract_images()
+    pptx_extractor.extract_tables()
+ 
+    mock_loader.load_file.assert_called_once_with("fake_path.pptx")
+ 
+ 
+def test_extract_all_matches_individual_methods(pptx_extractor, mock_loader):
+    """Test that extract_all returns the same data as the individual extract methods."""
+    mock_slide = MagicMock()
+    mock_shape = MagicMock()
+    mock_shape.text = "Sample text"
+    mock_shape.shape_type = 13
+    mock_shape.image.blob = b'image_data'
+    mock_shape.image.ext = 'png'
+    mock_shape.has_table = False
+    mock_slide.shapes = [mock_shape]
+    mock_loader.load_file.return_value.slides = [mock_slide]
+ 
+    pptx_extractor.load("fake_path.pptx")
+    extracted = pptx_extractor.extract_all()
+ 
+    assert extracted["text"] == pptx_extractor.extract_text()
+    assert extracted["images"] == pptx_extractor.extract_images()
+    assert extracted["urls"] == pptx_extractor.extract_urls()
+    assert extracted["tables"] == pptx_extractor.extract_tables()
+ 
+ 
+def test_close_releases_session_handles(pptx_extractor, mock_loader):
+    """Test that close() closes every handle opened through the session."""
+    pptx_extractor.load("fake_path.pptx")
+    handle = pptx_extractor.session.get("extra", lambda path: MagicMock())
+    pptx_extractor.close()
+ 
+    handle.close.assert_called_once()
+    assert pptx_extractor.session is None
+ 
+ 
+def test_pdf_extractor_rejects_unknown_engine(pdf_loader):
+    """Test that an unknown PDF engine name is rejected."""
+    with pytest.raises(ValueError, match="Unsupported PDF engine"):
+        PDFExtractor(pdf_loader, engine="unknown")
+ 
+ 
+def test_pymupdf_engine_matches_compat_artifacts(pdf_loader):
+    """Test that the single-pass engine finds the same images, URLs and tables as the compat engine."""
+    results = {}
+    for engine in PDFExtractor.ENGINES:
+        extractor = PDFExtractor(pdf_loader, engine=engine)
+        extractor.load("files/sample.pdf")
+        results[engine] = extractor.extract_all()
+        extractor.close()
+ 
+    assert results["pymupdf"]["text"].strip()
+    assert results["pymupdf"]["urls"] == results["compat"]["urls"]
+    assert results["pymupdf"]["tables"] == results["compat"]["tables"]
+    assert [image["image_data"] for image in results["pymupdf"]["images"]] == \
+        [image["image_data"] for image in results["compat"]["images"]]
+ 
+ 
+def test_collect_files_expands_directories_and_globs():
+    """Test that batch input expands directories and globs to supported files only."""
+    from batch import collect_files
+ 
+    from_dir = collect_files(["files"])
+    from_glob = collect_files(["files/*.pdf"])
+ 
+    assert "files/test.docx" in from_dir
+    assert all(path.endswith(".pdf") for path in from_glob)
+    assert set(from_glob) <= set(from_dir)
+ 
+ 
+def test_run_batch_reports_documents_pages_and_failures(tmp_path):
+    """Test that a batch run extracts good files, records bad ones and counts pages."""
+    import os
+    from batch import run_batch
+    from main import output_dir_for
+ 
+    summary = run_batch(["files/sample.pdf", "files/empty.pdf"], workers=1,
+                        output_root=str(tmp_path / "out"), db_path=str(tmp_path / "batch.db"))
+ 
+    assert summary["documents"] == 1
+    assert summary["pages"] == 1
+    assert [failure["file_path"] for failure in summary["failures"]] == ["files/empty.pdf"]
+    assert os.path.exists(os.path.join(output_dir_for("files/sample.pdf", str(tmp_path / "out")), "sample.txt"))
+ 
+ 
+def test_output_dirs_are_unique_per_source_name():
+    """Test that documents sharing a base name get separate output folders."""
+    import os
+    from main import output_dir_for
+
+    names = ["a/report.pdf", "b/report.pdf", "report.docx", "bundle.zip!x/report.pdf"]
+    output_dirs = [output_dir_for(name, "out") for name in names]
+
+    assert len(set(output_dirs)) == len(names)
+    assert output_dirs[2].startswith(os.path.join("out", "report.docx-"))
+    assert output_dir_for("a/report.pdf", "out") == output_dirs[0]
+
+
+def test_extract_document_streams_pages_and_only_returns_them_for_sql(tmp_path):
+    """Test that a worker saves pages as they are extracted and only sends records back when asked."""
+    import main
+    from batch import extract_document
+
+    with patch("batch.save_to_files", wraps=main.save_to_files) as save:
+        kept = extract_document("files/Networks 1.pptx", str(tmp_path / "kept"))
+        dropped = extract_document("files/Networks 1.pptx", str(tmp_path / "dropped"), keep_pages=False)
+
+    assert not any(isinstance(call.args[1], list) for call in save.call_args_list)
+    assert kept["page_count"] == dropped["page_count"] == len(kept["pages"]) > 1
+    assert dropped["pages"] is None
+
+
+def test_iter_pages_yields_one_record_per_slide(pptx_extractor, mock_loader):
+    """Test that iter_pages yields a record for each slide with its own text."""
+    slides = []
+    for text in ("First slide", "Second slide"):
+        mock_shape = MagicMock()
+        mock_shape.text = text
+        mock_shape.has_table = False
+        slides.append(MagicMock(shapes=[mock_shape]))
+    mock_loader.load_file.return_value.slides = slides
+ 
+    pptx_extractor.load("fake_path.pptx")
+    pages = list(pptx_extractor.iter_pages())
+ 
+    assert [page["page_number"] for page in pages] == [1, 2]
+    assert [page["text"] for page in pages] == ["First slide\n", "Second slide\n"]
+ 
+ 
+def test_pdf_iter_pages_merges_to_extract_all(pdf_loader):
+    """Test that merging the PDF page records gives the whole-document result."""
+    from data_extractor.extractor import merge_pages
+ 
+    extractor = PDFExtractor(pdf_loader)
+    extractor.load("files/sample.pdf")
+    merged = merge_pages(extractor.iter_pages())
+ 
+    assert merged == extractor.extract_all()
+ 
+
+@pytest.mark.parametrize("engine", ["compat", "xml"])
+def test_docx_iter_pages_lists_each_image_once(engine):
+    """Test that an image drawn several times is one image in both iter_pages and extract_images."""
+    extractor = DOCXExtractor(DOCXLoader(), engine=engine)
+    extractor.load("files/demo.docx")
+    paged = [image for page in extractor.iter_pages() for image in page["images"]]
+    images = extractor.extract_images()
+    extractor.close()
+
+    assert len(paged) == len(images) == 3
+    assert {image["image_data"] for image in paged} == {image["image_data"] for image in images}
+
+
+def test_file_storage_saves_pages_from_generator(tmp_path):
+    """Test that FileStorage consumes a page generator and writes text, images, URLs and tables."""
+    from storage.file_storage import FileStorage
+ 
+    def pages():
+        yield {"page_number": 1, "text": "page one\n", "images": [{"image_data": b"png", "ext": "png", "page": 1}],
+               "urls": [], "tables": [[["a", "b"], ["1", "2"]]]}
+        yield {"page_number": 2, "text": "page two\n", "images": [],
+               "urls": [{"linked_text": "x", "url": "http://example.com", "page_number": 2}], "tables": []}
+ 
+    FileStorage(str(tmp_path)).store(pages(), "doc.pdf", "pages")
+ 
+    assert (tmp_path / "doc.txt").read_text() == "page one\npage two\n"
+    assert (tmp_path / "images" / (hashlib.sha256(b"png").hexdigest() + ".png")).read_bytes() == b"png"
+    assert (tmp_path / "tables" / "table_1.csv").read_text() == "a,b\n1,2\n"
+    assert (tmp_path / "urls" / "urls.txt").read_text() == "http://example.com\n"
+ 
+ 
+def test_file_storage_streams_text_chunks(tmp_path):
+    """Test that save_text appends chunks from a generator."""
+    from storage.file_storage import FileStorage
+ 
+    chunks = (f"line {number}\n" for number in range(3))
+    FileStorage(str(tmp_path), buffer_size=8).store(chunks, "doc.docx", "text")
+ 
+    assert (tmp_path / "doc.txt").read_text() == "line 0\nline 1\nline 2\n"
+ 
+ 
+def test_file_storage_streams_table_rows_and_image_chunks(tmp_path):
+    """Test that tables made of row generators and images made of byte chunks are written incrementally."""
+    import json
+    from storage.file_storage import FileStorage
+ 
+    storage = FileStorage(str(tmp_path))
+    rows = (["col", str(number)] for number in range(3))
+    storage.store(iter([rows]), "doc.pdf", "table")
+    storage.store(iter([{"image_data": iter([b"ab", b"cd"]), "ext": "png", "page": 1}]), "doc.pdf", "image")
+ 
+    assert (tmp_path / "tables" / "table_1.csv").read_text() == "col,0\ncol,1\ncol,2\n"
+    metadata = json.loads((tmp_path / "tables" / "metadata.json").read_text())
+    assert metadata == [{"table_filename": "table_1.csv", "row_count": 3, "column_count": 2}]
+    assert (tmp_path / "images" / (hashlib.sha256(b"abcd").hexdigest() + ".png")).read_bytes() == b"abcd"
+ 
+ 
+def test_store_many_uses_executemany(sql_storage, mock_connection):
+    """Test that store_many inserts all items with one executemany call and creates the table once."""
+    sql_storage.store_many("data_table", [["a"], ["b"]])
+    sql_storage.store_many("data_table", [["c"]])
+ 
+    create_calls = [call for call in mock_connection.cursor().execute.call_args_list
+                    if call.args[0].startswith("CREATE TABLE")]
+    assert len(create_calls) == 1
+    assert mock_connection.cursor().executemany.call_count == 2
+ 
+ 
+def test_transaction_commits_once_per_batch(tmp_path):
+    """Test that transaction blocks are committed together and failed blocks are rolled back alone."""
+    import sqlite3
+ 
+    db_path = str(tmp_path / "batch.db")
+    storage = SQLStorage(db_path, commit_batch_size=2, journal_mode="WAL", synchronous="NORMAL")
+    reader = sqlite3.connect(db_path)
+ 
+    with storage.transaction():
+        storage.store("text", "first")
+    assert reader.execute("SELECT name FROM sqlite_master WHERE name = 'text'").fetchall() == []
+ 
+    with pytest.raises(RuntimeError):
+        with storage.transaction():
+            storage.store("text", "failed")
+            raise RuntimeError("boom")
+    with storage.transaction():
+        storage.store("text", "second")
+ 
+    assert reader.execute("SELECT data FROM text ORDER BY id").fetchall() == [("first",), ("second",)]
+    storage.close()
+ 
+ 
+def test_failed_first_transaction_does_not_leave_tables_marked_as_created(tmp_path):
+    """Test that a table created by a rolled-back block is created again by the next store."""
+    import sqlite3
+
+    db_path = str(tmp_path / "rollback.db")
+    storage = SQLStorage(db_path)
+
+    with pytest.raises(RuntimeError):
+        with storage.transaction():
+            storage.store("text", "a")
+            raise RuntimeError("boom")
+    with storage.transaction():
+        storage.store("text", "b")
+    storage.close()
+
+    assert sqlite3.connect(db_path).execute("SELECT data FROM text").fetchall() == [("b",)]
+
+
+def test_sql_storage_rejects_unknown_pragmas(tmp_path):
+    """Test that only known journal modes are accepted."""
+    with pytest.raises(ValueError, match="Unsupported journal mode"):
+        SQLStorage(str(tmp_path / "x.db"), journal_mode="fast")
+ 
+ 
+def test_store_document_round_trips_pages(tmp_path):
+    """Test that a document stored in the normalized schema can be read back page by page."""
+    storage = SQLStorage(str(tmp_path / "docs.db"))
+    pages = [
+        {"page_number": 1, "text": "first page\n", "images": [{"image_data": b"img", "ext": "png", "page": 1}],
+         "urls": [{"linked_text": "site", "url": "http://example.com", "page_number": 1}], "tables": []},
+        {"page_number": 2, "text": "second page\n", "images": [], "urls": [],
+         "tables": [[["a", "b"], ["1", None]]]},
+    ]
+ 
+    document_id = storage.store_document("files/report.pdf", iter(pages))
+ 
+    assert storage.load_page(document_id, 1)["images"] == [{"image_data": b"img", "ext": "png", "page": 1}]
+    assert storage.load_page(document_id, 2)["tables"] == [[["a", "b"], ["1", None]]]
+    assert storage.load_page(document_id, 2)["text"] == "second page\n"
+    assert storage.find_documents_by_url("http://example.com") == [(document_id, 1)]
+    assert storage.conn.execute("SELECT format, page_count FROM documents WHERE id = ?",
+                                (document_id,)).fetchone() == ("pdf", 2)
+    storage.close()
+ 
+ 
+def test_page_lookups_use_indexes(tmp_path):
+    """Test that per-document/per-page and URL lookups are index searches, not table scans."""
+    storage = SQLStorage(str(tmp_path / "docs.db"))
+    storage.store_document("doc.docx", [])
+ 
+    for query in ("SELECT * FROM text_segments WHERE document_id = 1 AND page_number = 1",
+                  "SELECT * FROM table_cells WHERE document_id = 1 AND page_number = 1",
+                  "SELECT * FROM links WHERE url = 'x'"):
+        plan = " ".join(row[-1] for row in storage.conn.execute("EXPLAIN QUERY PLAN " + query))
+        assert "USING INDEX" in plan, plan
+    storage.close()
+ 
+ 
+def test_file_storage_writes_shared_images_once(tmp_path):
+    """Test that identical images from different documents share one hash-named file."""
+    import json
+    from storage.file_storage import FileStorage
+ 
+    shared = tmp_path / "_images"
+    logo = {"image_data": b"logo-bytes", "ext": "png", "page": 1}
+    for name in ("deck_a", "deck_b"):
+        FileStorage(str(tmp_path / name), image_dir=str(shared)).store([logo, dict(logo, page=2)], name, "image")
+ 
+    assert [path.name for path in shared.iterdir()] == [hashlib.sha256(b"logo-bytes").hexdigest() + ".png"]
+    metadata = json.loads((tmp_path / "deck_b" / "images" / "metadata.json").read_text())
+    assert [entry["page_number"] for entry in metadata] == [1, 2]
+    assert (tmp_path / "deck_b" / "images" / metadata[0]["file_name"]).read_bytes() == b"logo-bytes"
+ 
+ 
+def test_store_document_deduplicates_image_blobs(tmp_path):
+    """Test that repeated images are stored once as BLOBs with one reference row per occurrence."""
+    storage = SQLStorage(str(tmp_path / "docs.db"))
+    logo = {"image_data": b"logo", "ext": "png"}
+    pages = [{"page_number": number, "text": "", "images": [logo], "urls": [], "tables": []} for number in (1, 2)]
+ 
+    first = storage.store_document("a.pptx", pages)
+    storage.store_document("b.pptx", pages)
+ 
+    assert storage.conn.execute("SELECT COUNT(*) FROM image_blobs").fetchone() == (1,)
+    assert storage.conn.execute("SELECT COUNT(*) FROM images").fetchone() == (4,)
+    assert storage.load_page(first, 2)["images"][0]["image_data"] == b"logo"
+    assert storage.load_image(hashlib.sha256(b"logo").hexdigest()) == b"logo"
+    storage.close()
+ 
+ 
+def test_manifest_keys_on_content_extractor_version_and_options(tmp_path):
+    """Test that manifest entries only match the same source, content, extractor version and options."""
+    from storage.manifest import ExtractionManifest
+ 
+    manifest = ExtractionManifest(str(tmp_path / "manifest.db"))
+    key = PDFExtractor(PDFLoader()).cache_key()
+    manifest.record("abc", key, "files/sample.pdf", output_dir="out/sample", page_count=1)
+ 
+    assert manifest.lookup("abc", key, "files/sample.pdf")["output_dir"] == "out/sample"
+    assert manifest.lookup("other-content", key, "files/sample.pdf") is None
+    assert manifest.lookup("abc", key, "copies/sample.pdf") is None
+    assert manifest.lookup("abc", PDFExtractor(PDFLoader(), engine="pymupdf").cache_key(), "files/sample.pdf") is None
+ 
+    bumped = (key[0], key[1] + "-next", key[2])
+    assert manifest.lookup("abc", bumped, "files/sample.pdf") is None
+    assert manifest.prune(bumped) == 1
+    manifest.close()
+ 
+ 
+def test_run_batch_skips_unchanged_documents(tmp_path):
+    """Test that a repeated batch run reuses stored outputs for unchanged files."""
+    from batch import run_batch
+ 
+    options = dict(workers=1, output_root=str(tmp_path / "out"), db_path=str(tmp_path / "batch.db"))
+    first = run_batch(["files/sample.pdf"], **options)
+    second = run_batch(["files/sample.pdf"], **options)
+    forced = run_batch(["files/sample.pdf"], use_cache=False, **options)
+ 
+    assert (first["documents"], first["cached"]) == (1, 0)
+    assert (second["documents"], second["cached"]) == (0, 1)
+    assert (forced["documents"], forced["cached"]) == (1, 0)
+    assert (tmp_path / "batch.manifest.db").exists()
+ 
+ 
+def test_run_batch_cache_from_a_run_without_sql_does_not_skip_sql(tmp_path):
+    """Test that documents cached by a file-only run are still stored by a later SQL run."""
+    from batch import run_batch
+
+    output_root = tmp_path / "out"
+    files_only = run_batch(["files/sample.pdf"], workers=1, output_root=str(output_root), db_path=None)
+    with_sql = run_batch(["files/sample.pdf"], workers=1, output_root=str(output_root),
+                         db_path=str(output_root / "batch.db"))
+    again = run_batch(["files/sample.pdf"], workers=1, output_root=str(output_root),
+                      db_path=str(output_root / "batch.db"))
+
+    assert (files_only["documents"], with_sql["documents"], with_sql["cached"]) == (1, 1, 0)
+    assert (again["documents"], again["cached"]) == (0, 1)
+    assert (output_root / "extraction_manifest.db").exists()
+    storage = SQLStorage(str(output_root / "batch.db"))
+    assert storage.conn.execute("SELECT COUNT(*) FROM documents").fetchone() == (1,)
+    storage.close()
+
+
+def test_run_batch_cache_is_scoped_to_database_source_and_output_root(tmp_path):
+    """Test that cache entries are not reused for another database, another copy or another output folder."""
+    import os
+    import shutil
+    from batch import run_batch
+
+    copy = tmp_path / "copy" / "sample.pdf"
+    copy.parent.mkdir()
+    shutil.copy("files/sample.pdf", copy)
+    options = dict(workers=1, output_root=str(tmp_path / "out"))
+    first = run_batch(["files/sample.pdf"], db_path=str(tmp_path / "a.db"), **options)
+    other_db = run_batch(["files/sample.pdf"], db_path=str(tmp_path / "b.db"), **options)
+    other_copy = run_batch([str(copy)], db_path=str(tmp_path / "a.db"), **options)
+    other_root = run_batch(["files/sample.pdf"], workers=1, output_root=str(tmp_path / "elsewhere"),
+                           db_path=str(tmp_path / "a.db"))
+
+    assert [summary["cached"] for summary in (first, other_db, other_copy, other_root)] == [0, 0, 0, 0]
+    assert (tmp_path / "a.manifest.db").exists() and (tmp_path / "b.manifest.db").exists()
+    storage = SQLStorage(str(tmp_path / "b.db"))
+    assert storage.conn.execute("SELECT COUNT(*) FROM documents").fetchone() == (1,)
+    storage.close()
+    assert len(os.listdir(tmp_path / "elsewhere")) > 0
+
+
+def test_docx_extract_urls_resolves_hyperlink_text_and_paragraph(tmp_path, docx_loader):
+    """Test that each hyperlink relationship is matched to its text and paragraph index."""
+    from benchmarks.docx_links import build_document
+ 
+    file_path = str(tmp_path / "links.docx")
+    build_document(file_path, 3)
+    extractor = DOCXExtractor(docx_loader)
+    extractor.load(file_path)
+ 
+    assert extractor.extract_urls() == [
+        {"linked_text": f"link {index}", "url": f"https://example.com/page/{index}", "page_number": index + 1}
+        for index in range(3)
+    ]
+ 
+ 
+def test_extraction_service_streams_results_over_unix_socket(tmp_path):
+    """Test that the resident service extracts jobs with warm workers and returns one line per job."""
+    import asyncio
+    import os
+    from main import output_dir_for
+    from service import ExtractionService, submit
+ 
+    socket_path = str(tmp_path / "extractor.sock")
+    service = ExtractionService(socket_path=socket_path, workers=1, max_concurrency=1,
+                                output_root=str(tmp_path / "out"), db_path=str(tmp_path / "service.db"))
+ 
+    async def scenario():
+        await service.start()
+        try:
+            return [response async for response in submit(["files/sample.pdf", "files/empty.pdf"], socket_path)]
+        finally:
+            await service.close()
+ 
+    responses = sorted(asyncio.run(scenario()), key=lambda response: response["id"])
+ 
+    assert [response["status"] for response in responses] == ["ok", "error"]
+    assert responses[0]["page_count"] == 1 and responses[0]["document_id"] == 1
+    assert os.path.exists(os.path.join(output_dir_for("files/sample.pdf", str(tmp_path / "out")), "sample.txt"))
+    assert not (tmp_path / "extractor.sock").exists()
+ 
+ 
+def _crashing_extract_document(file_path, *args, **kwargs):
+    import os
+    import time
+    from batch import extract_document
+    if file_path == "crash":
+        os._exit(1)
+    if file_path == "hang":
+        time.sleep(60)
+    return extract_document(file_path, *args, **kwargs)
+
+
+def test_extraction_service_replaces_a_broken_pool_and_times_out_jobs(tmp_path):
+    """Test that a dead worker or a hung job fails only its own job and later jobs still run."""
+    import asyncio
+    from service import ExtractionService, submit
+
+    socket_path = str(tmp_path / "extractor.sock")
+    service = ExtractionService(socket_path=socket_path, workers=1, max_concurrency=1, db_path=None,
+                                output_root=str(tmp_path / "out"), job_timeout=2)
+
+    async def scenario():
+        await service.start()
+        try:
+            return [response async for response in submit(["crash", "files/sample.pdf", "hang", "files/test.docx"],
+                                                          socket_path)]
+        finally:
+            await service.close()
+
+    with patch("service.extract_document", _crashing_extract_document):
+        responses = sorted(asyncio.run(scenario()), key=lambda response: response["id"])
+
+    assert [response["status"] for response in responses] == ["error", "ok", "error", "ok"]
+    assert responses[0]["error"].startswith("BrokenProcessPool")
+    assert responses[2]["error"] == "TimeoutError: Timed out after 2s"
+
+
+def test_extraction_service_close_does_not_block_the_event_loop(tmp_path):
+    """Test that draining the worker pool on close leaves the event loop free for other tasks."""
+    import asyncio
+    import time
+    from service import ExtractionService
+
+    async def scenario():
+        service = ExtractionService(socket_path=str(tmp_path / "extractor.sock"), workers=1,
+                                    output_root=str(tmp_path / "out"), db_path=str(tmp_path / "service.db"))
+        await service.start()
+        shutdown = service._pool.shutdown
+        service._pool.shutdown = lambda: (time.sleep(0.5), shutdown())
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.05)
+                ticks += 1
+
+        ticker = asyncio.create_task(tick())
+        await service.close()
+        ticker.cancel()
+        return ticks
+
+    assert asyncio.run(scenario()) >= 5
+
+
+def test_docx_extraction_does_not_import_pdf_or_table_stacks():
+    """Test that a DOCX-only run never imports the PDF parsers, pandas or PIL."""
+    import subprocess
+    import sys
+ 
+    code = (
+        "import sys, tempfile\n"
+        "import main\n"
+        "from storage.file_storage import FileStorage\n"
+        "extractor = main.create_extractor('files/test.docx')\n"
+        "extractor.load('files/test.docx')\n"
+        "FileStorage(tempfile.mkdtemp()).store(list(extractor.iter_pages()), 'test', 'pages')\n"
+        "print(','.join(m for m in ('fitz', 'pdfplumber', 'PyPDF2', 'pptx', 'pandas', 'PIL') if m in sys.modules))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+ 
+    assert result.stdout.strip() == ""
+ 
+ 
+def test_sniff_content_type_reads_file_headers(tmp_path):
+    """Test that content types come from magic bytes, not from the file extension."""
+    from data_extractor.registry import sniff_content_type
+ 
+    unknown = tmp_path / "notes.pdf"
+    unknown.write_bytes(b"plain text")
+ 
+    assert sniff_content_type("files/sample.pdf") == "pdf"
+    assert sniff_content_type("files/test.docx") == "docx"
+    assert sniff_content_type("files/Presentation.pptx") == "pptx"
+    assert sniff_content_type("files/sample_presentation.ppt") == "ole2"
+    assert sniff_content_type("files/empty.pdf") == "empty"
+    assert sniff_content_type(str(unknown)) is None
+ 
+ 
+def test_create_extractor_rejects_bad_files_before_loading_a_parser(tmp_path):
+    """Test that empty, legacy binary and mislabeled files fail in the registry."""
+    import shutil
+    from data_extractor.registry import create_extractor
+ 
+    mislabeled = str(tmp_path / "report.pdf")
+    shutil.copy("files/test.docx", mislabeled)
+    renamed_pptx = str(tmp_path / "slides.ppt")
+    shutil.copy("files/Presentation.pptx", renamed_pptx)
+ 
+    with pytest.raises(ValueError, match="is empty"):
+        create_extractor("files/empty.pdf")
+    with pytest.raises(ValueError, match="OLE2"):
+        create_extractor("files/sample_presentation.ppt")
+    with pytest.raises(ValueError, match="contains a DOCX document, not PDF"):
+        create_extractor(mislabeled)
+    assert isinstance(create_extractor(renamed_pptx), PPTXExtractor)
+    assert isinstance(create_extractor("files/empty.pdf", sniff=False), PDFExtractor)
+ 
+ 
+def test_image_refs_stream_the_same_bytes_as_the_source(tmp_path):
+    """Test that image records hold references whose streamed bytes match the embedded images."""
+    import fitz
+    import zipfile
+    from storage.file_storage import FileStorage
+ 
+    extractor = PPTXExtractor(PPTLoader())
+    extractor.load("files/Networks 1.pptx")
+    image = extractor.extract_images()[0]
+    extractor.close()
+    with zipfile.ZipFile("files/Networks 1.pptx") as package:
+        expected = package.read(image["image_data"].member)
+ 
+    assert list(image["image_data"].iter_chunks(1024))[0] == expected[:1024]
+    assert bytes(image["image_data"]) == expected and image["size"] == len(expected)
+    FileStorage(str(tmp_path)).store([image], "deck.pptx", "image")
+    assert (tmp_path / "images" / f"{hashlib.sha256(expected).hexdigest()}.{image['ext']}").read_bytes() == expected
+ 
+    extractor = PDFExtractor(PDFLoader())
+    extractor.load("files/sample2.pdf")
+    images = extractor.extract_images()
+    extractor.close()
+    with fitz.open("files/sample2.pdf") as pdf_document:
+        expected = [pdf_document.extract_image(image["image_data"].xref) for image in images]
+ 
+    assert [bytes(image["image_data"]) for image in images] == [base["image"] for base in expected]
+    assert [image["ext"] for image in images] == [base["ext"] for base in expected]
+    assert [image["dimensions"] for image in images] == [(base["width"], base["height"]) for base in expected]
+ 
+ 
+def test_saving_pdf_images_opens_and_converts_each_source_once(tmp_path, pdf_loader):
+    """Test that image records are built without decoding and saving reuses one open document."""
+    import os
+    import fitz
+    from file_loaders.source import DocumentSource
+    from storage.file_storage import FileStorage
+
+    extractor = PDFExtractor(pdf_loader)
+    extractor.load("files/sample2.pdf")
+    with patch.object(fitz.Document, "extract_image", side_effect=fitz.Document.extract_image,
+                      autospec=True) as decoded:
+        images = extractor.extract_images()
+    extractor.close()
+    assert decoded.call_count == 0
+    assert any(not image["image_data"].raw for image in images)
+    with patch.object(DocumentSource, "open_fitz", side_effect=DocumentSource.open_fitz, autospec=True) as opened:
+        FileStorage(str(tmp_path / "saved")).store(images, "sample2.pdf", "image")
+    assert len(images) > 1 and opened.call_count == 1
+
+    extractor = PDFExtractor(pdf_loader)
+    extractor.load("files/sample2.pdf")
+    with patch.object(fitz.Document, "extract_image", side_effect=fitz.Document.extract_image,
+                      autospec=True) as converted:
+        FileStorage(str(tmp_path / "streamed")).store(extractor.iter_pages(), "sample2.pdf", "pages")
+    extractor.close()
+    assert converted.call_count == sum(not image["image_data"].raw for image in images)
+    assert sorted(os.listdir(tmp_path / "streamed" / "images")) == sorted(os.listdir(tmp_path / "saved" / "images"))
+
+
+def test_benchmark_suite_measures_phases_and_flags_regressions():
+    """Test that a suite measurement records every metric and that only real slowdowns are flagged."""
+    from benchmarks.suite import compare_results, measure
+ 
+    result = measure("files/sample.pdf", "text", repeat=1)
+    assert set(result) == {"wall_seconds", "cpu_seconds", "peak_traced_bytes", "peak_rss_bytes", "output_bytes"}
+    assert result["output_bytes"] > 0 and result["peak_traced_bytes"] > 0
+ 
+    baseline = {"doc|text|compat": {"wall_seconds": 0.1, "cpu_seconds": 0.1, "peak_traced_bytes": 10 ** 6},
+                "doc|load|compat": {"wall_seconds": 0.001, "cpu_seconds": 0.001, "peak_traced_bytes": 1000}}
+    current = {"doc|text|compat": {"wall_seconds": 0.2, "cpu_seconds": 0.105, "peak_traced_bytes": 10 ** 6},
+               "doc|load|compat": {"wall_seconds": 0.002, "cpu_seconds": 0.002, "peak_traced_bytes": 2000},
+               "doc|urls|compat": {"error": "ValueError: broken"}}
+ 
+    regressions = compare_results(current, baseline, threshold=0.2)
+    assert [(regression["case"], regression["metric"]) for regression in regressions] == \
+        [("doc|text|compat", "wall_seconds")]
+ 
+ 
+def test_instrumentation_records_stages_and_exports_prometheus(tmp_path):
+    """Test that enabled instrumentation traces extractor and storage stages and exports their totals."""
+    import json
+    import instrumentation
+    from main import save_to_files
+ 
+    extractor = DOCXExtractor(DOCXLoader())
+    assert instrumentation.get_recorder() is None
+    extractor.load("files/test.docx")
+    trace_path = str(tmp_path / "trace.jsonl")
+    recorder = instrumentation.enable(trace_path)
+    try:
+        pages = list(extractor.iter_pages())
+        save_to_files("files/test.docx", pages, str(tmp_path / "out"))
+    finally:
+        instrumentation.disable()
+        extractor.close()
+ 
+    iter_pages = recorder.totals[("DOCXExtractor", "iter_pages")]
+    assert iter_pages["calls"] == 1 and iter_pages["items"] == len(pages) and iter_pages["bytes"] > 0
+    assert recorder.totals[("FileStorage", "save_pages")]["items"] == len(pages)
+    entries = [json.loads(line) for line in open(trace_path)]
+    assert {entry["document"] for entry in entries} == {"files/test.docx"}
+    assert instrumentation.totals_from_traces([trace_path]) == recorder.totals
+ 
+    metrics_path = str(tmp_path / "metrics.prom")
+    instrumentation.write_prometheus(recorder.totals, metrics_path)
+    metrics = open(metrics_path).read()
+    assert "# TYPE extractor_stage_seconds_total counter" in metrics
+    assert f'extractor_stage_items_total{{component="DOCXExtractor",stage="iter_pages"}} {len(pages)}' in metrics
+ 
+ 
+def test_instrumentation_measures_text_payloads_given_to_storage(tmp_path):
+    """Test that storage stages count the bytes of text they are given, not only of lists and dicts."""
+    import instrumentation
+    from storage.file_storage import FileStorage
+
+    text = "x" * 11000
+    recorder = instrumentation.enable()
+    try:
+        FileStorage(str(tmp_path / "out")).store(text, "doc.pdf", "text")
+        storage = SQLStorage(str(tmp_path / "text.db"))
+        storage.store("text", text)
+        storage.close()
+    finally:
+        instrumentation.disable()
+
+    for stage in (("FileStorage", "store"), ("FileStorage", "save_text"), ("SQLStorage", "store")):
+        assert (recorder.totals[stage]["items"], recorder.totals[stage]["bytes"]) == (1, 11000)
+
+
+def test_instrumentation_counts_pages_streamed_into_storage(tmp_path):
+    """Test that storage stages given a generator of pages count the pages and bytes they consume."""
+    import instrumentation
+    from main import PageCounter, save_to_files
+
+    extractor = PPTXExtractor(PPTLoader())
+    extractor.load("files/Networks 1.pptx")
+    recorder = instrumentation.enable()
+    try:
+        pages = PageCounter(extractor.iter_pages())
+        save_to_files("files/Networks 1.pptx", pages, str(tmp_path / "out"))
+    finally:
+        instrumentation.disable()
+        extractor.close()
+
+    for stage in (("FileStorage", "store"), ("FileStorage", "save_pages")):
+        assert recorder.totals[stage]["items"] == pages.count > 1
+        assert recorder.totals[stage]["bytes"] == recorder.totals[("PPTXExtractor", "iter_pages")]["bytes"] > 0
+
+
+def test_table_prefilter_and_workers_keep_tables_identical(tmp_path, pdf_loader):
+    """Test that skipping rule-free pages and scanning tables in workers does not change the tables."""
+    from benchmarks.pdf_tables import build_document
+ 
+    synthetic = str(tmp_path / "tables.pdf")
+    build_document(synthetic, 6, table_every=3, rows=3, columns=2)
+    for file_path in ("files/sample.pdf", "files/Sample_file.pdf", synthetic):
+        results = []
+        for table_workers, table_prefilter in ((1, False), (1, True), (2, True)):
+            extractor = PDFExtractor(pdf_loader, table_workers=table_workers, table_prefilter=table_prefilter)
+            extractor.load(file_path)
+            results.append((extractor.extract_tables(), [page["tables"] for page in extractor.iter_pages()]))
+            extractor.close()
+        assert results[0] == results[1] == results[2]
+    assert len(results[0][0]) == 2
+ 
+    # A resume with only horizontal rules never opens pdfplumber
+    extractor = PDFExtractor(pdf_loader)
+    extractor.load("files/Aman_resume.pdf")
+    assert extractor.extract_tables() == []
+    assert "pdfplumber" not in extractor.session._handles
+    extractor.close()
+ 
+ 
+def test_page_workers_split_large_pdf_without_changing_records(tmp_path, pdf_loader):
+    """Test that extracting page ranges in worker processes gives the same records in page order."""
+    from benchmarks.pdf_tables import build_document
+ 
+    synthetic = str(tmp_path / "pages.pdf")
+    build_document(synthetic, 9, table_every=3, rows=3, columns=2)
+    for engine in PDFExtractor.ENGINES:
+        results = []
+        for page_workers in (1, 2):
+            extractor = PDFExtractor(pdf_loader, engine=engine, page_workers=page_workers, split_threshold=5)
+            extractor.load(synthetic)
+            assert extractor._splits() == (page_workers > 1)
+            results.append((list(extractor.iter_pages()), extractor.extract_all()))
+            extractor.close()
+        assert results[0] == results[1]
+        assert [page["page_number"] for page in results[1][0]] == list(range(1, 10))
+        assert len(results[1][1]["tables"]) == 3
+ 
+    # Documents below the threshold stay in this process
+    extractor = PDFExtractor(pdf_loader, page_workers=2, split_threshold=5)
+    extractor.load("files/sample.pdf")
+    assert not extractor._splits()
+    extractor.close()
+ 
+ 
+def test_search_returns_ranked_page_hits_with_snippets(tmp_path):
+    """Test that stored page text is searchable by page, ranked, filtered and kept in step with deletes."""
+    db_path = str(tmp_path / "docs.db")
+    storage = SQLStorage(db_path)
+    page = {"images": [], "urls": [], "tables": []}
+    report = storage.store_document("files/report.pdf", [
+        dict(page, page_number=1, text="Quarterly revenue grew while revenue forecasts held."),
+        dict(page, page_number=2, text="Staff list and office locations."),
+    ])
+    memo = storage.store_document("files/memo.docx", [dict(page, page_number=1, text="Revenue is flat (C++ team).")])
+ 
+    hits = storage.search("revenue")
+    assert [(hit["document_id"], hit["page_number"]) for hit in hits] == [(report, 1), (memo, 1)]
+    assert hits[0]["file_name"] == "report.pdf"
+    assert "[revenue]" in hits[0]["snippet"].lower()
+    assert [hit["document_id"] for hit in storage.search("quarterly revenue")] == [report]
+    assert storage.search("revenue", document_id=memo) == hits[1:]
+    # Plain queries match punctuation literally; raw queries use FTS5 syntax
+    assert [hit["document_id"] for hit in storage.search("C++")] == [memo]
+    assert len(storage.search("quarter* OR staff", raw=True)) == 2
+    with pytest.raises(ValueError, match="Invalid search query"):
+        storage.search('"unterminated', raw=True)
+ 
+    storage.conn.execute("DELETE FROM documents WHERE id = ?", (report,))
+    assert [hit["document_id"] for hit in storage.search("revenue")] == [memo]
+    storage.close()
+ 
+    # A database written before the index existed is indexed when it is opened
+    legacy = SQLStorage(db_path)
+    legacy.conn.execute("DROP TABLE text_search")
+    legacy.conn.commit()
+    legacy.close()
+    reopened = SQLStorage(db_path)
+    assert [hit["document_id"] for hit in reopened.search("flat")] == [memo]
+    reopened.close()
+ 
+ 
+def test_tables_are_quoted_in_csv_and_typed_in_columnar_copy(tmp_path):
+    """Test that CSV cells with commas, quotes or None survive, and the typed copy infers header and dtypes."""
+    import csv
+    import json
+    from storage.columnar import read_frame
+    from storage.file_storage import FileStorage
+ 
+    table = [["Item", "Qty", "Price", "Shipped", "Note"],
+             ["bolt, steel", "1,200", "0.25", "2024-01-05", None],
+             ["nut", None, "(3.50)", "2024-02-10", 'say "hi"']]
+    FileStorage(str(tmp_path / "plain")).store([table], "doc.pdf", "table")
+    FileStorage(str(tmp_path / "typed"), columnar_tables=True, table_format="npz").store([table], "doc.pdf", "table")
+ 
+    with open(tmp_path / "plain" / "tables" / "table_1.csv", newline="") as f:
+        assert list(csv.reader(f)) == [[cell or "" for cell in row] for row in table]
+    assert (tmp_path / "typed" / "tables" / "table_1.csv").read_bytes() == \
+        (tmp_path / "plain" / "tables" / "table_1.csv").read_bytes()
+ 
+    metadata = json.loads((tmp_path / "typed" / "tables" / "metadata.json").read_text())[0]
+    assert metadata["columnar_filename"] == "table_1.npz"
+    assert [column["dtype"] for column in metadata["columns"]] == \
+        ["string", "Int64", "Float64", "datetime64[ns]", "string"]
+    frame = read_frame(str(tmp_path / "typed" / "tables" / "table_1.npz"))
+    assert list(frame.columns) == table[0]
+    assert frame["Qty"].tolist()[0] == 1200 and frame["Qty"].isna().tolist() == [False, True]
+    assert frame["Price"].tolist() == [0.25, -3.5]
+    assert str(frame["Shipped"][1].date()) == "2024-02-10"
+ 
+
+def test_columnar_integers_keep_precision_and_codes_keep_leading_zeros():
+    """Test that large integers are not rounded through floats and zero-padded codes stay strings."""
+    import pandas as pd
+    from storage.columnar import infer_column
+
+    large = infer_column(pd.Series(["9007199254740993", "-12", None], dtype=object))
+    assert str(large.dtype) == "Int64" and large.tolist()[:2] == [9007199254740993, -12]
+    codes = infer_column(pd.Series(["007", "120", "05"], dtype=object))
+    assert str(codes.dtype) == "string" and codes.tolist() == ["007", "120", "05"]
+    assert str(infer_column(pd.Series(["0", "0.5"], dtype=object)).dtype) == "Float64"
+    assert str(infer_column(pd.Series(["01/02/2024", "13/02/2024"], dtype=object)).dtype) == "datetime64[ns]"
+ 
+ 
+def test_extractors_accept_in_memory_sources_and_archive_members(tmp_path):
+    """Test that bytes, memoryviews, file objects, mmaps and archive members extract like the file on disk."""
+    import gc
+    import io
+    import mmap
+    import tarfile
+    import zipfile
+    from data_extractor.registry import create_extractor
+    from file_loaders.source import DocumentSource
+ 
+    def extract(source, name=None, **options):
+        extractor = create_extractor(DocumentSource(source, name) if name else source, **options)
+        extractor.load(DocumentSource(source, name) if name else source)
+        pages = [dict(page, images=[bytes(image["image_data"]) for image in page["images"]])
+                 for page in extractor.iter_pages()]
+        extractor.close()
+        return extractor.file_path, pages
+ 
+    for file_path, options in (("files/sample.pdf", {"pdf_engine": "compat"}),
+                               ("files/sample.pdf", {"pdf_engine": "pymupdf"}),
+                               ("files/test.docx", {}), ("files/Presentation.pptx", {})):
+        name, expected = extract(file_path, **options)
+        data = open(file_path, "rb").read()
+        with open(file_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for source in (data, memoryview(data), io.BytesIO(data), mapped):
+                assert extract(source, **options)[1] == expected
+            # Parsers may keep reference cycles to the mapped buffer until collected
+            gc.collect()
+        with open(file_path, "rb") as f:
+            assert extract(f, **options) == (file_path, expected)
+    assert extract(data)[0] == "document.pptx"
+    assert extract(data, name="deck.pptx")[0] == "deck.pptx"
+ 
+    with zipfile.ZipFile(tmp_path / "bundle.zip", "w") as archive:
+        archive.write("files/test.docx", "docs/test.docx")
+    with tarfile.open(tmp_path / "bundle.tar.gz", "w:gz") as archive:
+        archive.add("files/test.docx", "test.docx")
+    _, expected = extract("files/test.docx")
+    for member in (f"{tmp_path}/bundle.zip!docs/test.docx", f"{tmp_path}/bundle.tar.gz!test.docx"):
+        assert extract(member) == (member, expected)
+    with pytest.raises(ValueError, match="does not exist"):
+        create_extractor(f"{tmp_path}/bundle.zip!missing.docx")
+ 
+ 
+class _SlowStage:
+    INSTRUMENTED = ("crunch",)
+ 
+    def crunch(self, seconds):
+        import time
+        time.sleep(seconds)
+        return seconds
+ 
+ 
+def _slow_task(seconds):
+    return _SlowStage().crunch(seconds)
+ 
+ 
+def _exit_task():
+    import os
+    os._exit(3)
+ 
+ 
+def _allocate_task(size):
+    return len(bytearray(size))
+ 
+ 
+def _pid_task():
+    import os
+    return os.getpid()
+ 
+ 
+def _nested_pool_task(pid_path):
+    import time
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=1) as pool:
+        with open(pid_path, "w") as f:
+            f.write(str(pool.submit(_pid_task).result()))
+        pool.submit(time.sleep, 60).result()
+
+
+def _memory_child_task(pid_path, size):
+    import subprocess
+    import sys
+    import time
+    child = subprocess.Popen([sys.executable, "-c", f"import time; data = b'x' * {size}; time.sleep(60)"])
+    with open(pid_path, "w") as f:
+        f.write(str(child.pid))
+    time.sleep(60)
+
+
+def test_supervisor_enforces_timeouts_memory_limits_retries_and_recycling():
+    """Test that hung, crashing and oversized tasks fail with their phase while other tasks still finish."""
+    import instrumentation
+    from supervisor import Supervisor
+ 
+    instrumentation.instrument(_SlowStage)
+    with open("/proc/self/statm") as f:
+        virtual_size = int(f.read().split()[0]) * 4096
+    supervisor = Supervisor(workers=2, timeout=1, memory_limit=virtual_size + 256 * 2**20, retries=1)
+    outcomes = {outcome["key"]: outcome for outcome in supervisor.run([
+        ("hang", _slow_task, (60,)), ("fast", _slow_task, (0,)), ("exit", _exit_task, ()),
+        ("big", _allocate_task, (2**31,)), ("fine", _allocate_task, (2**20,))])}
+ 
+    assert outcomes["fast"]["status"] == "ok" and outcomes["fast"]["result"] == 0
+    assert outcomes["fine"]["result"] == 2**20
+    assert outcomes["hang"]["status"] == "timeout"
+    assert outcomes["hang"]["phase"] == "_SlowStage.crunch"
+    assert outcomes["exit"]["status"] == "crashed"
+    assert outcomes["big"]["status"] == "memory"
+    assert outcomes["hang"]["attempts"] == outcomes["exit"]["attempts"] == outcomes["big"]["attempts"] == 2
+ 
+    recycled = Supervisor(workers=1, max_tasks_per_worker=2)
+    pids = [outcome["result"] for outcome in recycled.run((index, _pid_task, ()) for index in range(4))]
+    assert len(set(pids)) == 2
+ 
+ 
+def test_supervisor_kills_processes_started_by_a_timed_out_task(tmp_path):
+    """Test that a killed worker takes the pool processes its task started with it."""
+    from supervisor import Supervisor
+
+    pid_path = tmp_path / "child.pid"
+    outcome, = Supervisor(workers=1, timeout=2).run([("nested", _nested_pool_task, (str(pid_path),))])
+
+    assert outcome["status"] == "timeout"
+    try:
+        with open(f"/proc/{pid_path.read_text()}/stat") as f:
+            # A killed child whose parent is gone may linger as a zombie until init reaps it
+            assert f.read().rsplit(")", 1)[1].split()[0] == "Z"
+    except FileNotFoundError:
+        pass
+
+
+def test_supervisor_counts_child_processes_against_the_rss_limit(tmp_path):
+    """Test that memory held by a process the task started counts toward the worker's RSS limit."""
+    from supervisor import Supervisor
+
+    with open("/proc/self/statm") as f:
+        resident = int(f.read().split()[1]) * 4096
+    pid_path = tmp_path / "child.pid"
+    outcome, = Supervisor(workers=1, timeout=30, rss_limit=resident + 256 * 2**20).run(
+        [("child", _memory_child_task, (str(pid_path), 512 * 2**20))])
+
+    assert outcome["status"] == "memory" and outcome["seconds"] < 30
+    assert "exceeded" in outcome["error"]
+
+
+def test_extraction_plan_skips_unrequested_artifacts_pages_and_large_images(tmp_path, pdf_loader):
+    """Test that a plan limits artifacts, pages and image sizes without opening unneeded libraries."""
+    from benchmarks.pdf_tables import build_document
+    from data_extractor.plan import ExtractionPlan
+    from data_extractor.registry import create_extractor
+ 
+    # A text-only run of the compat engine never opens fitz or pdfplumber
+    extractor = PDFExtractor(pdf_loader, plan=ExtractionPlan(["text"]))
+    extractor.load("files/Sample_file.pdf")
+    pages = list(extractor.iter_pages())
+    assert extractor.extract_tables() == extractor.extract_images() == []
+    assert extractor.session._handles == {}
+    assert all(page["text"] and not page["images"] and not page["tables"] for page in pages)
+    extractor.close()
+ 
+    synthetic = str(tmp_path / "plan.pdf")
+    build_document(synthetic, 9, table_every=3, rows=3, columns=2)
+    plan = ExtractionPlan.parse("tables", "4-8")
+    for engine in PDFExtractor.ENGINES:
+        results = []
+        for page_workers in (1, 2):
+            extractor = PDFExtractor(pdf_loader, engine=engine, page_workers=page_workers, split_threshold=5, plan=plan)
+            extractor.load(synthetic)
+            results.append((list(extractor.iter_pages()), extractor.extract_tables()))
+            extractor.close()
+        assert results[0] == results[1]
+        assert [page["page_number"] for page in results[0][0]] == [4, 5, 6, 7, 8]
+        assert all(page["text"] == "" for page in results[0][0])
+        assert len(results[0][1]) == 2
+ 
+    extractor = create_extractor("files/Networks 1.pptx", plan=ExtractionPlan(first_page=3, last_page=4,
+                                                                             max_image_size=0))
+    extractor.load("files/Networks 1.pptx")
+    assert [page["page_number"] for page in extractor.iter_pages()] == [3, 4]
+    assert extractor.extract_images() == []
+    assert extractor.cache_key() != create_extractor("files/Networks 1.pptx").cache_key()
+    extractor.close()
+ 
+    assert ExtractionPlan.parse(None, "5-").options() == {"artifacts": ["text", "images", "urls", "tables"],
+                                                          "pages": [5, None], "max_image_size": None}
+    with pytest.raises(ValueError, match="Unknown artifact"):
+        ExtractionPlan(["text", "audio"])
+ 
+ 
+def test_office_xml_engine_matches_python_docx_and_python_pptx(tmp_path, monkeypatch):
+    """The lxml engine yields the same records as the compat engine, including merged cells and page breaks."""
+    from benchmarks.office_engines import build_docx, build_pptx
+    from data_extractor import ooxml
+    from data_extractor.plan import ExtractionPlan
+    from data_extractor.registry import create_extractor
+ 
+    synthetic_docx, synthetic_pptx = str(tmp_path / "synthetic.docx"), str(tmp_path / "synthetic.pptx")
+    build_docx(synthetic_docx, 12)
+    build_pptx(synthetic_pptx, 5)
+    plans = (None, ExtractionPlan.parse("text,urls", "2-3"))
+    # Every sample part is below PARSE_LIMIT; a limit of 0 also runs them through iterparse
+    for parse_limit in (ooxml.PARSE_LIMIT, 0):
+        monkeypatch.setattr(ooxml, "PARSE_LIMIT", parse_limit)
+        for file_path in ("files/test.docx", "files/demo.docx", "files/Networks 1.pptx", "files/Presentation.pptx",
+                          synthetic_docx, synthetic_pptx):
+            for plan in plans:
+                results = {}
+                for engine in ("compat", "xml"):
+                    extractor = create_extractor(file_path, plan=plan, office_engine=engine)
+                    extractor.load(file_path)
+                    results[engine] = (list(extractor.iter_pages()), extractor.extract_all(),
+                                       extractor.count_pages())
+                    extractor.close()
+                assert results["xml"] == results["compat"], (file_path, plan, parse_limit)
+ 
+    extractor = DOCXExtractor(DOCXLoader(), engine="xml")
+    extractor.load(synthetic_docx)
+    pages = list(extractor.iter_pages())
+    assert len(pages) == 12
+    assert pages[0]["tables"][0][0] == ["r0c0\nr0c1", "r0c0\nr0c1", "r0c2"]
+    assert pages[4]["urls"][0]["url"] == "https://example.com/docx/5"
+    assert extractor.cache_key() != create_extractor(synthetic_docx).cache_key()
+    extractor.close()
+    with pytest.raises(ValueError, match="engine"):
+        PPTXExtractor(PPTLoader(), engine="docx")
+ 
+ 
+def test_job_queue_leases_jobs_and_resumes_after_a_crashed_worker(tmp_path):
+    """Test that jobs are claimed once, expired leases are reclaimed and finished documents are not repeated."""
+    import time
+    from queue_worker import run_worker
+    from storage.job_queue import JobQueue
+ 
+    queue_path = str(tmp_path / "jobs.db")
+    queue = JobQueue(queue_path, lease_seconds=0.05)
+    keys = ["files/test.docx", "files/Presentation.pptx", "files/empty.pdf"]
+    assert queue.enqueue(keys, max_attempts=2) == 3
+    assert queue.enqueue(keys + ["files/demo.docx"]) == 1
+ 
+    # A worker claims a job and dies; its lease runs out and the job is handed out again
+    first = queue.claim("dead")
+    assert first["key"] == "files/test.docx" and first["attempts"] == 1
+    second = queue.claim("alive")
+    assert second["key"] == "files/Presentation.pptx"
+    assert queue.heartbeat(second["id"], "alive")
+    assert not queue.heartbeat(second["id"], "dead")
+    time.sleep(0.1)
+    assert queue.stats()["expired"] == 2
+    reclaimed = queue.claim("alive")
+    assert (reclaimed["key"], reclaimed["attempts"]) == ("files/test.docx", 2)
+    assert not queue.complete(first["id"], "dead")
+    assert queue.complete(reclaimed["id"], "alive", page_count=1)
+    # The second lease also expired at that claim, so the job went back to the queue
+    assert queue.fail(second["id"], "alive", "Crashed") is False
+    queue.close()
+ 
+    completed = run_worker(queue_path, output_root=str(tmp_path / "out"), db_path=None, office_engine="xml")
+    queue = JobQueue(queue_path)
+    stats = queue.stats()
+    assert completed == 2
+    assert {status: stats[status] for status in ("queued", "running", "done", "failed")} == \
+        {"queued": 0, "running": 0, "done": 3, "failed": 1}
+    # Measured over the few seconds the queue has been working, not the whole 60 s window
+    assert stats["documents_per_sec"] > 3 / 60 and stats["oldest_queued_seconds"] is None
+    [(key, attempts, error)] = queue.failures()
+    assert key == "files/empty.pdf" and attempts == 1 and error.startswith("ValueError")
+    assert queue.claim("late") is None
+    assert queue.requeue_failed() == 1 and queue.stats()["queued"] == 1
+    queue.close()
+
+
+def test_queue_worker_requeues_jobs_whose_database_stays_locked(tmp_path):
+    """Test that a job whose SQL write finds the database locked is retried instead of failed at once."""
+    import sqlite3
+    from queue_worker import run_worker
+    from storage.job_queue import JobQueue
+
+    queue_path = str(tmp_path / "jobs.db")
+    queue = JobQueue(queue_path)
+    queue.enqueue(["files/test.docx"], max_attempts=3)
+    queue.close()
+    with patch("queue_worker.save_to_sql", side_effect=sqlite3.OperationalError("database is locked")):
+        assert run_worker(queue_path, output_root=str(tmp_path / "out"), db_path=str(tmp_path / "docs.db")) == 0
+
+    queue = JobQueue(queue_path)
+    [(key, attempts, error)] = queue.failures()
+    assert (key, attempts) == ("files/test.docx", 3) and "database is locked" in error
+    queue.close()